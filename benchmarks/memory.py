@@ -0,0 +1,38 @@
+"""
+    memory.py - 解码后标签树的内存占用
+
+    python benchmarks/memory.py [--chunks 4]
+
+    使用 tracemalloc 统计解码若干个区块大小的 nbt 后新分配(仍存活)的内存。
+"""
+
+
+import argparse, gc, tracemalloc
+
+from workloads import nbt, make_chunk, count_tags
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    blobs = [make_chunk(seed).to_nbt(None, 'none', 'big') for seed in range(args.chunks)]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    roots = [nbt.RootNBT.from_nbt(blob, 'none', 'big') for blob in blobs]
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    tags = sum(count_tags(r.get_tag()) for r in roots)
+    encoded = sum(map(len, blobs))
+    print("chunks   %d" % args.chunks)
+    print("tags     %d" % tags)
+    print("encoded  %.1f KiB" % (encoded / 1024))
+    print("retained %.1f KiB  (%.1f bytes/tag, %.2fx encoded)" % (retained / 1024, retained / tags, retained / encoded))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+    run.py - 基准测试套件
+
+    python benchmarks/run.py [-w level,region] [-o decode,encode] [--quick]
+                             [--save results.json] [--compare baseline.json] [--threshold 0.1]
+
+    对 workloads.py 中的每组数据分别计时 nbt 解码/编码(大小端 x 各压缩方式)、snbt 解析/生成以及 copy，
+    输出 MB/s 与 tags/s。--save 将结果保存为 JSON，--compare 与保存的基线对比，
+    任一项变慢超过阈值时以非零状态退出。
+"""
+
+
+import argparse, json, platform, subprocess, sys, time
+from datetime import datetime, timezone
+
+from workloads import nbt, WORKLOADS, count_tags
+
+BYTEORDERS = ("big", "little")
+ZIP_MODES = ("none", "gzip", "zlib")
+
+
+def make_cases(root):
+    cases = []
+    for order in BYTEORDERS:
+        for zip_mode in ZIP_MODES:
+            blob = root.to_nbt(None, zip_mode, order)
+            cases.append(("decode/%s/%s" % (order, zip_mode), lambda b=blob, z=zip_mode, o=order: nbt.RootNBT.from_nbt(b, z, o)))
+            cases.append(("encode/%s/%s" % (order, zip_mode), lambda z=zip_mode, o=order: root.to_nbt(None, z, o)))
+    text = root.to_snbt()
+    cases.append(("snbt_parse", lambda: nbt.RootNBT.from_snbt(text)))
+    cases.append(("snbt_render", lambda: root.to_snbt()))
+    cases.append(("snbt_render_pretty", lambda: root.to_snbt(None, True)))
+    cases.append(("copy", lambda: root.get_tag().copy()))
+    return cases, len(text)
+
+
+def measure(func, repeat, min_time):
+    func()
+    number, elapsed = 1, 0.0
+    while True:
+        start = time.perf_counter()
+        for _ in range(number): func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time: break
+        number *= 2
+    times = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number): func()
+        times.append((time.perf_counter() - start) / number)
+    return min(times)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run(workloads, ops, repeat, min_time, seed):
+    results = {}
+    for name in workloads:
+        root = WORKLOADS[name](seed)
+        tags = count_tags(root.get_tag())
+        size = len(root.to_nbt(None, "none", "big"))
+        cases, text_size = make_cases(root)
+        print("%s: %d tags, %.1f KiB nbt, %.1f KiB snbt" % (name, tags, size / 1024, text_size / 1024), file=sys.stderr)
+        for case, func in cases:
+            if ops and case.split("/")[0] not in ops: continue
+            seconds = measure(func, repeat, min_time)
+            nbytes = text_size if case.startswith("snbt") else size
+            key = "%s/%s" % (name, case)
+            results[key] = {"seconds": seconds, "mb_s": nbytes / seconds / 1e6, "tags_s": tags / seconds, "tags": tags, "bytes": nbytes}
+            print("  %-28s %10.3f ms %9.2f MB/s %12.0f tags/s" % (case, seconds * 1e3, results[key]["mb_s"], results[key]["tags_s"]), file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = 0
+    print("%-40s %12s %12s %8s" % ("case", "baseline", "current", "change"))
+    for key, res in results.items():
+        base = baseline.get(key)
+        if base is None:
+            print("%-40s %12s %9.3f ms %8s" % (key, "-", res["seconds"] * 1e3, "new"))
+            continue
+        change = base["seconds"] / res["seconds"] - 1
+        mark = ""
+        if change < -threshold:
+            mark = "  SLOWER"
+            regressions += 1
+        elif change > threshold:
+            mark = "  faster"
+        print("%-40s %9.3f ms %9.3f ms %+7.1f%%%s" % (key, base["seconds"] * 1e3, res["seconds"] * 1e3, change * 100, mark))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-w", "--workloads", default=",".join(WORKLOADS), help="逗号分隔: %s" % ", ".join(WORKLOADS))
+    parser.add_argument("-o", "--ops", default="", help="逗号分隔: decode, encode, snbt_parse, snbt_render, snbt_render_pretty, copy")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="每轮最短计时(秒)")
+    parser.add_argument("--quick", action="store_true", help="等同 --repeat 1 --min-time 0.02")
+    parser.add_argument("--save", metavar="FILE")
+    parser.add_argument("--compare", metavar="FILE")
+    parser.add_argument("--threshold", type=float, default=0.1, help="对比时判定变慢的比例")
+    args = parser.parse_args(argv)
+
+    workloads = [w for w in args.workloads.split(",") if w]
+    for w in workloads:
+        if w not in WORKLOADS: parser.error("未知的数据集 %s" % w)
+    if args.quick: args.repeat, args.min_time = 1, 0.02
+    ops = set(o for o in args.ops.split(",") if o)
+
+    results = run(workloads, ops, args.repeat, args.min_time, args.seed)
+    report = {
+        "meta": {
+            "python": sys.version.split()[0], "implementation": platform.python_implementation(),
+            "platform": platform.platform(), "machine": platform.machine(), "revision": git_revision(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"), "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("seed") != args.seed:
+            print("警告: 基线的 seed(%s) 与当前(%s)不同" % (baseline["meta"].get("seed"), args.seed), file=sys.stderr)
+        return 1 if compare(results, baseline["results"], args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
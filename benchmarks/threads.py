@@ -0,0 +1,81 @@
+"""
+    threads.py - 多线程并发解码/编码压力测试
+
+    python benchmarks/threads.py [--threads 1,2,4,8] [--rounds 200]
+
+    在 free-threaded CPython (3.13t, PYTHON_GIL=0) 上运行时，解码吞吐量应随线程数增长；
+    任何线程得到的结果与单线程参考结果不一致时以非零状态退出。
+"""
+
+
+import argparse, os, sys, time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import python_nbt as nbt
+
+
+def make_tree(seed):
+    sections = []
+    for y in range(16):
+        sections.append(nbt.TAG_Compound({
+            "Y": nbt.TAG_Byte(y),
+            "BlockStates": nbt.TAG_LongArray(array("q", [(seed * 31 + y * 4096 + i) * 2654435761 % (1 << 62) for i in range(256)])),
+            "SkyLight": nbt.TAG_ByteArray(array("b", [(i + y) % 128 for i in range(2048)])),
+            "Heights": nbt.TAG_List(array("i", range(seed, seed + 64))),
+        }))
+    entities = [nbt.TAG_Compound({
+        "id": nbt.TAG_String("minecraft:entity_%d" % (i % 17)),
+        "Pos": nbt.TAG_List(array("d", [i * 0.5, 64.0, seed + i * 0.25])),
+        "Health": nbt.TAG_Float(float(i % 20)),
+        "UUID": nbt.TAG_IntArray(array("i", [seed, i, -i, i * 7])),
+    }) for i in range(200)]
+    return nbt.RootNBT(nbt.TAG_Compound({
+        "DataVersion": nbt.TAG_Int(3700 + seed),
+        "sections": nbt.TAG_List(sections),
+        "Entities": nbt.TAG_List(entities),
+    }), "chunk_%d" % seed)
+
+
+def run(threads, rounds, blobs, expected, shared):
+    def decode(i):
+        data = blobs[i % len(blobs)]
+        root = nbt.RootNBT.from_nbt(data, 'none', 'big')
+        return root.to_nbt(None, 'none', 'big') == data
+
+    def encode(i):
+        return shared.to_nbt(None, 'none', 'big') == expected
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        ok = all(pool.map(decode, range(rounds))) and all(pool.map(encode, range(rounds)))
+    return ok, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", default="1,2,4,8")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print("Python %s  GIL %s" % (sys.version.split()[0], "enabled" if gil else "disabled"))
+    roots = [make_tree(seed) for seed in range(8)]
+    blobs = [r.to_nbt(None, 'none', 'big') for r in roots]
+    shared, expected = roots[0], blobs[0]
+    size = sum(len(blobs[i % len(blobs)]) for i in range(args.rounds)) * 2
+
+    base, failed = None, False
+    for threads in map(int, args.threads.split(",")):
+        ok, elapsed = run(threads, args.rounds, blobs, expected, shared)
+        base = base or elapsed
+        failed |= not ok
+        print("threads=%-3d %8.3fs  %8.2f MB/s  speedup %.2fx  %s" % (
+            threads, elapsed, size / elapsed / 1e6, base / elapsed, "ok" if ok else "MISMATCH"))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+    workloads.py - 确定性的合成测试数据
+
+    所有生成器只依赖 seed，同一 seed 在任何机器上得到完全相同的标签树。
+"""
+
+
+import os, random, sys
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import python_nbt as nbt
+
+
+def make_level(seed=0):
+    rnd = random.Random(seed)
+    rules = {"rule%02d" % i: nbt.TAG_String(rnd.choice(["true", "false", str(rnd.randrange(1000))])) for i in range(50)}
+    inventory = [nbt.TAG_Compound({
+        "Slot": nbt.TAG_Byte(slot), "id": nbt.TAG_String("minecraft:item_%d" % rnd.randrange(800)),
+        "Count": nbt.TAG_Byte(rnd.randrange(1, 65)),
+        "tag": nbt.TAG_Compound({"Damage": nbt.TAG_Int(rnd.randrange(1500)),
+                                 "display": nbt.TAG_Compound({"Name": nbt.TAG_String('{"text":"Item %d"}' % slot)})}),
+    }) for slot in range(36)]
+    player = nbt.TAG_Compound({
+        "Pos": nbt.TAG_List(array("d", [rnd.uniform(-3e4, 3e4), rnd.uniform(-64, 320), rnd.uniform(-3e4, 3e4)])),
+        "Rotation": nbt.TAG_List(array("f", [rnd.uniform(-180, 180), rnd.uniform(-90, 90)])),
+        "Health": nbt.TAG_Float(20.0), "XpLevel": nbt.TAG_Int(rnd.randrange(100)),
+        "UUID": nbt.TAG_IntArray(array("i", [rnd.getrandbits(31) for _ in range(4)])),
+        "Inventory": nbt.TAG_List(inventory),
+        "abilities": nbt.TAG_Compound({k: nbt.TAG_Byte(rnd.randrange(2)) for k in ("flying", "instabuild", "invulnerable", "mayBuild", "mayfly")}),
+    })
+    data = {
+        "DataVersion": nbt.TAG_Int(3700), "LevelName": nbt.TAG_String("World %d" % seed),
+        "RandomSeed": nbt.TAG_Long(rnd.getrandbits(63)), "Time": nbt.TAG_Long(rnd.getrandbits(40)),
+        "DayTime": nbt.TAG_Long(rnd.getrandbits(32)), "SpawnX": nbt.TAG_Int(rnd.randrange(-500, 500)),
+        "SpawnY": nbt.TAG_Int(64), "SpawnZ": nbt.TAG_Int(rnd.randrange(-500, 500)),
+        "GameRules": nbt.TAG_Compound(rules), "Player": player,
+        "DataPacks": nbt.TAG_Compound({"Enabled": nbt.TAG_List([nbt.TAG_String("vanilla"), nbt.TAG_String("file/pack_%d" % seed)]),
+                                       "Disabled": nbt.TAG_List()}),
+    }
+    return nbt.RootNBT(nbt.TAG_Compound({"Data": nbt.TAG_Compound(data)}))
+
+
+def make_chunk(seed=0):
+    rnd = random.Random(seed)
+    sections = [nbt.TAG_Compound({
+        "Y": nbt.TAG_Byte(y),
+        "block_states": nbt.TAG_Compound({
+            "palette": nbt.TAG_List([nbt.TAG_Compound({
+                "Name": nbt.TAG_String("minecraft:block_%d_%d" % (seed, rnd.randrange(4096))),
+                "Properties": nbt.TAG_Compound({"facing": nbt.TAG_String(rnd.choice(["north", "south", "east", "west"]))}),
+            }) for _ in range(rnd.randrange(1, 24))]),
+            "data": nbt.TAG_LongArray(array("q", [rnd.getrandbits(63) for _ in range(256)])),
+        }),
+        "SkyLight": nbt.TAG_ByteArray(array("b", [rnd.randrange(-128, 128) for _ in range(2048)])),
+    }) for y in range(-4, 20)]
+    block_entities = [nbt.TAG_Compound({
+        "id": nbt.TAG_String("minecraft:chest"),
+        "x": nbt.TAG_Int(rnd.randrange(-30000, 30000)), "y": nbt.TAG_Int(rnd.randrange(-64, 320)), "z": nbt.TAG_Int(rnd.randrange(-30000, 30000)),
+        "Items": nbt.TAG_List([nbt.TAG_Compound({
+            "Slot": nbt.TAG_Byte(slot), "id": nbt.TAG_String("minecraft:item_%d" % rnd.randrange(800)),
+            "Count": nbt.TAG_Byte(rnd.randrange(1, 65)),
+        }) for slot in range(rnd.randrange(27))]),
+    }) for _ in range(40)]
+    entities = [make_entity(rnd) for _ in range(60)]
+    return nbt.RootNBT(nbt.TAG_Compound({
+        "DataVersion": nbt.TAG_Int(3700), "xPos": nbt.TAG_Int(seed), "zPos": nbt.TAG_Int(-seed),
+        "sections": nbt.TAG_List(sections), "block_entities": nbt.TAG_List(block_entities),
+        "Entities": nbt.TAG_List(entities),
+    }))
+
+
+def make_entity(rnd):
+    return nbt.TAG_Compound({
+        "id": nbt.TAG_String("minecraft:zombie"),
+        "Pos": nbt.TAG_List(array("d", [rnd.uniform(-3e4, 3e4), rnd.uniform(-64, 320), rnd.uniform(-3e4, 3e4)])),
+        "Motion": nbt.TAG_List(array("d", [rnd.uniform(-1, 1) for _ in range(3)])),
+        "Health": nbt.TAG_Float(rnd.uniform(0, 20)), "Fire": nbt.TAG_Short(rnd.randrange(-20, 0)),
+        "UUID": nbt.TAG_IntArray(array("i", [rnd.getrandbits(31) for _ in range(4)])),
+    })
+
+
+def make_region(seed=0, chunks=8):
+    return nbt.RootNBT(nbt.TAG_List([make_chunk(seed * 1000 + i).get_tag() for i in range(chunks)]))
+
+
+def make_entities(seed=0, count=5000):
+    rnd = random.Random(seed)
+    return nbt.RootNBT(nbt.TAG_Compound({"Entities": nbt.TAG_List([make_entity(rnd) for _ in range(count)])}))
+
+
+def make_deep(seed=0, depth=200, width=3):
+    rnd = random.Random(seed)
+    tag = nbt.TAG_Compound({"leaf": nbt.TAG_String("bottom")})
+    for level in range(depth):
+        if level % 2:
+            tag = nbt.TAG_List([tag] + [nbt.TAG_Compound({"n": nbt.TAG_Int(rnd.randrange(1 << 20))}) for _ in range(width - 1)])
+        else:
+            fields = {"k%d" % i: nbt.TAG_Short(rnd.randrange(-32768, 32768)) for i in range(width - 1)}
+            fields["child"] = tag
+            tag = nbt.TAG_Compound(fields)
+    return nbt.RootNBT(tag if tag.type == nbt.TAG.COMPOUND else nbt.TAG_Compound({"child": tag}))
+
+
+def make_strings(seed=0, count=4000):
+    rnd = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyz \"'\\:,{}[]中文é"
+    return nbt.RootNBT(nbt.TAG_Compound({
+        "lines": nbt.TAG_List([nbt.TAG_String("".join(rnd.choice(alphabet) for _ in range(rnd.randrange(4, 80)))) for _ in range(count)]),
+        "lookup": nbt.TAG_Compound({"key %d:%s" % (i, rnd.choice(alphabet)): nbt.TAG_Double(rnd.random()) for i in range(count // 4)}),
+    }))
+
+
+WORKLOADS = {
+    "level"   : make_level,
+    "region"  : make_region,
+    "entities": make_entities,
+    "deep"    : make_deep,
+    "strings" : make_strings,
+}
+
+
+def count_tags(tag):
+    count, stack = 0, [tag]
+    while stack:
+        tag = stack.pop()
+        count += 1
+        if tag.type == nbt.TAG.COMPOUND: stack.extend(tag.get_value().values())
+        elif tag.type == nbt.TAG.LIST and not tag.value_is_array(): stack.extend(tag.get_value())
+    return count
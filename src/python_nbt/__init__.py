@@ -24,6 +24,7 @@ from .error import (
     SnbtTokenError,
     NbtParseError,
     NbtFileError,
+    NbtPathError,
 )
 from .tags import (
     TAG_End,
@@ -49,6 +50,14 @@ from .root import (
     write_to_snbt_file,
     RootNBT,
 )
+from .pyobj import (
+    to_python,
+    from_python,
+)
+from .index import (
+    ListIndex,
+    GridIndex,
+)
 
 TAGLIST[TAG.END]        = TAG_End
 TAGLIST[TAG.BYTE]       = TAG_Byte
@@ -63,3 +72,5 @@ TAGLIST[TAG.COMPOUND]   = TAG_Compound
 TAGLIST[TAG.BYTE_ARRAY] = TAG_ByteArray
 TAGLIST[TAG.INT_ARRAY]  = TAG_IntArray
 TAGLIST[TAG.LONG_ARRAY] = TAG_LongArray
+
+from . import path, stats, instrument, schema, mapped, structure, patch, frozen, shared, cache, region, search, columns
@@ -0,0 +1,10 @@
+"""
+    __main__.py - python -m python_nbt 入口
+"""
+
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
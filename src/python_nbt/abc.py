@@ -6,6 +6,9 @@
 from abc import ABC, ABCMeta, abstractmethod
 from io import BytesIO, StringIO, IOBase
 from array import array
+from weakref import WeakSet
+from threading import Lock
+from hashlib import blake2b
 
 from . import TAGLIST, TAG, tags
 from .snbt import SnbtIO, get_line
@@ -37,23 +40,37 @@ class TAG_Number_Meta(ABCMeta):
     def __init__(self, *arg) :
         super().__init__(*arg)
         self._memory = {}
+        self._memory_lock = Lock()
     
     def __call__(self, v=0) :
         v = try_to_number(v)
-        if v not in self._memory:
-            self._memory[v] = super().__call__(v)
-        return self._memory[v]
+        try:
+            return self._memory[v]
+        except KeyError:
+            pass
+        with self._memory_lock:
+            res = self._memory.get(v)
+            if res is None:
+                res = self._memory[v] = super().__call__(v)
+            return res
 
 
 class TAG_String_Meta(ABCMeta):
     def __init__(self, *arg) :
         super().__init__(*arg)
         self._memory = {}
+        self._memory_lock = Lock()
     
     def __call__(self, v=b'') :
-        if v not in self._memory:
-            self._memory[v] = super().__call__(v)
-        return self._memory[v]
+        try:
+            return self._memory[v]
+        except KeyError:
+            pass
+        with self._memory_lock:
+            res = self._memory.get(v)
+            if res is None:
+                res = self._memory[v] = super().__call__(v)
+            return res
 
 
 class TAG_Base(ABC):
@@ -78,6 +95,13 @@ class TAG_Base(ABC):
         else:
             raise TypeError("期望类型为 %s，但传入了 %s" % ((SnbtIO, str), repr(buffer)))
 
+    def freeze(self):
+        from .frozen import freeze
+        return freeze(self)
+
+    def digest(self) -> bytes:
+        return blake2b(bytes((self.type.value,)) + self.to_bytes(True, True), digest_size=16).digest()
+
     @classmethod
     @abstractmethod
     def _from_bytesIO(cls, buffer, mode): pass
@@ -100,7 +124,9 @@ class TAG_Base(ABC):
     @abstractmethod
     def set_value(self, value): pass
 
-    def to_snbt(self, Format=False, size=4):
+    def to_snbt(self, Format=False, size=4, canonical=False):
+        if canonical:
+            return self._to_snbt(True)
         if Format:
             if not isinstance(size, int): raise TypeError("缩进期望类型为 %s，但传入了 %s" % (int, repr(size)))
             if not 1 <= size <= 16: raise ValueError("超出范围(1 ~ 16)的数字 %s" % size)
@@ -112,7 +138,7 @@ class TAG_Base(ABC):
             return self._to_snbt()
 
     @abstractmethod
-    def _to_snbt(self): pass
+    def _to_snbt(self, canonical=False): pass
 
     @abstractmethod
     def _to_snbt_format(self, buffer, indent, size): pass
@@ -151,6 +177,7 @@ class TAG_Base(ABC):
 
 
 class TAG_Base_End(TAG_Base):
+    __slots__ = ()
 
     @classmethod
     def _from_bytesIO(buffer, mode): pass
@@ -168,7 +195,7 @@ class TAG_Base_End(TAG_Base):
 
     def set_value(self, value): pass
 
-    def _to_snbt(self): pass
+    def _to_snbt(self, canonical=False): pass
 
     def _to_snbt_format(self, buffer, indent, size): pass
 
@@ -182,6 +209,7 @@ class TAG_Base_End(TAG_Base):
 
 
 class TAG_Base_Number(TAG_Base):
+    __slots__ = ()
 
     def __hash__(self):
         return hash(self.get_value())
@@ -308,7 +336,7 @@ class TAG_Base_Number(TAG_Base):
         return self.__class__(~self.get_value())
     
     def __float__(self):
-        return tags.TAG_Double(self.get_value())
+        return float(self.get_value())
     
     def __round__(self, n=None):
         return self.__class__(round(self.get_value(), n) if n else round(self.get_value()))
@@ -318,6 +346,7 @@ class TAG_Base_Number(TAG_Base):
 
 
 class TAG_Base_String(TAG_Base):
+    __slots__ = ()
     type = TAG.STRING
     
     def __len__(self):
@@ -328,6 +357,13 @@ class TAG_Base_String(TAG_Base):
     
     def __hash__(self):
         return hash(self.get_value())
+
+    def __eq__(self, other):
+        if isinstance(other, TAG_Base_String): other = other.get_value()
+        return self.get_value() == other
+
+    def __ne__(self, other):
+        return not self == other
     
     def __format__(self, fs):
         return format(self.get_value(), fs)
@@ -348,6 +384,7 @@ class TAG_Base_String(TAG_Base):
 
 
 class TAG_Base_List(TAG_Base):
+    __slots__ = ('_watchers',)
 
     @abstractmethod
     def get_type(self): pass
@@ -364,85 +401,138 @@ class TAG_Base_List(TAG_Base):
     @abstractmethod
     def value_is_array(self): pass
 
+    @abstractmethod
+    def _peek(self): pass
+
+    @abstractmethod
+    def _child(self, index): pass
+
+    @abstractmethod
+    def _children(self): pass
+
+    @abstractmethod
+    def _mutable(self): pass
+
+    @abstractmethod
+    def _note(self, values): pass
+
+    @abstractmethod
+    def _take(self, index): pass
+
+    @abstractmethod
+    def _reset(self): pass
+
+    def _watch(self, watcher):
+        if self._watchers is None: self._watchers = WeakSet()
+        self._watchers.add(watcher)
+
+    def _unwatch(self, watcher):
+        if self._watchers is not None: self._watchers.discard(watcher)
+
+    def _notify(self, removed, added):
+        for watcher in list(self._watchers):
+            watcher._update(self, removed, added)
+
     def __add__(self, other):
         if isinstance(other, TAG_Base_List):
             if other.get_type() != self.get_type():
                 raise TypeError("TAG_List容器类型期望类型为 %s，但传入了 %s" % (self.get_type(), other.get_type()))
-            if not bool(other): return self.__class__(self)
-            return self.__class__(self.get_value() + other.get_value())
+            res = self.copy()
+            if bool(other): res.extend(other)
+            return res
         elif isinstance(other, list):
             return self.__class__(other) + self
         else:
             raise TypeError("期望类型为 %s，但传入了 %s" % ((self.__class__, list), other.__class__))
 
     def __len__(self):
-        return len(self.get_value())
+        return len(self._peek())
+
+    def __bool__(self):
+        return len(self._peek()) > 0
 
     def __iter__(self):
         if self.value_is_array():
-            return iter(TAGLIST[self.get_type()](i) for i in self.get_value())
+            return iter(TAGLIST[self.get_type()](i) for i in self._peek())
         else:
-            return iter(self.get_value())
+            return iter(self._children())
 
     def __contains__(self, item):
-        return item in self.get_value()
+        return item in self._peek()
 
     def __getitem__(self, key):
         if self.value_is_array():
-            return TAGLIST[self.get_type()](self.get_value()[key])
+            return TAGLIST[self.get_type()](self._peek()[key])
+        elif isinstance(key, slice):
+            return self._children()[key]
         else:
-            return self.get_value()[key]
+            return self._child(key)
 
     def __setitem__(self, key, value):
         value = self.test_value(value)
-        self.get_value()[key] = value
+        items = self._mutable()
+        old = items[key]
+        items[key] = value
+        self._note([value])
+        if self._watchers: self._notify([old], [value])
 
     def __delitem__(self, key):
-        del (self.get_value()[key])
+        items = self._mutable()
+        old = items[key]
+        del items[key]
+        if self._watchers: self._notify(list(old) if isinstance(key, slice) else [old], [])
 
     def __reversed__(self):
-        return self.__class__(reversed(self.get_value()))
+        res = self.copy()
+        res.reversed()
+        return res
 
     def reversed(self):
-        self.get_value().reversed()
+        self._mutable().reverse()
 
     def insert(self, key, value):
         value = self.test_value(value)
-        self.get_value().insert(key, value)
+        self._mutable().insert(key, value)
+        self._note([value])
+        if self._watchers: self._notify([], [value])
 
     def append(self, value):
         value = self.test_value(value)
-        self.get_value().append(value)
+        self._mutable().append(value)
+        self._note([value])
+        if self._watchers: self._notify([], [value])
 
     def clear(self):
-        if self.value_is_array():
-            self.set_value(array(ARRAY_TYPECODE[self.get_type()]))
-        else:
-            self.get_value().clear()
+        self._reset()
+        if self._watchers: self._notify(None, None)
 
-    def pop(self, key):
-        if self.value_is_array():
-            return TAGLIST[self.get_type()](self.get_value().pop(key))
-        else:
-            return self.get_value().pop(key)
+    def pop(self, key=-1):
+        res = self._take(key)
+        if self._watchers: self._notify([res], [])
+        return TAGLIST[self.get_type()](res) if self.value_is_array() else res
 
     def remove(self, value):
         value = self.test_value(value)
-        self.get_value().remove(value)
+        self.pop(self._peek().index(value))
 
     def extend(self, other):
         if isinstance(other, self.__class__):
             if self.get_type() != other.get_type():
                 raise TypeError("%s 和 %s 类型不一致" % (self, other))
-            self.get_value().extend(other.get_value())
+            added = list(other._peek()) if self.value_is_array() else [v.copy() for v in other._peek()]
+            self._mutable().extend(added)
+            self._note(added)
+            if self._watchers: self._notify([], added)
         else:
             try:
-                self.extend(self.__class__(other))
+                other = self.__class__(other)
             except Exception as e:
                 raise TypeError("尝试自动转换失败: %s" % e.args[0])
+            self.extend(other)
 
 
 class TAG_Base_Compound(TAG_Base):
+    __slots__ = ()
 
     @abstractmethod
     def _test_key(self, key): pass
@@ -450,118 +540,156 @@ class TAG_Base_Compound(TAG_Base):
     @abstractmethod
     def _test_value(self, value): pass
 
+    @abstractmethod
+    def _peek(self): pass
+
+    @abstractmethod
+    def _child(self, key): pass
+
+    @abstractmethod
+    def _children(self): pass
+
+    @abstractmethod
+    def _mutable(self): pass
+
+    @abstractmethod
+    def _put(self, key, value): pass
+
+    @abstractmethod
+    def _take(self, key, *default): pass
+
+    @abstractmethod
+    def _reset(self): pass
+
     def __len__(self):
-        return len(self.get_value())
+        return len(self._peek())
+
+    def __bool__(self):
+        return len(self._peek()) > 0
 
     def __getitem__(self, key):
         self._test_key(key)
-        return self.get_value()[key]
+        return self._child(key)
 
     def __setitem__(self, key, value):
         self._test_key(key) and self._test_value(value)
-        self.get_value()[key] = value
+        self._put(key, value)
 
     def __delitem__(self, key):
         self._test_key(key)
-        del self.get_value()[key]
+        self._take(key)
 
     def __iter__(self):
-        return iter(self.get_value())
+        return iter(self._peek())
 
     def __contains__(self, item):
-        return item in self.get_value()
+        return item in self._peek()
 
     def clear(self):
-        self.get_value().clear()
+        self._reset()
 
     def get(self, key, default=None):
         self._test_key(key) and self._test_value(default)
-        return self.get_value().get(key, default)
+        return self._child(key) if key in self._peek() else default
 
     def items(self):
-        return list(self.get_value().items())
+        return list(self._children().items())
 
     def keys(self):
-        return list(self.get_value().keys())
+        return list(self._peek().keys())
 
     def pop(self, key, default=None):
         self._test_key(key)
-        return self.get_value().pop(key, default)
+        return self._take(key, default)
 
     def popitem(self):
-        return self.get_value().popitem()
+        if not self._peek(): raise KeyError("popitem(): dictionary is empty")
+        key = next(reversed(self._peek()))
+        return key, self._take(key)
 
     def setdefault(self, key, default=None):
         self._test_key(key) and self._test_value(default)
-        return self.get_value().setdefault(key, default)
+        if key in self._peek(): return self._child(key)
+        self._put(key, default)
+        return default
 
     def values(self):
-        return list(self.get_value().values())
+        return list(self._children().values())
 
 
 class TAG_Base_Array(TAG_Base):
+    __slots__ = ()
     unit = ()
 
     @abstractmethod
     def test_value(self, value): pass
 
+    @abstractmethod
+    def _peek(self): pass
+
+    @abstractmethod
+    def _mutable(self): pass
+
     def __add__(self, other):
         if isinstance(other, TAG_Base_Array):
             if other.__class__ != self.__class__: raise TypeError("期望类型为 %s，但传入了 %s" % (self.__class__, other.__class__))
             if not bool(other): return self.__class__(self)
-            return self.__class__(self.get_value() + other.get_value())
+            return self.__class__(self._peek() + other._peek())
         elif isinstance(other, list):
             return self.__class__(other) + self
         elif isinstance(other, array) and other.typecode == self.unit[2]:
-            return self.__class__(self.get_value() + other)
+            return self.__class__(self._peek() + other)
         else:
             raise TypeError("期望类型为 %s，但传入了 %s" % ((self.__class__, list, array), other.__class__))
     
     def __len__(self):
-        return len(self.get_value())
+        return len(self._peek())
+
+    def __bool__(self):
+        return len(self._peek()) > 0
 
     def __iter__(self):
-        return iter(self.get_value())
+        return iter(self._peek())
 
     def __contains__(self, item):
-        return item in self.get_value()
+        return item in self._peek()
 
     def __getitem__(self, key):
-        return self.get_value()[key]
+        return self._peek()[key]
 
     def __setitem__(self, key, value):
         value = self.test_value(value)
-        self.get_value()[key] = value
+        self._mutable()[key] = value
 
     def __delitem__(self, key):
-        del (self.get_value()[key])
+        del (self._mutable()[key])
 
     def __reversed__(self):
-        return self.__class__(reversed(self.get_value()))
+        return self.__class__(self._peek()[::-1])
 
     def reversed(self):
-        self.get_value().reversed()
+        self._mutable().reverse()
 
     def insert(self, key, value):
         value = self.test_value(value)
-        self.get_value().insert(key, value)
+        self._mutable().insert(key, value)
 
     def append(self, value):
         value = self.test_value(value)
-        self.get_value().append(value)
+        self._mutable().append(value)
 
     def clear(self):
         self.set_value(array(self.unit[2]))
 
     def pop(self, key):
-        return self.get_value().pop(key)
+        return self._mutable().pop(key)
 
     def remove(self, value):
-        self.get_value().remove(value)
+        self._mutable().remove(value)
 
     def extend(self, other):
         if isinstance(other, self.__class__):
-            self.get_value().extend(other.get_value())
+            self._mutable().extend(other._peek())
         else:
             try:
                 self.extend(self.__class__(other))
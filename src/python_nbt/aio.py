@@ -0,0 +1,123 @@
+"""
+    aio.py - asyncio 文件接口
+"""
+
+
+import asyncio, os, threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+from typing import Literal
+
+from .error import *
+from .root import RootNBT
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(min(32, (os.cpu_count() or 1) + 4), thread_name_prefix="python_nbt")
+        return _executor
+
+def set_executor(executor):
+    global _executor
+    with _executor_lock:
+        _executor = executor
+
+async def run(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), func, *args)
+
+
+def read_bytes(path):
+    if not os.path.isfile(path): raise NbtFileError("路径('%s')未找到或非文件" % path)
+    with open(path, "rb") as f:
+        return f.read()
+
+def write_bytes_atomic(path, data, cancelled):
+    temp = "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+    try:
+        with open(temp, "wb") as f:
+            f.write(data)
+        if cancelled.is_set(): raise asyncio.CancelledError()
+        os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp): os.remove(temp)
+        raise
+
+async def write_file(path, render):
+    cancelled = threading.Event()
+    def job():
+        data = render()
+        if cancelled.is_set(): raise asyncio.CancelledError()
+        write_bytes_atomic(path, data, cancelled)
+        return data
+    future = asyncio.get_running_loop().run_in_executor(get_executor(), job)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        cancelled.set()
+        try:
+            await future
+        except BaseException:
+            pass
+        raise
+
+
+async def read_nbt(
+    path     : str,
+    zip_mode : Literal['none', 'gzip', 'zlib'] = None,
+    byteorder: Literal['little', 'big'] = 'little') -> RootNBT:
+    return await run(lambda: RootNBT.from_nbt(BytesIO(read_bytes(path)), zip_mode, byteorder))
+
+async def read_dat(
+    path     : str,
+    zip_mode : Literal['none', 'gzip', 'zlib'] = None,
+    byteorder: Literal['little', 'big'] = 'little') -> RootNBT:
+    return await run(lambda: RootNBT.from_dat(BytesIO(read_bytes(path)), zip_mode, byteorder))
+
+async def read_snbt(path: str) -> RootNBT:
+    return await run(lambda: RootNBT.from_snbt(StringIO(read_bytes(path).decode("utf-8"))))
+
+async def write_nbt(
+    path     : str,
+    root     : RootNBT,
+    zip_mode : Literal['none', 'gzip', 'zlib'] = 'none',
+    byteorder: Literal['little', 'big'] = 'little') -> bytes:
+    return await write_file(path, lambda: root.to_nbt(None, zip_mode, byteorder))
+
+async def write_dat(
+    path     : str,
+    root     : RootNBT,
+    zip_mode : Literal['none', 'gzip', 'zlib'] = 'none',
+    byteorder: Literal['little', 'big'] = 'little') -> bytes:
+    return await write_file(path, lambda: root.to_dat(None, zip_mode, byteorder))
+
+async def write_snbt(path: str, root: RootNBT, format=False, size=4) -> bytes:
+    return await write_file(path, lambda: root.to_snbt(None, format, size).encode("utf-8"))
+
+
+async def gather_files(paths, reader=read_nbt, limit=16, return_exceptions=False, **kwargs):
+    if limit < 1: raise ValueError("超出范围(>= 1)的数字 %s" % limit)
+    semaphore = asyncio.Semaphore(limit)
+    async def one(path):
+        async with semaphore:
+            return await reader(path, **kwargs)
+    return await asyncio.gather(*(one(p) for p in paths), return_exceptions=return_exceptions)
+
+async def iter_files(paths, reader=read_nbt, limit=16, **kwargs):
+    semaphore = asyncio.Semaphore(limit)
+    async def one(path):
+        async with semaphore:
+            try:
+                return path, await reader(path, **kwargs), None
+            except Exception as e:
+                return path, None, e
+    tasks = [asyncio.ensure_future(one(p)) for p in paths]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks: task.cancel()
@@ -1,29 +1,45 @@
 """
     builder.py - 使用代码快速创建nbt结构工具
 """
+from array import array
 from typing import Mapping, Union
-from . import tags
+from . import tags, TAG, codec as ce
 
-def test_node(v):
+def test_node(v, placeholder=False):
+    if placeholder and isinstance(v, NBT_Placeholder): return
     if not isinstance(v, NBT_Builder_Node): raise TypeError("非期望的类型 %s 应该为 %s" % (v, NBT_Builder_Node))
 
 def test_str(v):
+    if isinstance(v, NBT_Placeholder): return
     if not isinstance(v, str): raise TypeError("非期望的类型 %s 应该为 %s" % (v, str))
 
 def test_int(v):
+    if isinstance(v, NBT_Placeholder): return
     if not isinstance(v, int): raise TypeError("非期望的类型 %s 应该为 %s" % (v, int))
 
 def test_number(v):
+    if isinstance(v, NBT_Placeholder): return
     if not isinstance(v, (int, float)): raise TypeError("非期望的类型 %s 应该为 %s" % (v, (int, float)))
 
+def array_value(nodes):
+    if len(nodes) == 1 and isinstance(nodes[0], NBT_Placeholder): return nodes[0]
+    for v in nodes:
+        if isinstance(v, NBT_Placeholder): raise TypeError("数组只能整体使用占位符 %s" % v)
+        test_int(v)
+    return nodes
+
+def hole(out, value, fill):
+    if not hasattr(out, "hole"): raise ValueError("存在未填充的占位符 %s，请先使用 compile() 生成模板" % value)
+    out.hole(value.name, fill)
+
 
 class NBT_Builder:
-    def compound(self, **nodes: Union['NBT_Builder_Node', 'NBT_Builder_Proxy']):
+    def compound(self, **nodes: Union['NBT_Builder_Node', 'NBT_Builder_Proxy', 'NBT_Placeholder']):
         _nodes = {}
         for k, v in nodes.items():
             if isinstance(v, NBT_Builder_Proxy):
                 k, v = v.name, v.node
-            test_node(v)
+            test_node(v, True)
             _nodes[k] = v
         return self.return_node(NBT_Compound_Builder_Node(_nodes))
 
@@ -33,19 +49,13 @@ class NBT_Builder:
         return self.return_node(NBT_List_Builder_Node(nodes))
 
     def byte_array(self, *nodes: int) -> 'NBT_ByteArray_Builder_Node':
-        for v in nodes:
-            test_int(v)
-        return self.return_node(NBT_ByteArray_Builder_Node(nodes))
+        return self.return_node(NBT_ByteArray_Builder_Node(array_value(nodes)))
 
     def int_array(self, *nodes: int) -> 'NBT_IntArray_Builder_Node':
-        for v in nodes:
-            test_int(v)
-        return self.return_node(NBT_IntArray_Builder_Node(nodes))
+        return self.return_node(NBT_IntArray_Builder_Node(array_value(nodes)))
 
     def long_array(self, *nodes: int) -> 'NBT_LongArray_Builder_Node':
-        for v in nodes:
-            test_int(v)
-        return self.return_node(NBT_LongArray_Builder_Node(nodes))
+        return self.return_node(NBT_LongArray_Builder_Node(array_value(nodes)))
 
     def byte(self, v: int) -> 'NBT_Byte_Builder_Node':
         test_int(v)
@@ -72,13 +82,16 @@ class NBT_Builder:
         return self.return_node(NBT_Double_Builder_Node(v))
 
     def string(self, v: str) -> 'NBT_String_Builder_Node':
-        test_number(v)
+        test_str(v)
         return self.return_node(NBT_String_Builder_Node(v))
 
     def key(self, s: str) -> 'NBT_Builder_Proxy':
         test_str(s)
         return NBT_Builder_Proxy(s)
-    
+
+    def var(self, name: str) -> 'NBT_Placeholder':
+        return NBT_Placeholder(name)
+
     def return_node(self, node):
         return node
 
@@ -98,29 +111,98 @@ class NBT_Builder:
 class NBT_Builder_Proxy(NBT_Builder):
     def __init__(self, name):
         self.name = name
-    
+
     def return_node(self, node):
         self.node = node
         return self
 
 
+class NBT_Placeholder:
+    def __init__(self, name):
+        if not isinstance(name, str): raise TypeError("非期望的类型 %s 应该为 %s" % (name, str))
+        self.name = name
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.name}>"
+
+
 class NBT_Builder_Node:
     tag = tags.TAG_End
     def __init__(self, value):
         self.value = value
-    
+
     def build(self):
+        if isinstance(self.value, NBT_Placeholder): raise ValueError("存在未填充的占位符 %s" % self.value)
         return self.tag(self.value)
 
+    def _pack(self, value, mode):
+        return ce.pack_data(value, self.tag.type, mode)
+
+    def _text(self, value):
+        return f"{value}{self.tag.unit}"
+
+    def _write(self, out, mode):
+        if isinstance(self.value, NBT_Placeholder):
+            hole(out, self.value, lambda v: self._pack(v, mode))
+        else:
+            out += self._pack(self.value, mode)
+
+    def _snbt(self, out):
+        if isinstance(self.value, NBT_Placeholder):
+            hole(out, self.value, self._text)
+        else:
+            out.append(self._text(self.value))
+
+    def to_bytes(self, byteorder='little') -> bytes:
+        out = bytearray()
+        self._write(out, byteorder == 'big')
+        return bytes(out)
+
+    def to_snbt(self) -> str:
+        out = []
+        self._snbt(out)
+        return ''.join(out)
+
+    def to_nbt(self, target=None, zip_mode='none', byteorder='little', root_name='') -> bytes:
+        from .root import compress_file, write_file
+        data = compress_file(root_header(self, root_name, byteorder == 'big') + self.to_bytes(byteorder), zip_mode)
+        if target is not None: write_file(target, data)
+        return data
+
+    def compile(self, byteorder='little', root_name=None) -> 'NBT_Template':
+        return NBT_Template(self, byteorder, root_name)
+
 
 class NBT_Compound_Builder_Node(NBT_Builder_Node):
     tag = tags.TAG_Compound
     def build(self):
         v = self.tag()
-        print(self.value)
+        for k, n in self.value.items():
+            if isinstance(n, NBT_Placeholder): raise ValueError("存在未填充的占位符 %s" % n)
         v.set_value({k: v.build() for k, v in self.value.items()})
         return v
 
+    def _write(self, out, mode):
+        for k, v in self.value.items():
+            name = ce.length_to_bytes(len(b := ce.pack_data(k, TAG.STRING)), mode) + b
+            if isinstance(v, NBT_Placeholder):
+                hole(out, v, lambda value, name=name: pack_entry(name, value, mode))
+                continue
+            out.append(v.tag.type.value)
+            out += name
+            v._write(out, mode)
+        out.append(0)
+
+    def _snbt(self, out):
+        out.append("{")
+        for i, (k, v) in enumerate(self.value.items()):
+            out.append(f"{',' if i else ''}{ce.str_to_snbt_key(k)}:")
+            if isinstance(v, NBT_Placeholder):
+                hole(out, v, entry_snbt)
+            else:
+                v._snbt(out)
+        out.append("}")
+
 
 class NBT_List_Builder_Node(NBT_Builder_Node):
     tag = tags.TAG_List
@@ -129,14 +211,45 @@ class NBT_List_Builder_Node(NBT_Builder_Node):
         v.set_value([v.build() for v in self.value])
         return v
 
+    def item_type(self):
+        if not self.value: return TAG.END
+        types = {v.tag.type for v in self.value}
+        if len(types) != 1: raise TypeError("列表内元素的类型不一致 %s" % types)
+        return types.pop()
+
+    def _write(self, out, mode):
+        out.append(self.item_type().value)
+        out += ce.pack_data(len(self.value), TAG.INT, mode)
+        for v in self.value:
+            v._write(out, mode)
+
+    def _snbt(self, out):
+        self.item_type()
+        out.append("[")
+        for i, v in enumerate(self.value):
+            if i: out.append(",")
+            v._snbt(out)
+        out.append("]")
+
 
 class NBT_Array_Builder_Node(NBT_Builder_Node):
     tag = tags.TAG_Array
     def build(self):
+        if isinstance(self.value, NBT_Placeholder): raise ValueError("存在未填充的占位符 %s" % self.value)
         v = self.tag()
-        v.set_value(self.value)
+        v.set_value(list(self.value))
         return v
 
+    def _pack(self, value, mode):
+        try:
+            value = value if isinstance(value, array) and value.typecode == self.tag.unit[2] else array(self.tag.unit[2], value)
+        except OverflowError:
+            raise ValueError("超出范围%s的数字" % (self.tag.range,))
+        return ce.pack_data(len(value), TAG.INT, mode) + ce.array_to_bytes(value, mode)
+
+    def _text(self, value):
+        return f"[{self.tag.unit[0]};" + ','.join([f"{i}{self.tag.unit[1]}" for i in value]) + "]"
+
 
 class NBT_ByteArray_Builder_Node(NBT_Array_Builder_Node):
     tag = tags.TAG_ByteArray
@@ -177,3 +290,91 @@ class NBT_Double_Builder_Node(NBT_Builder_Node):
 class NBT_String_Builder_Node(NBT_Builder_Node):
     tag = tags.TAG_String
 
+    def _pack(self, value, mode):
+        return ce.length_to_bytes(len(b := ce.pack_data(value, TAG.STRING)), mode) + b
+
+    def _text(self, value):
+        if not isinstance(value, str): raise TypeError("非期望的类型 %s 应该为 %s" % (value, str))
+        return ce.str_to_string(value)
+
+
+def root_header(node, root_name, mode):
+    if not isinstance(node, (NBT_Compound_Builder_Node, NBT_List_Builder_Node)):
+        raise TypeError("根节点的期望类型为 %s，但传入了 %s" % ((NBT_Compound_Builder_Node, NBT_List_Builder_Node), node))
+    name = ce.pack_data(root_name, TAG.STRING)
+    return bytes((node.tag.type.value,)) + ce.length_to_bytes(len(name), mode) + name
+
+def pack_entry(name, value, mode):
+    if isinstance(value, NBT_Builder_Node):
+        return bytes((value.tag.type.value,)) + name + value.to_bytes('big' if mode else 'little')
+    if isinstance(value, tags.TAG_Base):
+        return bytes((value.type.value,)) + name + value.to_bytes(mode)
+    raise TypeError("占位符的期望类型为 %s，但传入了 %s" % ((NBT_Builder_Node, tags.TAG_Base), value))
+
+def entry_snbt(value):
+    if isinstance(value, NBT_Builder_Node): return value.to_snbt()
+    if isinstance(value, tags.TAG_Base): return value._to_snbt()
+    raise TypeError("占位符的期望类型为 %s，但传入了 %s" % ((NBT_Builder_Node, tags.TAG_Base), value))
+
+
+class Template_Bytes(bytearray):
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+
+    def hole(self, name, fill):
+        if self: self.parts.append(bytes(self))
+        self.clear()
+        self.parts.append((name, fill))
+
+    def finish(self):
+        if self: self.parts.append(bytes(self))
+        return self.parts
+
+
+class Template_Text(list):
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+
+    def hole(self, name, fill):
+        if self: self.parts.append(''.join(self))
+        self.clear()
+        self.parts.append((name, fill))
+
+    def finish(self):
+        if self: self.parts.append(''.join(self))
+        return self.parts
+
+
+class NBT_Template:
+    def __init__(self, node: NBT_Builder_Node, byteorder='little', root_name=None):
+        test_node(node)
+        self.node = node
+        self.byteorder = byteorder
+        self.root_name = root_name
+        out = Template_Bytes()
+        if root_name is not None: out += root_header(node, root_name, byteorder == 'big')
+        node._write(out, byteorder == 'big')
+        self.parts = out.finish()
+        self.names = frozenset(p[0] for p in self.parts if isinstance(p, tuple))
+        self.text_parts = None
+
+    def fill(self, parts, values):
+        if not self.names <= values.keys():
+            raise KeyError("缺少占位符 %s" % ", ".join(sorted(self.names - values.keys())))
+        return [p if p.__class__ is not tuple else p[1](values[p[0]]) for p in parts]
+
+    def to_bytes(self, **values) -> bytes:
+        return b''.join(self.fill(self.parts, values))
+
+    def to_snbt(self, **values) -> str:
+        if self.text_parts is None:
+            out = Template_Text()
+            if self.root_name is not None: out.append(f"{ce.str_to_snbt_key(self.root_name)}:")
+            self.node._snbt(out)
+            self.text_parts = out.finish()
+        return ''.join(self.fill(self.text_parts, values))
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {sorted(self.names)} at 0x{id(self)}>"
@@ -0,0 +1,170 @@
+"""
+    cache.py - 解码结果的磁盘缓存
+
+    以 路径 + 修改时间 + 大小 + inode(或文件内容的摘要) 为键，保存解压后的 nbt 数据以及每个复合标签/列表的结束偏移，
+    再次读取同一文件时直接 mmap 缓存文件并延迟解码，跳过解压与完整解码。
+    缓存文件通过临时文件 + os.replace 原子写入，多个进程可以同时读写同一个缓存目录。
+"""
+
+
+import mmap, os, time
+from hashlib import blake2b
+from io import BytesIO
+from struct import Struct, error as StructError
+from typing import Literal
+
+from . import TAG, instrument, mapped, codec as ce
+from .error import *
+from .root import RootNBT, read_file, decompress_buffer, parse_nbt
+
+HEAD = Struct('<4sBBBxQQ')
+MAGIC = b'NBTC'
+VERSION = 1
+SUFFIX = '.nbtc'
+
+
+def align(n):
+    return (n + 7) & ~7
+
+
+class NbtCache:
+    def __init__(self, directory: str, max_size: int = 1 << 30, key: Literal['stat', 'content'] = 'stat'):
+        if key not in ('stat', 'content'): raise ValueError("key 期望为 'stat' 或 'content'，但传入了 %s" % repr(key))
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_size = max_size
+        self.key = key
+
+    def entry_key(self, path: str, zip_mode, mode: bool, header: bool, data: bytes = None) -> str:
+        h = blake2b(repr((zip_mode, bool(mode), bool(header), VERSION)).encode(), digest_size=20)
+        if self.key == 'content':
+            h.update(read_file(path) if data is None else data)
+        else:
+            st = os.stat(path)
+            h.update(repr((os.path.abspath(path), st.st_mtime_ns, st.st_size, st.st_ino)).encode())
+        return h.hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + SUFFIX)
+
+    # === 读取 ===
+    def load(self, path: str, zip_mode=None, mode: bool = False, header: bool = False, lazy: bool = True):
+        call = instrument.current()
+        data = read_file(path) if self.key == 'content' else None
+        entry = self.entry_path(self.entry_key(path, zip_mode, mode, header, data))
+        res = self.open_entry(entry, mode, lazy)
+        if res is not None:
+            if call:
+                call.mark("cache")
+                call.count("disk_cache_hits", 1)
+            return res
+        if call: call.count("disk_cache_misses", 1)
+        if data is None: data = read_file(path)
+        buf = decompress_buffer(BytesIO(data), zip_mode).getvalue()
+        if call: call.mark("decompress")
+        if header: buf = buf[8:]
+        try:
+            t = buf[0]
+            if t not in (TAG.COMPOUND.value, TAG.LIST.value):
+                raise NbtDataError("数据的根标签必须是TAG_Compound或TAG_List，但实际是 %s" % (TAG(t) if t in TAG._value2member_map_ else t))
+            pos = 3 + mapped.LENGTHS[mode].unpack_from(buf, 1)[0]
+            ends, end = mapped.scan_ends(buf, pos, t, mode)
+        except (IndexError, ValueError, StructError) as e:
+            if isinstance(e, NbtDataError): raise
+            raise NbtParseError("ELO Error，数据不完整: %s" % e)
+        if end > len(buf): raise NbtParseError("ELO Error，期望%s字节，实际为%s字节" % (end, len(buf)))
+        self.store(entry, buf, mode, ends)
+        if call: call.mark("cache")
+        self.evict()
+        if lazy: return mapped.load(buf, 'none', mode, False, ends)
+        return parse_nbt(BytesIO(buf), mode)
+
+    def open_entry(self, entry: str, mode: bool, lazy: bool):
+        try:
+            with open(entry, 'rb') as f:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+        try:
+            magic, version, byteorder, native, size, count = HEAD.unpack_from(buf, 0)
+            start = align(HEAD.size + size)
+            if (magic, version, byteorder, native) != (MAGIC, VERSION, mode, ce.NATIVE_BIG) or len(buf) != start + 16 * count:
+                buf.close()
+                return None
+        except StructError:
+            buf.close()
+            return None
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        view = memoryview(buf)
+        data = view[HEAD.size:HEAD.size + size]
+        if not lazy: return parse_nbt(BytesIO(data), mode)
+        ends = mapped.EndIndex(view[start:start + 8 * count].cast('q'), view[start + 8 * count:].cast('q'))
+        return mapped.load(data, 'none', mode, False, ends)
+
+    # === 写入 ===
+    def store(self, entry: str, buf: bytes, mode: bool, ends):
+        head = HEAD.pack(MAGIC, VERSION, mode, ce.NATIVE_BIG, len(buf), len(ends))
+        temp = "%s.%d.%d.tmp" % (entry, os.getpid(), time.monotonic_ns())
+        try:
+            with open(temp, 'wb') as f:
+                f.write(head)
+                f.write(buf)
+                f.write(bytes(align(len(head) + len(buf)) - len(head) - len(buf)))
+                f.write(ends.starts.tobytes())
+                f.write(ends.ends.tobytes())
+            os.replace(temp, entry)
+        except OSError:
+            try: os.remove(temp)
+            except OSError: pass
+
+    def entries(self) -> list:
+        res = []
+        try:
+            it = os.scandir(self.directory)
+        except FileNotFoundError:
+            return res
+        with it:
+            for e in it:
+                if not e.name.endswith(SUFFIX): continue
+                try:
+                    st = e.stat()
+                except FileNotFoundError:
+                    continue
+                res.append((st.st_mtime_ns, st.st_size, e.path))
+        return res
+
+    def size(self) -> int:
+        return sum(e[1] for e in self.entries())
+
+    def __len__(self):
+        return len(self.entries())
+
+    def evict(self, max_size: int = None):
+        max_size = self.max_size if max_size is None else max_size
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_size: break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        self.evict(0)
+
+    # === 便捷方法 ===
+    def from_nbt(self, path: str, zip_mode: Literal['none', 'gzip', 'zlib'] = None, byteorder: Literal['little', 'big'] = 'little', lazy: bool = True) -> RootNBT:
+        return RootNBT.from_nbt(path, zip_mode, byteorder, lazy, cache=self)
+
+    def from_dat(self, path: str, zip_mode: Literal['none', 'gzip', 'zlib'] = 'none', byteorder: Literal['little', 'big'] = 'little', lazy: bool = True) -> RootNBT:
+        return RootNBT.from_dat(path, zip_mode, byteorder, lazy, cache=self)
+
+    def __repr__(self):
+        return "<NbtCache directory=%s max_size=%d key=%s>" % (self.directory, self.max_size, self.key)
@@ -0,0 +1,261 @@
+"""
+    cli.py - 命令行工具 (python -m python_nbt)
+"""
+
+
+import argparse, json, os, re, sys, time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO, StringIO
+
+from . import TAGLIST, codec as ce
+from .error import *
+from .root import RootNBT
+from .tags import TAG_List
+
+SOURCE_FORMATS = {
+    ".nbt" : "nbt",
+    ".dat" : "dat",
+    ".snbt": "snbt",
+    ".json": "json",
+}
+
+TARGET_SUFFIX = {
+    "nbt"        : ".nbt",
+    "dat"        : ".dat",
+    "snbt"       : ".snbt",
+    "snbt-pretty": ".snbt",
+    "json"       : ".json",
+}
+
+MANIFEST_NAME = ".python_nbt_convert.json"
+
+INT_VALUE = re.compile(r'-?\d+')
+FLOAT_VALUE = re.compile(r'-?(\d+\.\d*|\.\d+)([eE][-+]?\d+)?')
+TYPED_VALUE = re.compile(r'-?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?([bBsSlLfFdD])')
+
+
+def read_root(path, source, byteorder, typed=False):
+    if source == "json":
+        with open(path, "rb") as f:
+            return RootNBT.from_json(f.read(), typed)
+    if source == "snbt":
+        with open(path, "r", encoding="utf-8") as f:
+            return RootNBT.from_snbt(StringIO(f.read()))
+    with open(path, "rb") as f:
+        data = BytesIO(f.read())
+    if source == "dat":
+        return RootNBT.from_dat(data, None, byteorder)
+    return RootNBT.from_nbt(data, None, byteorder)
+
+def render_root(root, target, zip_mode, byteorder, indent, typed=False):
+    if target == "nbt":
+        return root.to_nbt(None, zip_mode, byteorder)
+    if target == "dat":
+        return root.to_dat(None, zip_mode, byteorder)
+    if target == "snbt":
+        return root.to_snbt().encode("utf-8")
+    if target == "snbt-pretty":
+        return root.to_snbt(format=True, size=indent).encode("utf-8")
+    if target == "json":
+        return root.to_json(None, typed, indent or None)
+    raise ValueError("未知的目标格式 %s" % target)
+
+def write_atomic(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp = "%s.%d.tmp" % (path, os.getpid())
+    try:
+        with open(temp, "wb") as f:
+            f.write(data)
+        os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp): os.remove(temp)
+        raise
+
+def convert_file(job):
+    src, dst, source, options = job
+    try:
+        root = read_root(src, source, options["from_byteorder"], options["typed"])
+        data = render_root(root, options["to"], options["zip"], options["byteorder"], options["indent"], options["typed"])
+        write_atomic(dst, data)
+    except Exception as e:
+        return src, "%s: %s" % (e.__class__.__name__, e)
+    return src, None
+
+def collect_files(source_dir, output_dir, source, target):
+    output_dir = os.path.abspath(output_dir)
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != output_dir)
+        for name in sorted(files):
+            if name == MANIFEST_NAME: continue
+            base, ext = os.path.splitext(name)
+            fmt = source if source != "auto" else SOURCE_FORMATS.get(ext.lower())
+            if fmt is None: continue
+            src = os.path.join(root, name)
+            rel = os.path.relpath(src, source_dir)
+            dst = os.path.join(output_dir, os.path.relpath(root, source_dir), base + TARGET_SUFFIX[target])
+            yield rel, src, os.path.normpath(dst), fmt
+
+def load_manifest(path, options):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("options") != options: return {}
+    return manifest.get("files", {})
+
+def save_manifest(path, options, files):
+    data = json.dumps({"options": options, "files": files}, ensure_ascii=False)
+    write_atomic(path, data.encode("utf-8"))
+
+
+class Progress:
+    def __init__(self, total, quiet=False, stream=sys.stderr):
+        self.total, self.quiet, self.stream = total, quiet, stream
+        self.done = self.ok = self.skipped = self.failed = 0
+        self.last = 0.0
+
+    def update(self, status):
+        self.done += 1
+        setattr(self, status, getattr(self, status) + 1)
+        now = time.monotonic()
+        if self.quiet or (now - self.last < 0.1 and self.done != self.total): return
+        self.last = now
+        self.stream.write("\r转换中 %d/%d  成功 %d  跳过 %d  失败 %d" % (self.done, self.total, self.ok, self.skipped, self.failed))
+        self.stream.flush()
+
+    def close(self):
+        if not self.quiet and self.total: self.stream.write("\n")
+
+
+def convert_directory(source_dir, output_dir, to="nbt", zip_mode="none", byteorder="little",
+    source="auto", from_byteorder="little", indent=4, workers=None, force=False, quiet=False, typed=False):
+    if not os.path.isdir(source_dir): raise NbtFileError("路径('%s')非目录" % source_dir)
+    if to not in TARGET_SUFFIX: raise ValueError("未知的目标格式 %s" % to)
+    options = {
+        "to": to, "zip": zip_mode, "byteorder": byteorder, "indent": indent,
+        "source": source, "from_byteorder": from_byteorder, "typed": typed,
+    }
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = {} if force else load_manifest(manifest_path, options)
+    files, jobs, stats = {}, [], {}
+    for rel, src, dst, fmt in collect_files(source_dir, output_dir, source, to):
+        st = os.stat(src)
+        stats[src] = rel, [st.st_mtime_ns, st.st_size]
+        if manifest.get(rel) == stats[src][1] and os.path.exists(dst):
+            files[rel] = stats[src][1]
+            continue
+        jobs.append((src, dst, fmt, options))
+    progress = Progress(len(jobs) + len(files), quiet)
+    for _ in files: progress.update("skipped")
+    errors = []
+    if workers == 1 or len(jobs) <= 1:
+        results = map(convert_file, jobs)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(workers)
+        results = executor.map(convert_file, jobs, chunksize=max(1, min(64, len(jobs) // ((workers or os.cpu_count() or 1) * 8))))
+    try:
+        for src, error in results:
+            rel, stat = stats[src]
+            if error is None:
+                files[rel] = stat
+                progress.update("ok")
+            else:
+                errors.append((rel, error))
+                progress.update("failed")
+    finally:
+        if executor is not None: executor.shutdown(cancel_futures=True)
+        progress.close()
+        os.makedirs(output_dir, exist_ok=True)
+        save_manifest(manifest_path, options, files)
+    return progress, errors
+
+
+def parse_match(text):
+    key, sep, value = text.partition("=")
+    if not sep: return key, None
+    if INT_VALUE.fullmatch(value): return key, int(value)
+    if FLOAT_VALUE.fullmatch(value): return key, float(value)
+    match = TYPED_VALUE.fullmatch(value)
+    if match:
+        unit = match.group(3).lower()
+        cls = next(c for c in TAGLIST.values() if getattr(c, "unit", None) == unit)
+        return key, cls.from_snbt(value)
+    if value[:1] == "[": return key, TAG_List.from_snbt(value)
+    if value[:1] in "\"'" and len(value) > 1 and value[-1] == value[0]: return key, ce.string_to_str(value)
+    return key, value
+
+def format_value(value):
+    if isinstance(value, str): return ce.str_to_string(value)
+    if isinstance(value, list): return "[%s]" % ",".join(map(str, value))
+    return str(value)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m python_nbt", description="Minecraft NBT 命令行工具")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="批量转换目录中的 nbt/dat/snbt/json 文件")
+    convert.add_argument("source", help="源目录")
+    convert.add_argument("output", help="输出目录")
+    convert.add_argument("--to", choices=list(TARGET_SUFFIX), default="nbt", help="目标格式")
+    convert.add_argument("--zip", choices=["none", "gzip", "zlib"], default="none", help="目标压缩方式 (nbt/dat)")
+    convert.add_argument("--byteorder", choices=["little", "big"], default="little", help="目标字节序 (nbt/dat)")
+    convert.add_argument("--from", dest="source_format", choices=["auto", "nbt", "dat", "snbt", "json"], default="auto", help="源格式，auto 按扩展名判断")
+    convert.add_argument("--from-byteorder", choices=["little", "big"], default="little", help="源字节序 (nbt/dat)")
+    convert.add_argument("--indent", type=int, default=4, help="snbt-pretty/json 的缩进")
+    convert.add_argument("--typed", action="store_true", help="json 带类型后缀 (如 \"Health@f\")，可无损转换回 nbt")
+    convert.add_argument("-j", "--workers", type=int, default=None, help="进程数，默认为 CPU 数")
+    convert.add_argument("--force", action="store_true", help="忽略记录，重新转换所有文件")
+    convert.add_argument("-q", "--quiet", action="store_true", help="不显示进度")
+    convert.set_defaults(handler=run_convert)
+
+    search = commands.add_parser("search", help="查找包含指定键/值的 nbt/dat 文件")
+    search.add_argument("source", nargs="+", help="目录(递归查找 .dat/.nbt/.dat_old)或文件")
+    search.add_argument("-m", "--match", action="append", required=True, metavar="KEY[=VALUE]",
+        help="搜索条件，可重复，任一条件命中即输出；KEY 为键名或路径(如 Inventory[].id)，VALUE 可带 snbt 类型后缀(如 1b、[I;1,2,3,4])")
+    search.add_argument("--zip", choices=["none", "gzip", "zlib"], default=None, help="压缩方式，默认自动判断")
+    search.add_argument("--byteorder", choices=["little", "big"], default="little", help="字节序")
+    search.add_argument("--header", action="store_true", help="数据带有 8 字节的文件头 (基岩版 level.dat)")
+    search.add_argument("-l", "--files-only", action="store_true", help="只输出命中的文件名")
+    search.add_argument("-j", "--workers", type=int, default=None, help="进程数，默认为 CPU 数")
+    search.add_argument("-q", "--quiet", action="store_true", help="不显示统计")
+    search.set_defaults(handler=run_search)
+    return parser
+
+def run_convert(args):
+    progress, errors = convert_directory(
+        args.source, args.output, args.to, args.zip, args.byteorder,
+        args.source_format, args.from_byteorder, args.indent, args.workers, args.force, args.quiet, args.typed)
+    for rel, error in errors:
+        sys.stderr.write("失败 %s: %s\n" % (rel, error))
+    if not args.quiet:
+        sys.stderr.write("完成：成功 %d  跳过 %d  失败 %d\n" % (progress.ok, progress.skipped, progress.failed))
+    return 1 if errors else 0
+
+def run_search(args):
+    from .search import search, collect_files
+    source = [path for s in args.source for path in collect_files(s)]
+    result = search(source, [parse_match(m) for m in args.match], args.zip, args.byteorder, args.header, args.workers)
+    seen = set()
+    for hit in result.hits:
+        if args.files_only:
+            if hit.file in seen: continue
+            seen.add(hit.file)
+            sys.stdout.write("%s\n" % hit.file)
+        else:
+            sys.stdout.write("%s\t%s=%s\n" % (hit.file, hit.path, format_value(hit.value) if hit.value is not None else ""))
+    for path, error in result.errors:
+        sys.stderr.write("失败 %s: %s\n" % (path, error))
+    if not args.quiet:
+        sys.stderr.write("完成：文件 %d  预筛选通过 %d  命中 %d  失败 %d\n" % (result.files, result.candidates, len(result.hits), len(result.errors)))
+    return 1 if result.errors else 0
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except (NbtFileError, NbtPathError, SnbtParseError, SnbtTokenError, ValueError) as e:
+        sys.stderr.write("错误：%s\n" % e)
+        return 2
@@ -3,7 +3,8 @@
 """
 
 
-import re
+import re, sys
+from array import array
 from struct import Struct
 from typing import Union
 from . import TAG
@@ -51,18 +52,24 @@ string_to_str_rule = {
     "\\'" : "'",
     "\\n" : "\n",
     "\\r" : "\r",
+    "\\t" : "\t",
+    "\\b" : "\b",
+    "\\f" : "\f",
+    "\\/" : "/",
 }
 
 bytes_tag_type = {v: k for k, v in tag_type_bytes.items()}
 
 length_bytes_formats = (Struct('>H'), Struct('<H'))
 
-str_snbt_key = re.compile(r"^[a-zA-Z0-9_+-.]*$")
+NATIVE_BIG = sys.byteorder == 'big'
 
-string_to_str_re = re.compile(r'(?i)\\u[a-fA-F0-9]{4}|\\.')
+str_snbt_key = re.compile(r"^[a-zA-Z0-9_+\-.]*$")
 
+string_to_str_re = re.compile(r'(?i)\\ud[89ab][a-f0-9]{2}\\ud[c-f][a-f0-9]{2}|\\u[a-f0-9]{4}|\\.', re.S)
 
-@lru_cache(maxsize=None)
+
+@lru_cache(maxsize=65536)
 def pack_data(data: Union[int, float, str], data_type: TAG, mode=False) -> bytes:
     if data_type in [TAG.END, TAG.LIST, TAG.COMPOUND, TAG.BYTE_ARRAY, TAG.INT_ARRAY, TAG.LONG_ARRAY]:
         raise TypeError("仅支持数字，字符串类型")
@@ -91,7 +98,7 @@ def pack_data(data: Union[int, float, str], data_type: TAG, mode=False) -> bytes
     
     raise TypeError("期望类型为 %s，但传入了 %s" % (TAG, data_type.__class__))
 
-@lru_cache(maxsize=None)
+@lru_cache(maxsize=65536)
 def unpack_data(data: bytes, data_type: TAG, mode=False) -> Union[int, float, str]:
     if data_type in [TAG.END, TAG.LIST, TAG.COMPOUND, TAG.BYTE_ARRAY, TAG.INT_ARRAY, TAG.LONG_ARRAY]:
         raise TypeError("仅支持数字，字符串类型")
@@ -120,6 +127,13 @@ def unpack_data(data: bytes, data_type: TAG, mode=False) -> Union[int, float, st
     
     raise TypeError("期望类型为 %s，但传入了 %s" % (TAG, data_type.__class__))
 
+def array_to_bytes(data: array, mode=False) -> bytes:
+    if bool(mode) == NATIVE_BIG or data.itemsize == 1:
+        return data.tobytes()
+    data = array(data.typecode, data)
+    data.byteswap()
+    return data.tobytes()
+
 def bytes_to_tag_type(data: bytes) -> TAG:
     if not isinstance(data, bytes):
         raise TypeError("类型错误")
@@ -142,6 +156,7 @@ def str_to_snbt_key(data: str) -> str:
     if str_snbt_key.fullmatch(data):
         return data
     else:
+        data = data.replace('\\', '\\\\')
         if   '"' in     data and "'" in     data:
             return '"' + data.replace('"', '\\"') + '"'
         elif '"' in     data and "'" not in data:
@@ -157,8 +172,10 @@ def str_to_string(data: str) -> str:
 def string_to_str(data: str) -> str:
     def replace_string_to_str(m):
         s = m.group(0)
-        if s[0:2] == "\\u":
-            return s
+        if s[0:2] in ("\\u", "\\U"):
+            if len(s) == 12:
+                return chr(0x10000 + ((int(s[2:6], 16) - 0xD800) << 10) + int(s[8:12], 16) - 0xDC00)
+            return chr(int(s[2:], 16))
         else:
             res = string_to_str_rule.get(s, None)
         if res is None:
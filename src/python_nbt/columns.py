@@ -0,0 +1,248 @@
+"""
+    columns.py - 复合标签列表与列式数据之间的相互转换
+
+    cols = columns.to_columns(entities, ["id", "Pos", "Health", "Owner"])
+    cols["Pos[1]"], cols.masks["Health"]      # array.array(或 numpy 数组) 列，以及缺失值掩码(1 表示该行没有此字段)
+    嵌套的复合标签展开为 "tag.Damage" 形式的列，数字列表/数组(如 Pos、Motion、UUID)按下标展开为 "Pos[0]" 等列，
+    空的复合标签记为类型为 TAG.COMPOUND 的列(值全为 0，掩码为 0 的行在该位置有一个空复合标签)。
+"""
+
+
+from array import array
+from typing import Union
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import TAG, TAGLIST, path as nbt_path
+from .abc import ARRAY_TYPECODE
+from .error import *
+from .patch import key_path
+from .tags import TAG_List, TAG_Compound
+
+INTEGERS = (TAG.BYTE, TAG.SHORT, TAG.INT, TAG.LONG)
+FLOATS = (TAG.FLOAT, TAG.DOUBLE)
+ARRAY_ITEMS = {TAG.BYTE_ARRAY: TAG.BYTE, TAG.INT_ARRAY: TAG.INT, TAG.LONG_ARRAY: TAG.LONG}
+TYPECODE_TAGS = {"b": TAG.BYTE, "h": TAG.SHORT, "i": TAG.INT, "q": TAG.LONG, "f": TAG.FLOAT, "d": TAG.DOUBLE}
+SIZE_TAGS = {("i", 1): TAG.BYTE, ("i", 2): TAG.SHORT, ("i", 4): TAG.INT, ("i", 8): TAG.LONG, ("f", 4): TAG.FLOAT, ("f", 8): TAG.DOUBLE}
+
+
+class Columns(dict):
+    """
+    列名 -> 列；masks 为同名的缺失值掩码，types 为每列的标签类型，containers 记录按下标展开的列来自 TAG_List 还是数组。
+    """
+    def __init__(self, size, columns=(), masks=None, types=None, containers=None):
+        super().__init__(columns)
+        self.size = size
+        self.masks = {} if masks is None else masks
+        self.types = {} if types is None else types
+        self.containers = {} if containers is None else containers
+
+    def __repr__(self):
+        return "<Columns rows=%d columns=%s>" % (self.size, list(self))
+
+
+def widen(a, b, name):
+    if a is None or a == b: return b
+    if a in INTEGERS and b in INTEGERS: return max(a, b, key=INTEGERS.index)
+    if a in INTEGERS + FLOATS and b in INTEGERS + FLOATS: return TAG.DOUBLE
+    raise NbtDataError("列 %s 中同时存在 %s 与 %s 类型的值" % (name, a, b))
+
+def compile_field(field):
+    steps = nbt_path.compile(field).steps
+    if any(s.kind not in ("key", "index") or s.pattern is not None for s in steps):
+        raise NbtPathError("列字段 %s 只能包含键名与下标" % field)
+    if any(s.kind == "index" for s in steps[:-1]) or (steps[-1].kind == "index" and steps[-1].index < 0):
+        raise NbtPathError("列字段 %s 只能在末尾使用非负下标" % field)
+    return [s.name if s.kind == "key" else s.index for s in steps]
+
+def resolve(tag, keys):
+    for k in keys:
+        if tag.type != TAG.COMPOUND: return None
+        tag = tag._peek().get(k)
+        if tag is None: return None
+    return tag
+
+def format_keys(keys) -> str:
+    res = ""
+    for k in keys:
+        res = "%s[%d]" % (res, k) if isinstance(k, int) else key_path(res, k)
+    return res
+
+def flatten(tag, prefix, out):
+    for k, v in tag._peek().items():
+        name = key_path(prefix, k)
+        if v.type == TAG.COMPOUND and len(v): flatten(v, name, out)
+        else: out.append((name, v))
+
+
+class Collector:
+    def __init__(self):
+        self.columns = {}
+        self.types = {}
+        self.containers = {}
+
+    def add(self, row, name, tag, strict=True):
+        t = tag.type
+        if t in INTEGERS or t in FLOATS or t == TAG.STRING:
+            self.put(row, name, t, tag.get_value())
+        elif t == TAG.COMPOUND and not len(tag):
+            self.put(row, name, t, 0)
+        elif self.sequence(name, tag):
+            for i, v in enumerate(tag._peek()): self.put(row, "%s[%d]" % (name, i), self.item_type(tag), v if isinstance(v, (int, float)) else v.get_value())
+        elif strict:
+            raise NbtDataError("列 %s 的值为 %s，不能转换为列" % (name, t if t != TAG.LIST else "%s(%s)" % (t, tag.get_type())))
+
+    def add_item(self, row, name, tag, index):
+        if not self.sequence(name, tag): raise NbtDataError("列 %s[%d] 的值为 %s，不能按下标转换为列" % (name, index, tag.type))
+        value = tag._peek()
+        if index < len(value): self.put(row, "%s[%d]" % (name, index), self.item_type(tag), value[index] if isinstance(value, array) else value[index].get_value())
+
+    def sequence(self, name, tag) -> bool:
+        t = tag.type
+        if t not in ARRAY_ITEMS and not (t == TAG.LIST and (tag.value_is_array() or tag.get_type() == TAG.STRING)): return False
+        if self.containers.setdefault(name, t) != t:
+            raise NbtDataError("列 %s 中同时存在 %s 与 %s 类型的值" % (name, self.containers[name], t))
+        return True
+
+    @staticmethod
+    def item_type(tag):
+        return ARRAY_ITEMS.get(tag.type) or tag.get_type()
+
+    def put(self, row, name, t, value):
+        col = self.columns.get(name)
+        if col is None: col = self.columns[name] = {}
+        col[row] = value
+        self.types[name] = widen(self.types.get(name), t, name)
+
+
+def to_columns(tag_list: TAG_List, fields: list = None, numpy: bool = False) -> Columns:
+    """
+    fields 为每个元素中的字段路径(如 "id"、"tag.Damage"、"Pos"、"Pos[1]")，为 None 时收集所有元素中出现过的字段；
+    指向复合标签的字段会展开为其中的全部字段，不含数字或字符串的列表(如 Passengers)只能通过 to_python 处理。
+    """
+    if not isinstance(tag_list, TAG_List): raise TypeError("期望类型为 %s，但传入了 %s" % (TAG_List, repr(tag_list)))
+    if tag_list.get_type() not in (TAG.COMPOUND, TAG.END):
+        raise TypeError("只能转换元素类型为 %s 的列表，但传入了 %s" % (TAG.COMPOUND, tag_list.get_type()))
+    items = tag_list._peek()
+    collector = Collector()
+    compiled = None if fields is None else [(f, compile_field(f)) for f in fields]
+    for row, item in enumerate(items):
+        if compiled is None:
+            leaves = []
+            flatten(item, "", leaves)
+            for name, tag in leaves: collector.add(row, name, tag, False)
+            continue
+        for field, keys in compiled:
+            if isinstance(keys[-1], int):
+                tag = resolve(item, keys[:-1])
+                if tag is not None: collector.add_item(row, format_keys(keys[:-1]), tag, keys[-1])
+                continue
+            tag = resolve(item, keys)
+            if tag is None: continue
+            if tag.type == TAG.COMPOUND and len(tag):
+                leaves = []
+                flatten(tag, format_keys(keys), leaves)
+                for name, tag in leaves: collector.add(row, name, tag, False)
+            else:
+                collector.add(row, format_keys(keys), tag)
+    res = Columns(len(items), containers=collector.containers)
+    for name, col in collector.columns.items():
+        t = res.types[name] = collector.types[name]
+        mask = array("B", bytes(len(items)))
+        for row in range(len(items)):
+            if row not in col: mask[row] = 1
+        if t == TAG.STRING:
+            values = [col.get(row, "") for row in range(len(items))]
+        elif t == TAG.COMPOUND:
+            values = array("B", bytes(len(items)))
+        else:
+            values = array(ARRAY_TYPECODE[t], [col.get(row, 0) for row in range(len(items))])
+        res[name], res.masks[name] = values, mask
+    if numpy: as_numpy(res)
+    return res
+
+def as_numpy(columns):
+    np = numpy_module()
+    for name, col in columns.items():
+        columns[name] = np.array(col, dtype=object) if isinstance(col, list) else np.frombuffer(col, dtype=col.typecode)
+        columns.masks[name] = np.frombuffer(columns.masks[name], dtype=np.bool_)
+
+def numpy_module():
+    if numpy is None: raise ImportError("需要安装 numpy 才能使用 numpy 列")
+    return numpy
+
+
+# === 列 -> TAG_List ===
+class Items(dict): pass
+
+def column_type(name, col):
+    typecode = getattr(col, "typecode", None)
+    if typecode is not None:
+        if typecode == "l": return SIZE_TAGS[("i", col.itemsize)]
+        if typecode in TYPECODE_TAGS: return TYPECODE_TAGS[typecode]
+    dtype = getattr(col, "dtype", None)
+    if dtype is not None and (dtype.kind, dtype.itemsize) in SIZE_TAGS: return SIZE_TAGS[(dtype.kind, dtype.itemsize)]
+    if dtype is not None and dtype.kind in "OUS" or isinstance(col, list) and all(isinstance(v, str) for v in col): return TAG.STRING
+    raise TypeError("无法推断列 %s 的标签类型，请通过 types 指定" % name)
+
+def build(node, name, containers, types):
+    if isinstance(node, Items):
+        t, indexes = containers.get(name, TAG.LIST), sorted(node)
+        if indexes[-1] != len(indexes) - 1:
+            missing = min(set(range(indexes[-1])) - set(indexes))
+            raise NbtDataError("列 %s[%d] 缺失但 %s[%d] 存在，按下标展开的列必须从 0 开始连续" % (name, missing, name, indexes[-1]))
+        values, item = [node[i] for i in indexes], types[name]
+        if t in ARRAY_ITEMS: return TAGLIST[t](values)
+        if item == TAG.STRING: return TAG_List.from_trusted([TAGLIST[TAG.STRING](v) for v in values], item)
+        return TAG_List.from_trusted(values, item)
+    return TAG_Compound.from_trusted({k: v if hasattr(v, "type") else build(v, key_path(name, k), containers, types) for k, v in node.items()})
+
+def from_columns(columns: Union[Columns, dict], masks: dict = None, types: dict = None, containers: dict = None) -> TAG_List:
+    """
+    columns 为 to_columns 的结果，或 列名 -> array.array/numpy 数组/列表 的字典；masks、types、containers 的含义与 Columns 相同，
+    未指定时使用 Columns 中记录的值，类型按数组的类型码推断(字符串列为 TAG_String)，按下标展开的列默认还原为 TAG_List。
+    """
+    masks = getattr(columns, "masks", {}) if masks is None else masks
+    types = dict(getattr(columns, "types", {}), **(types or {}))
+    containers = dict(getattr(columns, "containers", {}), **(containers or {}))
+    size = None
+    plan, groups = [], {}
+    for name, col in columns.items():
+        n = len(col)
+        if size is None: size = n
+        elif n != size: raise ValueError("列 %s 的长度为 %s，与其他列(%s)不同" % (name, n, size))
+        keys = compile_field(name)
+        t = types.get(name) or column_type(name, col)
+        if t not in INTEGERS and t not in FLOATS and t != TAG.STRING and not (t == TAG.COMPOUND and not isinstance(keys[-1], int)):
+            raise TypeError("列 %s 的类型 %s 不能转换为标签" % (name, t))
+        values = col.tolist() if hasattr(col, "tolist") else list(col)
+        mask = masks.get(name)
+        mask = None if mask is None else (mask.tolist() if hasattr(mask, "tolist") else list(mask))
+        if isinstance(keys[-1], int):
+            group = format_keys(keys[:-1])
+            groups[group] = widen(groups.get(group), t, group)
+            plan.append((name, keys[:-2], keys[-2], keys[-1], t, values, mask))
+        else:
+            plan.append((name, keys[:-1], keys[-1], None, None if t == TAG.COMPOUND else TAGLIST[t], values, mask))
+    size = size or getattr(columns, "size", 0)
+    for group, t in groups.items():
+        if group in containers and containers[group] in ARRAY_ITEMS: t = ARRAY_ITEMS[containers[group]]
+        types[group] = t
+    items = []
+    for row in range(size):
+        node = {}
+        for name, parents, key, index, t, values, mask in plan:
+            if mask is not None and mask[row]: continue
+            parent = node
+            for k in parents:
+                parent = parent.setdefault(k, {})
+                if type(parent) is not dict: raise NbtDataError("列 %s 与其他列的路径冲突" % name)
+            if t is None:
+                if type(parent.setdefault(key, {})) is not dict: raise NbtDataError("列 %s 与其他列的路径冲突" % name)
+            elif index is None: parent[key] = t(values[row])
+            else: parent.setdefault(key, Items())[index] = values[row]
+        items.append(build(node, "", containers, types))
+    return TAG_List.from_trusted(items, TAG.COMPOUND)
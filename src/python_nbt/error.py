@@ -14,6 +14,7 @@ class NbtFileError(Exception): pass
 class NbtBufferError(Exception): pass
 class NbtContextError(Exception): pass
 class NbtDataError(Exception): pass
+class NbtPathError(Exception): pass
 
 def throw_nbt_error(e, buffer, length):
     buffer.seek(buffer.tell() - length)
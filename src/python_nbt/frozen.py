@@ -0,0 +1,310 @@
+"""
+    frozen.py - 不可变的nbt快照
+
+    snap = tag.freeze()
+    new = snap.set("Data.Time", nbt.TAG_Long(100))   # 返回新快照，未修改的子树与旧快照共享
+    tag = new.thaw()                                   # 转换回可修改的 TAG_*
+
+    快照可哈希、可在线程间共享；数字与字符串标签本身不可变，直接作为快照的叶子。
+"""
+
+
+from array import array
+from collections.abc import Mapping, Sequence
+from types import MappingProxyType
+
+from . import TAG, TAGLIST, path as nbt_path
+from .abc import TAG_Base
+from .error import *
+from .tags import TAG_Compound, TAG_List, ARRAY_TYPECODE, make_digest
+
+ARRAY_TAGS = (TAG.BYTE_ARRAY, TAG.INT_ARRAY, TAG.LONG_ARRAY)
+
+
+def key(node):
+    if isinstance(node, Frozen): return node
+    return (node.type, node.get_value())
+
+def freeze(tag):
+    if isinstance(tag, Frozen): return tag
+    if not isinstance(tag, TAG_Base): raise TypeError("期望类型为 %s，但传入了 %s" % (TAG_Base, repr(tag)))
+    if tag.type == TAG.COMPOUND:
+        return Frozen_Compound._make({k: freeze(v) for k, v in tag._peek().items()})
+    if tag.type == TAG.LIST:
+        value = tag._peek()
+        return Frozen_List._make(value[:] if tag.value_is_array() else tuple(freeze(v) for v in value), tag.get_type())
+    if tag.type in ARRAY_TAGS:
+        return Frozen_Array._make(tag._peek()[:], tag.type)
+    return tag
+
+def thaw(node):
+    return node.thaw() if isinstance(node, Frozen) else node
+
+
+class Frozen:
+    __slots__ = ('_value', '_hash', '_tag', '_digest')
+
+    def __setattr__(self, name, value):
+        raise AttributeError("快照不可修改")
+
+    def __delattr__(self, name):
+        raise AttributeError("快照不可修改")
+
+    def freeze(self):
+        return self
+
+    def thaw(self):
+        tag = self._tag
+        if tag is None:
+            tag = self._build().copy()
+            object.__setattr__(self, '_tag', tag)
+        return tag.copy()
+
+    def _peek(self):
+        return self._value
+
+    def _tag_cache(self):
+        if self._tag is None: self.thaw()
+        return self._tag
+
+    def digest(self) -> bytes:
+        res = self._digest
+        if res is None:
+            res = make_digest(self.type, self._value, getattr(self, '_type', None))
+            object.__setattr__(self, '_digest', res)
+        return res
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except (KeyError, IndexError):
+            return default
+
+    def find(self, expr, default=nbt_path.MISSING):
+        return nbt_path.compile(expr).get(self, default)
+
+    def set(self, expr, value, create=False):
+        steps = self._steps(expr)
+        if not steps: raise NbtPathError("不能替换根标签")
+        return update(self, steps, 0, value if isinstance(value, int) else freeze(value), create)
+
+    def delete(self, expr):
+        steps = self._steps(expr)
+        if not steps: raise NbtPathError("不能删除根标签")
+        return update(self, steps, 0, None, False)
+
+    def _steps(self, expr):
+        path = nbt_path.compile(expr)
+        if not path.simple or path.root_pattern is not None: raise NbtPathError("路径 %s 必须只包含键名与下标" % expr)
+        return path.steps
+
+    def __eq__(self, other):
+        if self is other: return True
+        if not isinstance(other, Frozen) or other.type != self.type or hash(self) != hash(other): return False
+        return self._equal(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __reduce__(self):
+        return freeze, (self.thaw(),)
+
+
+class Frozen_Compound(Frozen, Mapping):
+    __slots__ = ()
+    type = TAG.COMPOUND
+
+    @classmethod
+    def _make(cls, value: dict):
+        res = object.__new__(cls)
+        object.__setattr__(res, '_value', value)
+        object.__setattr__(res, '_hash', None)
+        object.__setattr__(res, '_tag', None)
+        object.__setattr__(res, '_digest', None)
+        return res
+
+    def __getitem__(self, key):
+        return self._value[key]
+
+    def __iter__(self):
+        return iter(self._value)
+
+    def __len__(self):
+        return len(self._value)
+
+    def __contains__(self, key):
+        return key in self._value
+
+    def get(self, key, default=None):
+        return self._value.get(key, default)
+
+    def get_value(self):
+        return MappingProxyType(self._value)
+
+    def __hash__(self):
+        res = self._hash
+        if res is None:
+            res = hash((TAG.COMPOUND, frozenset((k, key(v)) for k, v in self._value.items())))
+            object.__setattr__(self, '_hash', res)
+        return res
+
+    def _equal(self, other):
+        if len(self._value) != len(other._value): return False
+        items = other._value
+        return all(k in items and key(v) == key(items[k]) for k, v in self._value.items())
+
+    def _build(self):
+        return TAG_Compound.from_trusted({k: v._tag_cache() if isinstance(v, Frozen) else v for k, v in self._value.items()})
+
+    def __repr__(self):
+        return "<Frozen %s count=%d at 0x%x>" % (self.type, len(self._value), id(self))
+
+
+class Frozen_List(Frozen, Sequence):
+    __slots__ = ('_type',)
+    type = TAG.LIST
+
+    @classmethod
+    def _make(cls, value, type):
+        res = object.__new__(cls)
+        object.__setattr__(res, '_value', value)
+        object.__setattr__(res, '_type', TAG(type))
+        object.__setattr__(res, '_hash', None)
+        object.__setattr__(res, '_tag', None)
+        object.__setattr__(res, '_digest', None)
+        return res
+
+    def get_type(self):
+        return self._type
+
+    def value_is_array(self):
+        return self._type in ARRAY_TYPECODE
+
+    def get_value(self):
+        return tuple(self._value) if self.value_is_array() else self._value
+
+    def __getitem__(self, index):
+        if isinstance(index, slice): return Frozen_List._make(self._value[index], self._type)
+        if self.value_is_array(): return TAGLIST[self._type](self._value[index])
+        return self._value[index]
+
+    def __len__(self):
+        return len(self._value)
+
+    def __hash__(self):
+        res = self._hash
+        if res is None:
+            value = self._value.tobytes() if self.value_is_array() else tuple(key(v) for v in self._value)
+            res = hash((TAG.LIST, self._type, value))
+            object.__setattr__(self, '_hash', res)
+        return res
+
+    def _equal(self, other):
+        if self._type != other._type or len(self._value) != len(other._value): return False
+        if self.value_is_array(): return self._value == other._value
+        return all(key(a) == key(b) for a, b in zip(self._value, other._value))
+
+    def _build(self):
+        if self.value_is_array(): return TAG_List(self._value[:])
+        return TAG_List.from_trusted([v._tag_cache() if isinstance(v, Frozen) else v for v in self._value], self._type)
+
+    def __repr__(self):
+        return "<Frozen %s type=%s count=%d at 0x%x>" % (self.type, self._type, len(self._value), id(self))
+
+
+class Frozen_Array(Frozen, Sequence):
+    __slots__ = ('type',)
+
+    @classmethod
+    def _make(cls, value: array, type):
+        res = object.__new__(cls)
+        object.__setattr__(res, '_value', value)
+        object.__setattr__(res, 'type', type)
+        object.__setattr__(res, '_hash', None)
+        object.__setattr__(res, '_tag', None)
+        object.__setattr__(res, '_digest', None)
+        return res
+
+    def get_value(self):
+        return tuple(self._value)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice): return Frozen_Array._make(self._value[index], self.type)
+        return self._value[index]
+
+    def __len__(self):
+        return len(self._value)
+
+    def tobytes(self):
+        return self._value.tobytes()
+
+    def __hash__(self):
+        res = self._hash
+        if res is None:
+            res = hash((self.type, self._value.tobytes()))
+            object.__setattr__(self, '_hash', res)
+        return res
+
+    def _equal(self, other):
+        return self._value == other._value
+
+    def _build(self):
+        return TAGLIST[self.type](self._value[:])
+
+    def __repr__(self):
+        return "<Frozen %s count=%d at 0x%x>" % (self.type, len(self._value), id(self))
+
+
+def number_value(node, value):
+    if node.type in ARRAY_TAGS:
+        if isinstance(value, int): return value
+        item_type = TAGLIST[node.type]._type
+    else:
+        item_type = node._type
+    if getattr(value, "type", None) != item_type: raise TypeError("期望类型为 %s，但传入了 %s" % (item_type, repr(value)))
+    return value.get_value()
+
+def update(node, steps, i, value, create):
+    step, last = steps[i], i == len(steps) - 1
+    if last and isinstance(value, int) and (step.kind != "index" or node.type not in ARRAY_TAGS):
+        raise TypeError("期望类型为 %s，但传入了 %s" % ((TAG_Base, Frozen), repr(value)))
+    if step.kind == "key":
+        if node.type != TAG.COMPOUND: raise NbtPathError("路径 %s 处不是TAG_Compound" % step)
+        items = node._value
+        if last:
+            if value is None:
+                if step.name not in items: raise NbtPathError("路径 %s 未找到" % step)
+                items = dict(items)
+                del items[step.name]
+                return Frozen_Compound._make(items)
+            if items.get(step.name) is value: return node
+        else:
+            child = items.get(step.name)
+            if child is None:
+                if not create: raise NbtPathError("路径 %s 未找到" % step)
+                child = Frozen_Compound._make({})
+            value = update(child, steps, i + 1, value, create)
+            if value is child: return node
+        items = dict(items)
+        items[step.name] = value
+        return Frozen_Compound._make(items)
+    if node.type != TAG.LIST and node.type not in ARRAY_TAGS: raise NbtPathError("路径 %s 处不是列表或数组" % step)
+    items, index = node._value, step.index
+    if not -len(items) <= index < len(items): raise NbtPathError("路径 %s 超出范围(共 %s 项)" % (step, len(items)))
+    if not last:
+        child = node[index]
+        value = update(child, steps, i + 1, value, create)
+        if value is child: return node
+    if isinstance(items, array):
+        items = items[:]
+        if value is None: del items[index]
+        else: items[index] = number_value(node, value)
+        return Frozen_Array._make(items, node.type) if node.type in ARRAY_TAGS else Frozen_List._make(items, node._type)
+    items = list(items)
+    if value is None:
+        del items[index]
+    else:
+        if items and getattr(value, "type", None) != node._type:
+            raise TypeError("期望类型为 %s，但传入了 %s" % (node._type, getattr(value, "type", repr(value))))
+        items[index] = value
+    return Frozen_List._make(tuple(items), node._type)
@@ -0,0 +1,217 @@
+"""
+    index.py - TAG_List(复合标签列表)的二级索引
+"""
+
+
+from bisect import bisect_left, bisect_right, insort
+from math import floor
+
+from . import TAG, path as nbt_path
+from .tags import TAG_List
+
+MISSING = object()
+
+
+def key_value(tag):
+    if tag is None: return MISSING
+    if not hasattr(tag, "type"): return tag
+    if tag.type in (TAG.COMPOUND,): return MISSING
+    if tag.type == TAG.LIST or tag.type in (TAG.BYTE_ARRAY, TAG.INT_ARRAY, TAG.LONG_ARRAY):
+        if tag.type == TAG.LIST and not tag.value_is_array():
+            return tuple(key_value(v) for v in tag._peek())
+        return tuple(tag._peek())
+    return tag.get_value()
+
+def bucket_add(bucket, item):
+    entry = bucket.get(id(item))
+    if entry is None: bucket[id(item)] = [item, 1]
+    else: entry[1] += 1
+
+def bucket_remove(bucket, item):
+    entry = bucket.get(id(item))
+    if entry is None: return False
+    entry[1] -= 1
+    if entry[1] == 0: del bucket[id(item)]
+    return True
+
+def bucket_items(bucket):
+    return [item for item, count in bucket.values() for _ in range(count)]
+
+
+class ListWatcher:
+    def __init__(self, tag_list):
+        if not isinstance(tag_list, TAG_List): raise TypeError("期望类型为 %s，但传入了 %s" % (TAG_List, repr(tag_list)))
+        if tag_list.get_type() not in (TAG.COMPOUND, TAG.END):
+            raise TypeError("只能为元素类型为 %s 的列表建立索引，但传入了 %s" % (TAG.COMPOUND, tag_list.get_type()))
+        self.tag_list = tag_list
+        self.refresh()
+        tag_list._watch(self)
+
+    def close(self):
+        self.tag_list._unwatch(self)
+
+    def refresh(self):
+        self._clear()
+        for item in self.tag_list:
+            self._add(item)
+
+    def _update(self, tag_list, removed, added):
+        if removed is None and added is None: return self.refresh()
+        for item in removed: self._remove(item)
+        for item in added: self._add(item)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ListIndex(ListWatcher):
+    def __init__(self, tag_list, *paths, ordered=False):
+        if not paths: raise ValueError("至少需要一个键路径")
+        self.paths = tuple(nbt_path.compile(p) for p in paths)
+        self.ordered = ordered
+        super().__init__(tag_list)
+
+    def key_of(self, item):
+        if len(self.paths) == 1:
+            return key_value(self.paths[0].get(item, None))
+        res = tuple(key_value(p.get(item, None)) for p in self.paths)
+        return MISSING if MISSING in res else res
+
+    def _clear(self):
+        self._buckets = {}
+        self._keys = []
+
+    def _add(self, item):
+        key = self.key_of(item)
+        if key is MISSING: return
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = {}
+            if self.ordered: insort(self._keys, key)
+        bucket_add(bucket, item)
+
+    def _remove(self, item):
+        key = self.key_of(item)
+        bucket = self._buckets.get(key) if key is not MISSING else None
+        if bucket is None or not bucket_remove(bucket, item):
+            for key, bucket in self._buckets.items():
+                if bucket_remove(bucket, item): break
+            else:
+                return
+        if not bucket:
+            del self._buckets[key]
+            if self.ordered: del self._keys[bisect_left(self._keys, key)]
+
+    def get(self, *key):
+        key = key[0] if len(key) == 1 else key
+        bucket = self._buckets.get(key)
+        return bucket_items(bucket) if bucket else []
+
+    def first(self, *key, default=None):
+        bucket = self._buckets.get(key[0] if len(key) == 1 else key)
+        return next(iter(bucket.values()))[0] if bucket else default
+
+    def count(self, *key):
+        bucket = self._buckets.get(key[0] if len(key) == 1 else key)
+        return sum(count for _, count in bucket.values()) if bucket else 0
+
+    def range(self, low=None, high=None, inclusive=(True, True)):
+        if not self.ordered: raise TypeError("范围查询需要建立有序索引(ordered=True)")
+        keys = self._keys
+        start = 0 if low is None else (bisect_left if inclusive[0] else bisect_right)(keys, low)
+        stop = len(keys) if high is None else (bisect_right if inclusive[1] else bisect_left)(keys, high)
+        return [item for key in keys[start:stop] for item in bucket_items(self._buckets[key])]
+
+    def keys(self):
+        return list(self._keys) if self.ordered else list(self._buckets)
+
+    def __contains__(self, key):
+        return key in self._buckets
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def __repr__(self):
+        return "<ListIndex %s keys=%s at 0x%x>" % (", ".join(map(str, self.paths)), len(self._buckets), id(self))
+
+
+class GridIndex(ListWatcher):
+    def __init__(self, tag_list, path="Pos", cell=16.0):
+        if not cell > 0: raise ValueError("网格大小必须大于0，但传入了 %s" % cell)
+        self.path = nbt_path.compile(path)
+        self.cell = cell
+        super().__init__(tag_list)
+
+    def position_of(self, item):
+        pos = key_value(self.path.get(item, None))
+        if pos is MISSING or not isinstance(pos, tuple) or not pos: return None
+        return pos
+
+    def cell_of(self, pos):
+        cell = self.cell
+        return tuple(floor(v / cell) for v in pos)
+
+    def _clear(self):
+        self._cells = {}
+        self._count = 0
+
+    def _add(self, item):
+        pos = self.position_of(item)
+        if pos is None: return
+        self._cells.setdefault(self.cell_of(pos), []).append((pos, item))
+        self._count += 1
+
+    def _remove(self, item):
+        pos = self.position_of(item)
+        cells = [self.cell_of(pos)] if pos is not None else []
+        for cell in cells + list(self._cells):
+            bucket = self._cells.get(cell)
+            if not bucket: continue
+            for i, (_, v) in enumerate(bucket):
+                if v is item:
+                    del bucket[i]
+                    if not bucket: del self._cells[cell]
+                    self._count -= 1
+                    return
+
+    def _iter_cells(self, low, high):
+        low_cell, high_cell = self.cell_of(low), self.cell_of(high)
+        volume = 1
+        for a, b in zip(low_cell, high_cell): volume *= max(0, b - a + 1)
+        if volume > len(self._cells):
+            for cell, bucket in self._cells.items():
+                if all(a <= c <= b for a, c, b in zip(low_cell, cell, high_cell)): yield bucket
+            return
+        cells = [()]
+        for a, b in zip(low_cell, high_cell):
+            cells = [c + (i,) for c in cells for i in range(a, b + 1)]
+        for cell in cells:
+            bucket = self._cells.get(cell)
+            if bucket: yield bucket
+
+    def within(self, low, high):
+        if len(low) != len(high): raise ValueError("范围的维度不一致 %s %s" % (low, high))
+        return [item for bucket in self._iter_cells(low, high) for pos, item in bucket
+                if len(pos) == len(low) and all(a <= p <= b for a, p, b in zip(low, pos, high))]
+
+    def near(self, center, radius):
+        low = tuple(c - radius for c in center)
+        high = tuple(c + radius for c in center)
+        r2 = radius * radius
+        return [item for bucket in self._iter_cells(low, high) for pos, item in bucket
+                if len(pos) == len(center) and sum((p - c) ** 2 for p, c in zip(pos, center)) <= r2]
+
+    def at_cell(self, *cell):
+        return [item for pos, item in self._cells.get(cell, ())]
+
+    def __len__(self):
+        return self._count
+
+    def __repr__(self):
+        return "<GridIndex %s cell=%s count=%s at 0x%x>" % (self.path, self.cell, self._count, id(self))
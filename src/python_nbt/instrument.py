@@ -0,0 +1,186 @@
+"""
+    instrument.py - 读写过程的分阶段计时与计数
+
+    未注册任何记录器/钩子时，RootNBT.from_*/to_* 只多出一次函数调用与一次判断。
+"""
+
+
+import threading
+from functools import wraps
+from time import perf_counter
+
+from . import TAG
+
+_sinks = ()
+_sinks_lock = threading.Lock()
+_local = threading.local()
+
+
+class Call:
+    __slots__ = ("op", "phases", "counters", "tags", "max_depth", "duration", "error",
+                 "_start", "_last", "_caches", "_count_tags")
+
+    def __init__(self, op, count_tags):
+        self.op = op
+        self.phases = {}
+        self.counters = {}
+        self.tags = None
+        self.max_depth = None
+        self.duration = 0.0
+        self.error = None
+        self._count_tags = count_tags
+        self._caches = cache_stats()
+        self._start = self._last = perf_counter()
+
+    def mark(self, phase):
+        now = perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def tree(self, tag):
+        if not self._count_tags: return
+        self.tags, self.max_depth = count_tags(tag)
+        self.mark("count_tags")
+
+    def as_dict(self):
+        return {"op": self.op, "duration": self.duration, "phases": dict(self.phases), "counters": dict(self.counters),
+                "tags": None if self.tags is None else {t.name: n for t, n in self.tags.items()},
+                "max_depth": self.max_depth, "error": None if self.error is None else repr(self.error)}
+
+    def __repr__(self):
+        return "<Call %s %.3fms %s>" % (self.op, self.duration * 1e3, " ".join("%s=%.3fms" % (k, v * 1e3) for k, v in self.phases.items()))
+
+
+class Recorder:
+    def __init__(self, count_tags=False, keep=True):
+        self.count_tags = count_tags
+        self.keep = keep
+        self.calls = []
+        self.totals = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, call):
+        with self._lock:
+            if self.keep: self.calls.append(call)
+            total = self.totals.get(call.op)
+            if total is None:
+                total = self.totals[call.op] = {"calls": 0, "errors": 0, "duration": 0.0, "phases": {}, "counters": {}}
+            total["calls"] += 1
+            total["errors"] += call.error is not None
+            total["duration"] += call.duration
+            for k, v in call.phases.items(): total["phases"][k] = total["phases"].get(k, 0.0) + v
+            for k, v in call.counters.items(): total["counters"][k] = total["counters"].get(k, 0) + v
+            if call.tags:
+                tags = total.setdefault("tags", {})
+                for t, n in call.tags.items(): tags[t.name] = tags.get(t.name, 0) + n
+                total["max_depth"] = max(total.get("max_depth", 0), call.max_depth)
+
+    def start(self):
+        add_hook(self)
+        return self
+
+    def stop(self):
+        remove_hook(self)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def format(self):
+        lines = []
+        for op, total in sorted(self.totals.items()):
+            lines.append("%-12s calls=%d errors=%d total=%.3fms" % (op, total["calls"], total["errors"], total["duration"] * 1e3))
+            for k, v in total["phases"].items(): lines.append("    %-28s %10.3fms" % (k, v * 1e3))
+            for k, v in total["counters"].items(): lines.append("    %-28s %10d" % (k, v))
+            if "tags" in total:
+                lines.append("    %-28s %10d" % ("max_depth", total["max_depth"]))
+                for k, v in sorted(total["tags"].items()): lines.append("    %-28s %10d" % (k, v))
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.format()
+
+
+def record(count_tags=False, keep=True) -> Recorder:
+    return Recorder(count_tags, keep)
+
+
+def add_hook(hook):
+    global _sinks
+    with _sinks_lock:
+        _sinks = _sinks + (hook,)
+
+def remove_hook(hook):
+    global _sinks
+    with _sinks_lock:
+        sinks = list(_sinks)
+        if hook in sinks: sinks.remove(hook)
+        _sinks = tuple(sinks)
+
+def enabled() -> bool:
+    return bool(_sinks)
+
+
+def current():
+    return getattr(_local, "call", None)
+
+def traced(op):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _sinks or getattr(_local, "call", None) is not None: return func(*args, **kwargs)
+            call = _local.call = begin(op)
+            try:
+                res = func(*args, **kwargs)
+            except BaseException as e:
+                _local.call = None
+                end(call, e)
+                raise
+            _local.call = None
+            end(call)
+            return res
+        return wrapper
+    return decorator
+
+def begin(op):
+    return Call(op, any(getattr(s, "count_tags", False) for s in _sinks))
+
+def end(call, error=None):
+    call.duration = perf_counter() - call._start
+    call.error = error
+    for name, (hits, misses) in cache_stats().items():
+        old_hits, old_misses = call._caches.get(name, (0, 0))
+        if hits - old_hits: call.count("cache_hits." + name, hits - old_hits)
+        if misses - old_misses: call.count("cache_misses." + name, misses - old_misses)
+    call._caches = None
+    for sink in _sinks:
+        sink(call)
+
+
+def cache_stats():
+    from . import codec, snbt
+    res = {}
+    for name, func in (("pack_data", codec.pack_data), ("unpack_data", codec.unpack_data),
+                       ("parse_number", snbt.parse_number), ("parse_py_number", snbt.parse_py_number)):
+        info = func.cache_info()
+        res[name] = (info.hits, info.misses)
+    return res
+
+
+def count_tags(tag):
+    counts, max_depth = {}, 0
+    stack = [(tag, 1)]
+    while stack:
+        tag, depth = stack.pop()
+        counts[tag.type] = counts.get(tag.type, 0) + 1
+        if depth > max_depth: max_depth = depth
+        if tag.type == TAG.COMPOUND:
+            stack.extend((v, depth + 1) for v in tag._peek().values())
+        elif tag.type == TAG.LIST and not tag.value_is_array():
+            stack.extend((v, depth + 1) for v in tag._peek())
+    return counts, max_depth
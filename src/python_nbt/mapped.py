@@ -0,0 +1,318 @@
+"""
+    mapped.py - 基于 mmap 的延迟解码
+
+    未压缩的文件以只读方式映射到内存(多个进程打开同一文件时共享页缓存)，
+    打开时用 scan_ends 扫描一遍，记下每个复合标签/列表的结束偏移(数组与数字列表的内容直接跳过)，
+    之后复合标签、列表与数组在第一次被访问时才从映射的数据中解码，不再重复扫描。
+"""
+
+
+import mmap, os, threading
+from array import array
+from bisect import bisect_left
+from io import BytesIO
+from struct import Struct, error as StructError
+
+from . import TAG, TAGLIST, codec as ce
+from .error import *
+from .tags import TAG_Compound, TAG_List, TAG_ByteArray, TAG_IntArray, TAG_LongArray, ARRAY_TYPECODE
+
+_lock = threading.RLock()
+LENGTHS = (Struct('<H'), Struct('>H'))
+COUNTS = (Struct('<i'), Struct('>i'))
+NUMBER_SIZE = {t.value: n for t, n in ce.number_bytes_len.items()}
+ARRAY_SIZE = {TAG.BYTE_ARRAY.value: 1, TAG.INT_ARRAY.value: 4, TAG.LONG_ARRAY.value: 8}
+ZIP_HEADS = (b'\x1F\x8B', b'\x78\x9C')
+
+
+def map_file(path):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0: raise NbtFileError("路径('%s')为空文件" % path)
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def skip(buf, pos, t, mode):
+    length, count = LENGTHS[mode].unpack_from, COUNTS[mode].unpack_from
+    stack = []
+    while True:
+        if t in NUMBER_SIZE:
+            pos += NUMBER_SIZE[t]
+        elif t == 8:
+            pos += 2 + length(buf, pos)[0]
+        elif t in ARRAY_SIZE:
+            n = count(buf, pos)[0]
+            if n < 0: raise NbtParseError("数组长度 %s 为负数，位于 %s字节" % (n, pos))
+            pos += 4 + n * ARRAY_SIZE[t]
+        elif t == 9:
+            item, n = buf[pos], count(buf, pos + 1)[0]
+            if n < 0: raise NbtParseError("列表长度 %s 为负数，位于 %s字节" % (n, pos))
+            pos += 5
+            if item in NUMBER_SIZE: pos += n * NUMBER_SIZE[item]
+            elif n: stack.append([item, n])
+        elif t == 10:
+            stack.append(None)
+        else:
+            raise NbtParseError("未知的标签类型 %s，位于 %s字节" % (t, pos))
+        while stack:
+            top = stack[-1]
+            if top is None:
+                t = buf[pos]
+                pos += 1
+                if t == 0:
+                    stack.pop()
+                    continue
+                pos += 2 + length(buf, pos)[0]
+                break
+            if top[1] == 0:
+                stack.pop()
+                continue
+            top[1] -= 1
+            t = top[0]
+            break
+        else:
+            return pos
+
+
+def scan_ends(buf, pos, t, mode):
+    length, count = LENGTHS[mode].unpack_from, COUNTS[mode].unpack_from
+    starts, ends, stack = array('q'), array('q'), []
+    while True:
+        if t in NUMBER_SIZE:
+            pos += NUMBER_SIZE[t]
+        elif t == 8:
+            pos += 2 + length(buf, pos)[0]
+        elif t in ARRAY_SIZE:
+            n = count(buf, pos)[0]
+            if n < 0: raise NbtParseError("数组长度 %s 为负数，位于 %s字节" % (n, pos))
+            pos += 4 + n * ARRAY_SIZE[t]
+        elif t == 9:
+            item, n = buf[pos], count(buf, pos + 1)[0]
+            if n < 0: raise NbtParseError("列表长度 %s 为负数，位于 %s字节" % (n, pos))
+            if item in NUMBER_SIZE:
+                pos += 5 + n * NUMBER_SIZE[item]
+            elif n:
+                stack.append([item, n, len(starts)])
+                starts.append(pos)
+                ends.append(0)
+                pos += 5
+            else:
+                pos += 5
+        elif t == 10:
+            stack.append([None, 0, len(starts)])
+            starts.append(pos)
+            ends.append(0)
+        else:
+            raise NbtParseError("未知的标签类型 %s，位于 %s字节" % (t, pos))
+        while stack:
+            top = stack[-1]
+            if top[0] is None:
+                t = buf[pos]
+                pos += 1
+                if t == 0:
+                    ends[top[2]] = pos
+                    stack.pop()
+                    continue
+                pos += 2 + length(buf, pos)[0]
+                break
+            if top[1] == 0:
+                ends[top[2]] = pos
+                stack.pop()
+                continue
+            top[1] -= 1
+            t = top[0]
+            break
+        else:
+            return EndIndex(starts, ends), pos
+
+
+class EndIndex:
+    __slots__ = ('starts', 'ends')
+
+    def __init__(self, starts, ends):
+        self.starts = starts
+        self.ends = ends
+
+    def __len__(self):
+        return len(self.starts)
+
+    def get(self, pos):
+        starts = self.starts
+        i = bisect_left(starts, pos)
+        return self.ends[i] if i < len(starts) and starts[i] == pos else None
+
+
+def decode_value(buf, pos, t, mode, ends=None):
+    if t in NUMBER_SIZE:
+        end = pos + NUMBER_SIZE[t]
+        return TAGLIST[TAG(t)]._from_bytes(bytes(buf[pos:end]), mode), end
+    if t == 8:
+        end = pos + 2 + LENGTHS[mode].unpack_from(buf, pos)[0]
+        return TAGLIST[TAG.STRING](ce.unpack_data(bytes(buf[pos + 2:end]), TAG.STRING)), end
+    if t in ARRAY_SIZE:
+        cls = MAPPED_ARRAYS[t]
+        end = pos + 4 + COUNTS[mode].unpack_from(buf, pos)[0] * ARRAY_SIZE[t]
+    elif t == 9:
+        item = buf[pos]
+        if item in NUMBER_SIZE: end = pos + 5 + COUNTS[mode].unpack_from(buf, pos + 1)[0] * NUMBER_SIZE[item]
+        else: end = (ends is not None and ends.get(pos)) or skip(buf, pos, t, mode)
+        if end > len(buf): raise NbtParseError("ELO Error，期望%s字节，实际为%s字节（%s）" % (end - pos, len(buf) - pos, TAG(t)))
+        return new_list(buf, pos, mode, item, ends), end
+    elif t == 10:
+        cls = Mapped_Compound
+        end = (ends is not None and ends.get(pos)) or skip(buf, pos, t, mode)
+    else:
+        raise NbtParseError("未知的标签类型 %s，位于 %s字节" % (t, pos))
+    if end > len(buf): raise NbtParseError("ELO Error，期望%s字节，实际为%s字节（%s）" % (end - pos, len(buf) - pos, TAG(t)))
+    tag = cls.__new__(cls)
+    tag._buf, tag._pos, tag._mode, tag._ends = buf, pos, mode, ends
+    object.__setattr__(tag, cls._state, 0)
+    object.__setattr__(tag, cls._digest, None)
+    if cls._lent: object.__setattr__(tag, cls._lent, None)
+    return tag, end
+
+def new_list(buf, pos, mode, item, ends=None):
+    tag = Mapped_List.__new__(Mapped_List)
+    tag._watchers = None
+    tag.set_type(TAG(item))
+    tag._buf, tag._pos, tag._mode, tag._ends = buf, pos, mode, ends
+    tag._TAG_List__state = 0
+    tag._TAG_List__lent = None
+    return tag
+
+
+class Mapped:
+    __slots__ = ()
+    _slot = None
+    _lent = None
+
+    def __getattr__(self, name):
+        if name != self._slot: raise AttributeError("'%s' object has no attribute '%s'" % (self.__class__.__name__, name))
+        with _lock:
+            try:
+                return object.__getattribute__(self, name)
+            except AttributeError:
+                pass
+            try:
+                value = self._load(self._buf, self._pos, self._mode)
+            except (IndexError, ValueError, StructError) as e:
+                raise NbtParseError("ELO Error，数据不完整(位于 %s字节): %s" % (self._pos, e))
+            object.__setattr__(self, name, value)
+            self._buf = self._ends = None
+            return value
+
+    def is_loaded(self):
+        try:
+            object.__getattribute__(self, self._slot)
+            return True
+        except AttributeError:
+            return False
+
+
+class Mapped_Compound(Mapped, TAG_Compound):
+    __slots__ = ('_buf', '_pos', '_mode', '_ends')
+    _slot = '_TAG_Compound__value'
+    _state = '_TAG_Compound__state'
+    _digest = '_TAG_Compound__digest'
+    _lent = '_TAG_Compound__lent'
+
+    def _load(self, buf, pos, mode):
+        res, length = {}, LENGTHS[mode].unpack_from
+        while True:
+            t = buf[pos]
+            if t == 0: return res
+            n = length(buf, pos + 1)[0]
+            pos += 3 + n
+            res[ce.unpack_data(bytes(buf[pos - n:pos]), TAG.STRING)], pos = decode_value(buf, pos, t, mode, self._ends)
+
+
+class Mapped_List(Mapped, TAG_List):
+    __slots__ = ('_buf', '_pos', '_mode', '_ends')
+    _slot = '_TAG_List__value'
+    _state = '_TAG_List__state'
+
+    def _load(self, buf, pos, mode):
+        t, n = buf[pos], COUNTS[mode].unpack_from(buf, pos + 1)[0]
+        pos += 5
+        if t in NUMBER_SIZE:
+            res = array(ARRAY_TYPECODE[TAG(t)])
+            res.frombytes(buf[pos:pos + n * NUMBER_SIZE[t]])
+            if len(res) != n: raise NbtParseError("ELO Error，期望%s个元素，实际为%s个（列表元素内容）" % (n, len(res)))
+            if bool(mode) != ce.NATIVE_BIG: res.byteswap()
+            return res
+        res = [None] * n
+        for i in range(n):
+            res[i], pos = decode_value(buf, pos, t, mode, self._ends)
+        return res
+
+
+class Mapped_Array(Mapped):
+    __slots__ = ()
+    _slot = '_TAG_Array__value'
+    _state = '_TAG_Array__state'
+    _digest = '_TAG_Array__digest'
+
+    def _load(self, buf, pos, mode):
+        n = COUNTS[mode].unpack_from(buf, pos)[0]
+        res = array(self.unit[2])
+        res.frombytes(buf[pos + 4:pos + 4 + n * res.itemsize])
+        if bool(mode) != ce.NATIVE_BIG: res.byteswap()
+        return res
+
+
+class Mapped_ByteArray(Mapped_Array, TAG_ByteArray):
+    __slots__ = ('_buf', '_pos', '_mode', '_ends')
+
+
+class Mapped_IntArray(Mapped_Array, TAG_IntArray):
+    __slots__ = ('_buf', '_pos', '_mode', '_ends')
+
+
+class Mapped_LongArray(Mapped_Array, TAG_LongArray):
+    __slots__ = ('_buf', '_pos', '_mode', '_ends')
+
+
+MAPPED_ARRAYS = {7: Mapped_ByteArray, 11: Mapped_IntArray, 12: Mapped_LongArray}
+
+
+def load(data, zip_mode=None, mode=False, header=False, ends=None):
+    from .root import path_is_file, decompress_buffer
+    if isinstance(data, str):
+        path_is_file(data)
+        buf = map_file(data)
+    elif isinstance(data, (bytes, bytearray, memoryview, mmap.mmap)):
+        buf = data
+    else:
+        buf = data.read()
+    if zip_mode in ('gzip', 'zlib') or (zip_mode is None and buf[:2] in ZIP_HEADS):
+        buf = decompress_buffer(BytesIO(buf[:]), zip_mode).getvalue()
+    elif isinstance(buf, memoryview) and (buf.format != 'B' or buf.ndim != 1):
+        buf = buf.cast('B')
+    pos = 8 if header else 0
+    try:
+        t = buf[pos]
+        if t not in (TAG.COMPOUND.value, TAG.LIST.value):
+            raise NbtDataError("数据的根标签必须是TAG_Compound或TAG_List，但实际是 %s" % (TAG(t) if t in TAG._value2member_map_ else t))
+        n = LENGTHS[mode].unpack_from(buf, pos + 1)[0]
+        root_name = ce.unpack_data(bytes(buf[pos + 3:pos + 3 + n]), TAG.STRING)
+        pos += 3 + n
+        if ends is None:
+            ends, end = scan_ends(buf, pos, t, mode)
+            if end > len(buf): raise NbtParseError("ELO Error，期望%s字节，实际为%s字节" % (end, len(buf)))
+        tag = decode_value(buf, pos, t, mode, ends)[0]
+    except (IndexError, ValueError, StructError) as e:
+        if isinstance(e, NbtDataError): raise
+        raise NbtParseError("ELO Error，数据不完整: %s" % e)
+    return tag, root_name
+
+
+def materialize(tag):
+    stack = [tag]
+    while stack:
+        tag = stack.pop()
+        if tag.type == TAG.COMPOUND: stack.extend(tag._peek().values())
+        elif tag.type == TAG.LIST and not tag.value_is_array(): stack.extend(tag._peek())
+        elif tag.type in (TAG.BYTE_ARRAY, TAG.INT_ARRAY, TAG.LONG_ARRAY): tag._peek()
+    return tag
+
+def is_loaded(tag):
+    return not isinstance(tag, Mapped) or tag.is_loaded()
@@ -0,0 +1,227 @@
+"""
+    patch.py - 定长数字字段的原地修改
+
+    扫描一遍数据，记录每个数字标签(byte/short/int/long/float/double，包括数字列表的元素)的路径与字节偏移，
+    之后只改写这些字节：未压缩的文件通过 mmap 原地修改，压缩的数据解压后改写再重新压缩，全程不构建标签树。
+"""
+
+
+import mmap, os
+from io import BytesIO, IOBase
+from struct import error as StructError
+from typing import Literal, Union
+
+from . import TAG, instrument, path as nbt_path, codec as ce
+from .abc import TAG_Base
+from .error import *
+from .mapped import LENGTHS, COUNTS, NUMBER_SIZE, ARRAY_SIZE, map_file
+
+ZIP_MODES = {b'\x1F\x8B': 'gzip', b'\x78\x9C': 'zlib'}
+
+
+def key_path(prefix, key):
+    key = key if nbt_path.PLAIN_KEY.fullmatch(key) else ce.str_to_string(key)
+    return prefix + "." + key if prefix else key
+
+
+def scan(buf, pos, mode) -> dict:
+    length, count = LENGTHS[mode].unpack_from, COUNTS[mode].unpack_from
+    res, stack = {}, []
+    t, p = buf[pos], ""
+    pos += 3 + length(buf, pos + 1)[0]
+    while True:
+        if t in NUMBER_SIZE:
+            res[p] = (pos, TAG(t))
+            pos += NUMBER_SIZE[t]
+        elif t == 8:
+            pos += 2 + length(buf, pos)[0]
+        elif t in ARRAY_SIZE:
+            pos += 4 + count(buf, pos)[0] * ARRAY_SIZE[t]
+        elif t == 9:
+            item, n = buf[pos], count(buf, pos + 1)[0]
+            pos += 5
+            if item in NUMBER_SIZE:
+                size, item_type = NUMBER_SIZE[item], TAG(item)
+                for i in range(n): res["%s[%d]" % (p, i)] = (pos + i * size, item_type)
+                pos += n * size
+            elif n > 0:
+                stack.append([p, item, n, 0])
+        elif t == 10:
+            stack.append([p, None])
+        else:
+            raise NbtParseError("未知的标签类型 %s，位于 %s字节" % (t, pos))
+        while stack:
+            top = stack[-1]
+            if top[1] is None:
+                t = buf[pos]
+                if t == 0:
+                    pos += 1
+                    stack.pop()
+                    continue
+                n = length(buf, pos + 1)[0]
+                p = key_path(top[0], ce.unpack_data(bytes(buf[pos + 3:pos + 3 + n]), TAG.STRING))
+                pos += 3 + n
+                break
+            if top[3] == top[2]:
+                stack.pop()
+                continue
+            p, t = "%s[%d]" % (top[0], top[3]), top[1]
+            top[3] += 1
+            break
+        else:
+            if pos > len(buf): raise NbtParseError("ELO Error，期望%s字节，实际为%s字节" % (pos, len(buf)))
+            return res
+
+
+class OffsetIndex:
+    def __init__(self, offsets: dict, mode: bool, zip_mode: str, size: int):
+        self.offsets = offsets
+        self.mode = mode
+        self.zip_mode = zip_mode
+        self.size = size
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, key):
+        return self.resolve(key) in self.offsets
+
+    def __getitem__(self, key):
+        res = self.offsets.get(self.resolve(key))
+        if res is None: raise NbtPathError("路径 %s 未找到或不是定长的数字标签" % key)
+        return res
+
+    def items(self):
+        return self.offsets.items()
+
+    def resolve(self, key):
+        path = nbt_path.compile(key)
+        if not path.simple or path.root_pattern is not None: raise NbtPathError("路径 %s 必须只包含键名与下标" % key)
+        return str(path)
+
+    def encode(self, values: dict) -> list:
+        res = []
+        for key, value in values.items():
+            offset, type = self[key]
+            if isinstance(value, TAG_Base):
+                if value.type != type: raise TypeError("路径 %s 期望类型为 %s，但传入了 %s" % (key, type, value.type))
+                value = value.get_value()
+            try:
+                res.append((offset, ce.pack_data(value, type, self.mode)))
+            except (TypeError, ValueError) as e:
+                raise e.__class__("路径 %s: %s" % (key, e))
+        return res
+
+    @instrument.traced("patch")
+    def patch(self, data: Union[str, bytes, bytearray, IOBase], values: dict):
+        changes = self.encode(values)
+        call = instrument.current()
+        if call: call.count("fields", len(changes))
+        if self.zip_mode == 'none':
+            if isinstance(data, str):
+                with open(data, 'r+b') as f:
+                    self.check(os.fstat(f.fileno()).st_size)
+                    with mmap.mmap(f.fileno(), 0) as buf:
+                        apply(buf, changes)
+                        buf.flush()
+                res = None
+            elif isinstance(data, (bytes, bytearray)):
+                self.check(len(data))
+                res = data if isinstance(data, bytearray) else bytearray(data)
+                apply(res, changes)
+                if isinstance(data, bytes): res = bytes(res)
+            else:
+                start = data.tell()
+                self.check(data.seek(0, 2) - start)
+                for offset, byte in changes:
+                    data.seek(start + offset)
+                    data.write(byte)
+                data.seek(start)
+                res = None
+            if call: call.mark("write")
+            return res
+        from .root import compress_file, decompress_buffer, write_file
+        if isinstance(data, str):
+            with open(data, 'rb') as f: raw = f.read()
+        elif isinstance(data, (bytes, bytearray)):
+            raw = data
+        else:
+            start = data.tell()
+            raw = data.read()
+        buf = bytearray(decompress_buffer(BytesIO(raw), self.zip_mode).getvalue())
+        if call: call.mark("decompress")
+        self.check(len(buf))
+        apply(buf, changes)
+        res = compress_file(bytes(buf), self.zip_mode)
+        if call: call.mark("compress")
+        if isinstance(data, str):
+            write_file(data, res)
+            return None
+        if isinstance(data, bytes): return res
+        if isinstance(data, bytearray):
+            data[:] = res
+            return data
+        data.seek(start)
+        data.truncate()
+        data.write(res)
+        data.seek(start)
+        if call: call.mark("write")
+
+    def check(self, size):
+        if size != self.size: raise NbtDataError("数据长度(%s字节)与建立索引时(%s字节)不同，需要重新建立索引" % (size, self.size))
+
+    def __repr__(self):
+        return "<OffsetIndex fields=%d zip_mode=%s byteorder=%s>" % (len(self.offsets), self.zip_mode, "big" if self.mode else "little")
+
+
+def apply(buf, changes):
+    for offset, byte in changes:
+        buf[offset:offset + len(byte)] = byte
+
+
+@instrument.traced("patch.index")
+def index(
+    data     : Union[str, bytes, bytearray, IOBase],
+    zip_mode : Literal['none', 'gzip', 'zlib'] = None,
+    byteorder: Literal['little', 'big'] = 'little',
+    header   : bool = False) -> OffsetIndex:
+    from .root import path_is_file, decompress_buffer
+    mode, mapped = byteorder == 'big', None
+    if isinstance(data, str):
+        path_is_file(data)
+        buf = mapped = map_file(data)
+    elif isinstance(data, (bytes, bytearray)):
+        buf = data
+    else:
+        start = data.tell()
+        buf = data.read()
+        data.seek(start)
+    try:
+        if zip_mode is None: zip_mode = ZIP_MODES.get(bytes(buf[:2]), 'none')
+        if zip_mode != 'none':
+            buf = decompress_buffer(BytesIO(bytes(buf)), zip_mode).getvalue()
+        call = instrument.current()
+        if call: call.mark("decompress")
+        pos = 8 if header else 0
+        try:
+            if buf[pos] not in (TAG.COMPOUND.value, TAG.LIST.value):
+                raise NbtDataError("数据的根标签必须是TAG_Compound或TAG_List，但实际是 %s" % (TAG(buf[pos]) if buf[pos] in TAG._value2member_map_ else buf[pos]))
+            offsets = scan(buf, pos, mode)
+        except (IndexError, ValueError, StructError) as e:
+            raise NbtParseError("ELO Error，数据不完整: %s" % e)
+        if call:
+            call.mark("scan")
+            call.count("fields", len(offsets))
+        return OffsetIndex(offsets, mode, zip_mode, len(buf))
+    finally:
+        if mapped is not None: mapped.close()
+
+
+@instrument.traced("patch")
+def patch(
+    data     : Union[str, bytes, bytearray, IOBase],
+    values   : dict,
+    zip_mode : Literal['none', 'gzip', 'zlib'] = None,
+    byteorder: Literal['little', 'big'] = 'little',
+    header   : bool = False):
+    return index(data, zip_mode, byteorder, header).patch(data, values)
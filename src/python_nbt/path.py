@@ -0,0 +1,344 @@
+"""
+    path.py - nbt路径表达式 (如 Data.Player.Inventory[3].id)
+"""
+
+
+import re
+from functools import lru_cache
+
+from . import TAG, TAGLIST, codec as ce
+from .error import *
+
+KEY_CHARS = re.compile(r'[^.\[\]{}"\' \t\n]+')
+PLAIN_KEY = re.compile(r'[A-Za-z0-9_+\-:]+')
+ARRAY_TAGS = (TAG.BYTE_ARRAY, TAG.INT_ARRAY, TAG.LONG_ARRAY)
+MISSING = object()
+
+
+def unwrap(node):
+    get_tag = getattr(node, "get_tag", None)
+    return node if get_tag is None else get_tag()
+
+def is_compound(node):
+    return isinstance(node, dict) or getattr(node, "type", None) == TAG.COMPOUND
+
+def is_list(node):
+    return isinstance(node, list) or getattr(node, "type", None) in (TAG.LIST,) + ARRAY_TAGS
+
+def entries(node):
+    # 只读遍历时直接使用标签内部的容器，不改变其写时复制状态
+    return node if isinstance(node, (dict, list)) else node._peek()
+
+def value_equal(pattern, node):
+    if hasattr(node, "type"):
+        if pattern.type in ARRAY_TAGS: return pattern.type == node.type and pattern._peek() == node._peek()
+        return pattern.type == node.type and pattern.get_value() == node.get_value()
+    if pattern.type in ARRAY_TAGS: return pattern._peek().tolist() == node
+    return pattern.get_value() == node
+
+def matches(pattern, node):
+    stack = [(pattern, node)]
+    while stack:
+        pattern, node = stack.pop()
+        if pattern.type == TAG.COMPOUND:
+            if not is_compound(node): return False
+            value = entries(node)
+            for k, p in pattern._peek().items():
+                if k not in value: return False
+                stack.append((p, value[k]))
+        elif pattern.type == TAG.LIST and not isinstance(node, list) and getattr(node, "type", None) != TAG.LIST:
+            return False
+        elif pattern.type == TAG.LIST:
+            items = list(iter_children(node, False))
+            for p in pattern:
+                if not any(matches(p, v) for v in items): return False
+        elif not value_equal(pattern, node):
+            return False
+    return True
+
+def iter_children(node, lend=True):
+    if isinstance(node, list): return iter(node)
+    if node.type == TAG.LIST and node.value_is_array():
+        cls = TAGLIST[node.get_type()]
+        return (cls(v) for v in node._peek())
+    return iter(node if lend else node._peek())
+
+
+class Step:
+    __slots__ = ("kind", "name", "index", "pattern")
+
+    def __init__(self, kind, name=None, index=None, pattern=None):
+        self.kind, self.name, self.index, self.pattern = kind, name, index, pattern
+
+    def expand(self, node):
+        kind = self.kind
+        if kind == "key":
+            if not is_compound(node): return ()
+            child = node.get(self.name, MISSING)
+            if child is MISSING or (self.pattern is not None and not matches(self.pattern, child)): return ()
+            return (child,)
+        if kind == "any":
+            if not is_compound(node): return ()
+            children = node.values()
+            if self.pattern is None: return tuple(children)
+            return tuple(v for v in children if matches(self.pattern, v))
+        if not is_list(node): return ()
+        if kind == "index":
+            try:
+                return (node[self.index],)
+            except IndexError:
+                return ()
+        if kind == "all":
+            return tuple(iter_children(node))
+        return tuple(v for v in iter_children(node) if matches(self.pattern, v))
+
+    def __str__(self):
+        pattern = "" if self.pattern is None else self.pattern.to_snbt()
+        if self.kind == "key":
+            return (self.name if PLAIN_KEY.fullmatch(self.name) else ce.str_to_string(self.name)) + pattern
+        if self.kind == "any": return "*" + pattern
+        if self.kind == "index": return "[%d]" % self.index
+        if self.kind == "all": return "[]"
+        return "[%s]" % pattern
+
+
+class NbtPath:
+    def __init__(self, expr, root_pattern, steps):
+        self.expr = expr
+        self.root_pattern = root_pattern
+        self.steps = tuple(steps)
+        self.simple = all(s.kind in ("key", "index") and s.pattern is None for s in self.steps)
+
+    def __str__(self):
+        res = "" if self.root_pattern is None else self.root_pattern.to_snbt()
+        for step in self.steps:
+            if res and step.kind in ("key", "any"): res += "."
+            res += str(step)
+        return res
+
+    def __repr__(self):
+        return "<NbtPath %s>" % self
+
+    def __eq__(self, other):
+        return isinstance(other, NbtPath) and str(self) == str(other)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def _walk(self, root, steps):
+        nodes = [unwrap(root)]
+        if self.root_pattern is not None and not matches(self.root_pattern, nodes[0]): return []
+        for step in steps:
+            expand = step.expand
+            nodes = [c for n in nodes for c in expand(n)]
+            if not nodes: break
+        return nodes
+
+    def get(self, root, default=MISSING):
+        if self.simple and self.root_pattern is None:
+            node = unwrap(root)
+            for step in self.steps:
+                try:
+                    if step.kind == "key":
+                        if not is_compound(node): raise KeyError(step.name)
+                        node = node[step.name]
+                    else:
+                        if not is_list(node): raise IndexError(step.index)
+                        node = node[step.index]
+                except (KeyError, IndexError):
+                    node = MISSING
+                    break
+        else:
+            nodes = self._walk(root, self.steps)
+            node = nodes[0] if nodes else MISSING
+        if node is MISSING:
+            if default is MISSING: raise NbtPathError("路径 %s 未找到" % self)
+            return default
+        return node
+
+    def get_all(self, root):
+        return self._walk(root, self.steps)
+
+    def exists(self, root):
+        return self.get(root, None) is not None
+
+    def set(self, root, value, create=False):
+        if not self.steps: raise NbtPathError("不能替换根标签")
+        last = self.steps[-1]
+        parents = self._parents(root, create)
+        count = 0
+        for parent in parents:
+            count += set_child(parent, last, duplicate(value, count))
+        if count == 0 and not create: raise NbtPathError("路径 %s 未找到" % self)
+        return count
+
+    def delete(self, root):
+        if not self.steps: raise NbtPathError("不能删除根标签")
+        last, count = self.steps[-1], 0
+        for parent in self._parents(root, False):
+            count += delete_child(parent, last)
+        return count
+
+    def _parents(self, root, create):
+        if not create: return self._walk(root, self.steps[:-1])
+        nodes = [unwrap(root)]
+        for step in self.steps[:-1]:
+            res = []
+            for node in nodes:
+                children = step.expand(node)
+                if not children and step.kind == "key" and step.pattern is None and is_compound(node):
+                    child = {} if isinstance(node, dict) else TAGLIST[TAG.COMPOUND]()
+                    node[step.name] = child
+                    children = (child,)
+                res.extend(children)
+            nodes = res
+        return nodes
+
+
+def duplicate(value, n):
+    # 同一个标签不能放进多个位置，第一个之后的位置各放一份副本
+    copy = getattr(value, "copy", None)
+    return value if n == 0 or copy is None else copy()
+
+def set_child(parent, step, value):
+    if step.kind == "key":
+        if not is_compound(parent): return 0
+        if not isinstance(parent, dict): parent._test_value(value)
+        if step.pattern is not None and not (step.name in parent and matches(step.pattern, entries(parent)[step.name])): return 0
+        parent[step.name] = value
+        return 1
+    if step.kind == "any":
+        if not is_compound(parent): return 0
+        keys = [k for k, v in entries(parent).items()
+                if step.pattern is None or matches(step.pattern, v)]
+        for n, k in enumerate(keys): parent[k] = duplicate(value, n)
+        return len(keys)
+    if not is_list(parent): return 0
+    if step.kind == "index":
+        try:
+            parent[step.index] = value
+        except IndexError:
+            return 0
+        return 1
+    indexes = [i for i, v in enumerate(iter_children(parent, False)) if step.kind == "all" or matches(step.pattern, v)]
+    for n, i in enumerate(indexes): parent[i] = duplicate(value, n)
+    return len(indexes)
+
+def delete_child(parent, step):
+    if step.kind == "key":
+        if not is_compound(parent): return 0
+        if step.name not in parent or (step.pattern is not None and not matches(step.pattern, entries(parent)[step.name])): return 0
+        del parent[step.name]
+        return 1
+    if step.kind == "any":
+        if not is_compound(parent): return 0
+        keys = [k for k, v in entries(parent).items() if step.pattern is None or matches(step.pattern, v)]
+        for k in keys: del parent[k]
+        return len(keys)
+    if not is_list(parent): return 0
+    if step.kind == "index":
+        try:
+            del parent[step.index]
+        except IndexError:
+            return 0
+        return 1
+    indexes = [i for i, v in enumerate(iter_children(parent, False)) if step.kind == "all" or matches(step.pattern, v)]
+    for i in reversed(indexes): del parent[i]
+    return len(indexes)
+
+
+def scan_braces(expr, pos):
+    depth, quote, i = 0, None, pos
+    while i < len(expr):
+        c = expr[i]
+        if quote:
+            if c == "\\": i += 1
+            elif c == quote: quote = None
+        elif c in "\"'": quote = c
+        elif c in "{[": depth += 1
+        elif c in "}]":
+            depth -= 1
+            if depth == 0: return i + 1
+        i += 1
+    raise NbtPathError("路径 '%s' 中的括号未闭合 (第%s个字符)" % (expr, pos))
+
+def parse_pattern(expr, start, end):
+    try:
+        return TAGLIST[TAG.COMPOUND].from_snbt(expr[start:end])
+    except (SnbtParseError, SnbtTokenError) as e:
+        raise NbtPathError("路径 '%s' 中的过滤条件无法解析: %s" % (expr, e.args[0]))
+
+def parse_quoted(expr, pos):
+    quote, i = expr[pos], pos + 1
+    while i < len(expr):
+        if expr[i] == "\\": i += 2; continue
+        if expr[i] == quote: return ce.string_to_str(expr[pos:i + 1]), i + 1
+        i += 1
+    raise NbtPathError("路径 '%s' 中的引号未闭合 (第%s个字符)" % (expr, pos))
+
+@lru_cache(maxsize=1024)
+def compile(expr: str) -> NbtPath:
+    if isinstance(expr, NbtPath): return expr
+    if not isinstance(expr, str): raise TypeError("期望类型为 %s，但传入了 %s" % (str, repr(expr)))
+    steps, root_pattern, pos, n = [], None, 0, len(expr)
+    if expr[:1] == "{":
+        end = scan_braces(expr, 0)
+        root_pattern = parse_pattern(expr, 0, end)
+        pos = end
+    need_key = root_pattern is None
+    while pos < n:
+        c = expr[pos]
+        if c == ".":
+            if need_key: raise NbtPathError("路径 '%s' 第%s个字符处缺少键名" % (expr, pos))
+            pos += 1
+            need_key = True
+            continue
+        if c == "[":
+            if pos + 1 < n and expr[pos + 1] == "]":
+                steps.append(Step("all"))
+                pos += 2
+            elif pos + 1 < n and expr[pos + 1] == "{":
+                end = scan_braces(expr, pos + 1)
+                if end >= n or expr[end] != "]": raise NbtPathError("路径 '%s' 第%s个字符处期望 ]" % (expr, end))
+                steps.append(Step("match", pattern=parse_pattern(expr, pos + 1, end)))
+                pos = end + 1
+            else:
+                end = expr.find("]", pos)
+                if end < 0: raise NbtPathError("路径 '%s' 中的括号未闭合 (第%s个字符)" % (expr, pos))
+                try:
+                    steps.append(Step("index", index=int(expr[pos + 1:end])))
+                except ValueError:
+                    raise NbtPathError("路径 '%s' 中的下标 '%s' 不是整数" % (expr, expr[pos + 1:end]))
+                pos = end + 1
+            need_key = False
+            continue
+        if not need_key and steps: raise NbtPathError("路径 '%s' 第%s个字符处期望 . 或 [" % (expr, pos))
+        if c in "\"'":
+            name, pos = parse_quoted(expr, pos)
+            step = Step("key", name=name)
+        else:
+            m = KEY_CHARS.match(expr, pos)
+            if m is None: raise NbtPathError("路径 '%s' 第%s个字符 '%s' 无法解析" % (expr, pos, c))
+            name, pos = m.group(), m.end()
+            step = Step("any") if name == "*" else Step("key", name=name)
+        if pos < n and expr[pos] == "{":
+            end = scan_braces(expr, pos)
+            step.pattern = parse_pattern(expr, pos, end)
+            pos = end
+        steps.append(step)
+        need_key = False
+    if need_key and steps: raise NbtPathError("路径 '%s' 以 . 结尾" % expr)
+    return NbtPath(expr, root_pattern, steps)
+
+
+def get(root, expr, default=MISSING):
+    return compile(expr).get(root, default)
+
+def get_all(root, expr):
+    return compile(expr).get_all(root)
+
+def set(root, expr, value, create=False):
+    return compile(expr).set(root, value, create)
+
+def delete(root, expr):
+    return compile(expr).delete(root)
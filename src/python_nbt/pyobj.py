@@ -0,0 +1,245 @@
+"""
+    pyobj.py - nbt与Python对象(json)之间的相互转换
+"""
+
+
+from array import array
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from . import TAG, tags
+from .abc import ARRAY_TYPECODE
+
+TYPE_CODES = {
+    TAG.END       : "end",
+    TAG.BYTE      : "b",
+    TAG.SHORT     : "s",
+    TAG.INT       : "i",
+    TAG.LONG      : "l",
+    TAG.FLOAT     : "f",
+    TAG.DOUBLE    : "d",
+    TAG.STRING    : "str",
+    TAG.LIST      : "list",
+    TAG.COMPOUND  : "cpd",
+    TAG.BYTE_ARRAY: "B",
+    TAG.INT_ARRAY : "I",
+    TAG.LONG_ARRAY: "L",
+}
+
+CODE_TYPES = {v: k for k, v in TYPE_CODES.items()}
+
+NUMBER_TAGS = {
+    TAG.BYTE  : tags.TAG_Byte,
+    TAG.SHORT : tags.TAG_Short,
+    TAG.INT   : tags.TAG_Int,
+    TAG.LONG  : tags.TAG_Long,
+    TAG.FLOAT : tags.TAG_Float,
+    TAG.DOUBLE: tags.TAG_Double,
+}
+
+ARRAY_TAGS = {
+    TAG.BYTE_ARRAY: tags.TAG_ByteArray,
+    TAG.INT_ARRAY : tags.TAG_IntArray,
+    TAG.LONG_ARRAY: tags.TAG_LongArray,
+}
+
+SCALAR_TYPES = frozenset(list(NUMBER_TAGS) + [TAG.STRING])
+
+INT_RANGE = (-2147483648, 2147483647)
+
+
+def type_code(tag):
+    if tag.type == TAG.LIST:
+        return "[%s]" % TYPE_CODES[tag.get_type()]
+    return TYPE_CODES[tag.type]
+
+def split_key(key, sep):
+    name, s, code = key.rpartition(sep)
+    if not s: raise ValueError("键 '%s' 缺少类型后缀(%s类型)" % (key, sep))
+    return name, code
+
+def parse_code(code):
+    if code[:1] == "[" and code[-1:] == "]":
+        element = CODE_TYPES.get(code[1:-1])
+        if element is None: raise ValueError("未知的类型后缀 '%s'" % code)
+        return TAG.LIST, element
+    type = CODE_TYPES.get(code)
+    if type is None or type in (TAG.END, TAG.LIST): raise ValueError("未知的类型后缀 '%s'" % code)
+    return type, None
+
+
+def to_python(tag, typed=False, buffers=False, sep="@"):
+    from .root import RootNBT
+    if isinstance(tag, RootNBT):
+        name = tag.get_root_name()
+        if typed: name = name + sep + type_code(tag.get_tag())
+        return {name: to_python(tag.get_tag(), typed, buffers, sep)}
+    if tag.type in SCALAR_TYPES:
+        return tag.get_value()
+    if tag.type in ARRAY_TAGS:
+        value = tag._peek()
+        return array(value.typecode, value) if buffers else value.tolist()
+    out = [None]
+    stack = [(tag, out, 0)]
+    pop, push = stack.pop, stack.append
+    while stack:
+        tag, parent, index = pop()
+        if tag.type == TAG.COMPOUND:
+            res = parent[index] = {}
+            for k, v in tag._peek().items():
+                t = v.type
+                if typed: k = k + sep + ("[%s]" % TYPE_CODES[v.get_type()] if t == TAG.LIST else TYPE_CODES[t])
+                if t in SCALAR_TYPES:
+                    res[k] = v.get_value()
+                elif t in ARRAY_TAGS:
+                    value = v._peek()
+                    res[k] = array(value.typecode, value) if buffers else value.tolist()
+                else:
+                    res[k] = None
+                    push((v, res, k))
+        else:
+            value = tag._peek()
+            if tag.value_is_array():
+                parent[index] = array(value.typecode, value) if buffers else value.tolist()
+                continue
+            t = tag.get_type()
+            if t in SCALAR_TYPES:
+                parent[index] = [v.get_value() for v in value]
+            elif t in ARRAY_TAGS:
+                parent[index] = [array(v._peek().typecode, v._peek()) if buffers else v._peek().tolist() for v in value]
+            elif t == TAG.LIST and typed:
+                res = parent[index] = [{"[%s]" % TYPE_CODES[v.get_type()]: None} for v in value]
+                for v, r in zip(value, res):
+                    push((v, r, next(iter(r))))
+            else:
+                res = parent[index] = [None] * len(value)
+                for i, v in enumerate(value):
+                    push((v, res, i))
+    return out[0]
+
+
+def infer_list_type(value):
+    kinds = set(map(type, value))
+    if kinds <= {int, bool}:
+        if min(value) < INT_RANGE[0] or max(value) > INT_RANGE[1]: return TAG.LONG
+        return TAG.INT
+    if kinds <= {int, float, bool}:
+        return TAG.DOUBLE
+    return None
+
+def infer_type(value):
+    if isinstance(value, tags.TAG_Base): return value.type
+    if isinstance(value, bool): return TAG.BYTE
+    if isinstance(value, int): return TAG.INT if INT_RANGE[0] <= value <= INT_RANGE[1] else TAG.LONG
+    if isinstance(value, float): return TAG.DOUBLE
+    if isinstance(value, str): return TAG.STRING
+    if isinstance(value, dict): return TAG.COMPOUND
+    if isinstance(value, (bytes, bytearray)): return TAG.BYTE_ARRAY
+    if isinstance(value, array):
+        if value.typecode == "b": return TAG.BYTE_ARRAY
+        if value.typecode in "iIlL" and value.itemsize == 4: return TAG.INT_ARRAY
+        if value.typecode in "qQlL": return TAG.LONG_ARRAY
+        return TAG.LIST
+    if isinstance(value, (list, tuple)): return TAG.LIST
+    raise TypeError("无法转换为nbt的类型 %s" % type(value))
+
+def new_tag(value, t, element, stack):
+    if isinstance(value, tags.TAG_Base):
+        if value.type != t: raise TypeError("期望类型为 %s，但传入了 %s" % (t, value.type))
+        return value
+    if t in NUMBER_TAGS:
+        if t == TAG.FLOAT or t == TAG.DOUBLE: return NUMBER_TAGS[t](float(value))
+        return NUMBER_TAGS[t](int(value) if isinstance(value, bool) else value)
+    if t == TAG.STRING:
+        if not isinstance(value, str): raise TypeError("期望类型为 %s，但传入了 %s" % (str, repr(value)))
+        return tags.TAG_String(value)
+    if t in ARRAY_TAGS:
+        cls = ARRAY_TAGS[t]
+        if isinstance(value, (bytes, bytearray)):
+            if t != TAG.BYTE_ARRAY: raise TypeError("期望类型为 %s，但传入了 %s" % (list, repr(value)))
+            return cls(array("b", value))
+        try:
+            return cls(array(cls.unit[2], value))
+        except (TypeError, OverflowError) as e:
+            raise ValueError("尝试从(%s)自动转换数值失败 %s" % (t, e.args[0]))
+    if t == TAG.COMPOUND:
+        if not isinstance(value, dict): raise TypeError("期望类型为 %s，但传入了 %s" % (dict, repr(value)))
+        tag = tags.TAG_Compound()
+        stack.append((tag, value, None))
+        return tag
+    if t == TAG.LIST:
+        if isinstance(value, array):
+            return tags.TAG_List(array(value.typecode, value))
+        if not isinstance(value, (list, tuple)): raise TypeError("期望类型为 %s，但传入了 %s" % (list, repr(value)))
+        if element is None and value:
+            element = infer_list_type(value)
+        if element in ARRAY_TYPECODE:
+            try:
+                return tags.TAG_List(array(ARRAY_TYPECODE[element], value))
+            except (TypeError, OverflowError) as e:
+                raise ValueError("尝试从(%s)自动转换数值失败 %s" % (element, e.args[0]))
+        tag = tags.TAG_List()
+        stack.append((tag, value, element))
+        return tag
+    raise TypeError("无法转换为nbt的类型 %s" % t)
+
+
+def from_python(value, typed=False, sep="@", type=None):
+    if type is None:
+        type = TAG.COMPOUND if typed and isinstance(value, dict) else infer_type(value)
+    element = None
+    if isinstance(type, str):
+        type, element = parse_code(type)
+    stack = []
+    root = new_tag(value, type, element, stack)
+    pop = stack.pop
+    while stack:
+        tag, value, element = pop()
+        if tag.type == TAG.COMPOUND:
+            res = tag._peek()
+            for k, v in value.items():
+                if not isinstance(k, str): raise TypeError("Compound键的期望类型为 %s，但传入了 %s" % (str, k))
+                if typed:
+                    k, code = split_key(k, sep)
+                    t, e = parse_code(code)
+                else:
+                    t, e = infer_type(v), None
+                res[k] = new_tag(v, t, e, stack)
+        elif typed and element == TAG.LIST:
+            items = []
+            for v in value:
+                if not (isinstance(v, dict) and len(v) == 1): raise ValueError("列表内的列表期望为 {'[类型]': [...]} 形式，但传入了 %s" % repr(v))
+                code, v = next(iter(v.items()))
+                t, e = parse_code(code)
+                items.append(new_tag(v, t, e, stack))
+            tag.set_value(items)
+        elif element is None:
+            tag.set_value([new_tag(v, infer_type(v), None, stack) for v in value])
+        else:
+            tag.set_value([new_tag(v, element, None, stack) for v in value])
+    return root
+
+
+def dumps(tag, typed=False, indent=None, sep="@") -> bytes:
+    value = to_python(tag, typed, False, sep)
+    if orjson is not None and indent in (None, 2):
+        res = orjson.dumps(value, option=orjson.OPT_INDENT_2 if indent else 0)
+        # orjson 会把 NaN/Infinity 写成 null，nbt 中没有 null，出现时改用 json 模块写出
+        if b"null" not in res: return res
+    return json.dumps(value, ensure_ascii=False, indent=indent, separators=None if indent else (",", ":")).encode("utf-8")
+
+def parse_json(data):
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    # json 模块可以读取 NaN/Infinity/-Infinity
+    return json.loads(data)
+
+def loads(data, typed=False, sep="@", type=None):
+    return from_python(parse_json(data), typed, sep, type)
@@ -0,0 +1,218 @@
+"""
+    region.py - 区域文件(.mca)的读取与区块缓存
+
+    RegionFile 读取 8KiB 的文件头(区块位置与时间戳)，按需读出单个区块并解码；
+    ChunkCache 以 (区域文件路径, cx, cz) 为键缓存解码后的区块，按解压后的字节数限制总大小并按 LRU 淘汰，
+    区域文件被修改后只丢弃位置或时间戳发生变化的区块，多个线程同时读取同一区块时只解码一次。
+"""
+
+
+import os, re, threading
+from array import array
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+from io import BytesIO
+
+from . import instrument, codec as ce
+from .error import *
+from .root import RootNBT, path_is_file, decompress_buffer
+
+SECTOR = 4096
+COMPRESSION = {1: 'gzip', 2: 'zlib', 3: 'none'}
+NAME = re.compile(r'r\.(-?\d+)\.(-?\d+)\.mc[ar]$')
+
+ChunkCacheInfo = namedtuple("ChunkCacheInfo", ["hits", "misses", "evictions", "invalidations", "currsize", "maxsize", "count"])
+
+
+def region_path(directory: str, cx: int, cz: int) -> str:
+    return os.path.join(directory, "r.%d.%d.mca" % (cx >> 5, cz >> 5))
+
+def file_signature(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class RegionFile:
+    def __init__(self, path: str):
+        path_is_file(path)
+        self.path = path
+        match = NAME.search(os.path.basename(path))
+        self.rx, self.rz = (int(match[1]), int(match[2])) if match else (None, None)
+        with open(path, 'rb') as f:
+            self.signature = file_signature(path)
+            head = f.read(2 * SECTOR)
+        if not head:
+            head = bytes(2 * SECTOR)
+        elif len(head) < 2 * SECTOR:
+            raise NbtFileError("区域文件('%s')的文件头不完整，期望%s字节，实际为%s字节" % (path, 2 * SECTOR, len(head)))
+        self.locations = array('I', head[:SECTOR])
+        self.timestamps = array('I', head[SECTOR:])
+        if not ce.NATIVE_BIG:
+            self.locations.byteswap()
+            self.timestamps.byteswap()
+
+    @staticmethod
+    def index(cx: int, cz: int) -> int:
+        return (cx & 31) + (cz & 31) * 32
+
+    def location(self, cx: int, cz: int):
+        loc = self.locations[self.index(cx, cz)]
+        return loc >> 8, loc & 0xFF
+
+    def timestamp(self, cx: int, cz: int) -> int:
+        return self.timestamps[self.index(cx, cz)]
+
+    def chunk_signature(self, cx: int, cz: int):
+        i = self.index(cx, cz)
+        return self.locations[i], self.timestamps[i]
+
+    def __contains__(self, pos):
+        return self.locations[self.index(*pos)] != 0
+
+    def chunks(self):
+        for i, loc in enumerate(self.locations):
+            if loc: yield i & 31, i >> 5
+
+    def __len__(self):
+        return sum(1 for loc in self.locations if loc)
+
+    def read(self, cx: int, cz: int):
+        offset, count = self.location(cx, cz)
+        if offset == 0: return None
+        with open(self.path, 'rb') as f:
+            f.seek(offset * SECTOR)
+            data = f.read(count * SECTOR)
+        if len(data) < 5: raise NbtFileError("区域文件('%s')中的区块(%s, %s)超出了文件范围" % (self.path, cx, cz))
+        length, compression = int.from_bytes(data[:4], 'big'), data[4]
+        if compression & 128:
+            if self.rx is None: raise NbtFileError("无法从文件名('%s')得到区域坐标，不能读取外部区块文件" % self.path)
+            external = os.path.join(os.path.dirname(self.path), "c.%d.%d.mcc" % (self.rx * 32 + (cx & 31), self.rz * 32 + (cz & 31)))
+            path_is_file(external)
+            with open(external, 'rb') as f: payload = f.read()
+            compression &= 127
+        else:
+            if length < 1 or length + 4 > len(data): raise NbtFileError("区域文件('%s')中区块(%s, %s)的长度 %s 不正确" % (self.path, cx, cz, length))
+            payload = data[5:4 + length]
+        if compression not in COMPRESSION: raise NbtFileError("不支持的区块压缩方式 %s(区块(%s, %s))" % (compression, cx, cz))
+        return payload, COMPRESSION[compression]
+
+    def read_nbt(self, cx: int, cz: int):
+        res = self.read(cx, cz)
+        if res is None: return None
+        return decompress_buffer(BytesIO(res[0]), res[1]).getvalue()
+
+    def chunk(self, cx: int, cz: int, lazy: bool = False) -> RootNBT:
+        data = self.read_nbt(cx, cz)
+        return None if data is None else RootNBT.from_nbt(data, 'none', 'big', lazy)
+
+    def __repr__(self):
+        return "<RegionFile %s chunks=%d>" % (self.path, len(self))
+
+
+class ChunkCache:
+    def __init__(self, max_size: int = 256 << 20, lazy: bool = False):
+        self.max_size = max_size
+        self.lazy = lazy
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        self._size = 0
+        self._entries = OrderedDict()
+        self._regions = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def region(self, path: str) -> RegionFile:
+        path = os.path.abspath(path)
+        signature = file_signature(path)
+        with self._lock:
+            region = self._regions.get(path)
+            if region is not None and region.signature == signature: return region
+        new = RegionFile(path)
+        with self._lock:
+            region = self._regions.get(path)
+            if region is not None and region.signature == new.signature: return region
+            self._regions[path] = new
+            if region is not None:
+                for key in [k for k in self._entries if k[0] == path]:
+                    if self._entries[key][2] != new.chunk_signature(key[1], key[2]):
+                        self._drop(key)
+                        self.invalidations += 1
+        return new
+
+    def get(self, path: str, cx: int, cz: int) -> RootNBT:
+        region = self.region(path)
+        key, signature = (region.path, cx & 31, cz & 31), region.chunk_signature(cx, cz)
+        call = instrument.current()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                if call: call.count("chunk_cache_hits", 1)
+                return copy_root(entry[0])
+            if entry is not None:
+                self._drop(key)
+                self.invalidations += 1
+            future = self._loading.get(key)
+            owner = future is None
+            if owner:
+                future = self._loading[key] = Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+        if not owner:
+            if call: call.count("chunk_cache_hits", 1)
+            return copy_root(future.result())
+        if call: call.count("chunk_cache_misses", 1)
+        try:
+            data = region.read_nbt(cx, cz)
+            root = None if data is None else RootNBT.from_nbt(data, 'none', 'big', self.lazy)
+        except BaseException as e:
+            with self._lock: del self._loading[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._loading[key]
+            if self._regions.get(region.path) is region:
+                self._entries[key] = (root, 64 if data is None else len(data), signature)
+                self._size += self._entries[key][1]
+                while self._size > self.max_size and len(self._entries) > 1:
+                    self._drop(next(iter(self._entries)))
+                    self.evictions += 1
+        future.set_result(root)
+        return copy_root(root)
+
+    def _drop(self, key):
+        self._size -= self._entries.pop(key)[1]
+
+    def invalidate(self, path: str = None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._regions.clear()
+                self._size = 0
+                return
+            path = os.path.abspath(path)
+            self._regions.pop(path, None)
+            for key in [k for k in self._entries if k[0] == path]: self._drop(key)
+
+    def clear(self):
+        self.invalidate()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def cache_info(self) -> ChunkCacheInfo:
+        with self._lock:
+            return ChunkCacheInfo(self.hits, self.misses, self.evictions, self.invalidations, self._size, self.max_size, len(self._entries))
+
+    def __repr__(self):
+        return "<ChunkCache chunks=%d size=%d/%d hit_rate=%.1f%%>" % (len(self._entries), self._size, self.max_size, self.hit_rate * 100)
+
+
+def copy_root(root):
+    return None if root is None else RootNBT(root.get_tag().copy(), root.get_root_name())
@@ -6,9 +6,10 @@
 from typing import Literal, Union
 from io import StringIO, BytesIO, IOBase, RawIOBase, BufferedIOBase, TextIOBase
 import zlib, gzip, os
+from hashlib import blake2b
 
 from .error import *
-from . import tags, snbt, codec as ce, TAG, TAGLIST
+from . import tags, snbt, pyobj, instrument, mapped, codec as ce, TAG, TAGLIST
 
 def is_text_io(buffer):
     if not isinstance(buffer, TextIOBase):
@@ -34,11 +35,11 @@ def path_is_file(path):
     if not os.path.exists(path): raise NbtFileError("路径('%s')未找到" % path)
     if not os.path.isfile(path): raise NbtFileError("路径('%s')非文件" % path)
 
-def compress_file(data, zip_mode):
+def compress_file(data, zip_mode, canonical=False):
     if zip_mode == 'zlib':
         return zlib.compress(data)
     if zip_mode == 'gzip':
-        return gzip.compress(data)
+        return gzip.compress(data, mtime=0 if canonical else None)
     if zip_mode == 'none':
         return data
     
@@ -55,6 +56,66 @@ def decompress_buffer(buffer, zip_mode, head_byte=None):
     else:
         return buffer
 
+def read_file(path, mode='rb'):
+    path_is_file(path)
+    with open(path, mode) as f:
+        data = f.read()
+    if call := instrument.current(): call.mark("read")
+    return data
+
+def decode_buffer(data, zip_mode, mode, header):
+    call = instrument.current()
+    start = data.tell() if call else 0
+    buffer = decompress_buffer(data, zip_mode)
+    if call: call.mark("decompress")
+    if header:
+        byte = buffer_read(buffer, 4, "工具版本号")
+        try:
+            tool_version = ce.unpack_data(byte, TAG.INT, mode)
+        except Exception as e:
+            throw_nbt_error(e, buffer, 4)
+        byte = buffer_read(buffer, 4, "除头文件后的长度")
+        try:
+            length = ce.unpack_data(byte, TAG.INT, mode)
+        except Exception as e:
+            throw_nbt_error(e, buffer, 4)
+    res = parse_nbt(buffer, mode)
+    if call:
+        call.mark("decode")
+        call.count("bytes_in", data.tell() - start)
+        call.count("bytes_decoded", buffer.tell() - (start if buffer is data else 0))
+        call.tree(res[0])
+    return res
+
+def encode_tree(tag, root_name, zip_mode, mode, header, canonical=False):
+    call = instrument.current()
+    if call: call.tree(tag)
+    data = render_nbt(tag, root_name, mode, canonical)
+    if header:
+        data = b'\x0A\x00\x00\00' + ce.pack_data(len(data), TAG.INT, mode) + data
+    if call:
+        call.mark("encode")
+        call.count("bytes_encoded", len(data))
+    data = compress_file(data, zip_mode, canonical)
+    if call:
+        call.mark("compress")
+        call.count("bytes_out", len(data))
+    return data
+
+def load_mapped(data, zip_mode, mode, header):
+    res = mapped.load(data, zip_mode, mode, header)
+    if call := instrument.current(): call.mark("map")
+    return res
+
+def write_file(target, data):
+    if isinstance(target, str):
+        with open(target, 'wb') as f:
+            f.write(data)
+    else:
+        is_byte_io(target) and is_writ_io(target) and is_seek_io(target)
+        target.write(data)
+    if call := instrument.current(): call.mark("write")
+
 def parse_nbt(buffer, mode):
     byte = buffer_read(buffer, 1, "根标签类型")
     try:
@@ -75,13 +136,13 @@ def parse_nbt(buffer, mode):
     tag = TAGLIST[type]._from_bytesIO(buffer, mode)
     return tag, root_name
 
-def render_nbt(tag, root_name, mode):
+def render_nbt(tag, root_name, mode, canonical=False):
     res = bytearray()
     name = ce.pack_data(root_name, TAG.STRING)
     res.extend(ce.tag_type_to_bytes(tag.type))
     res.extend(ce.length_to_bytes(len(name), mode))
     res.extend(name)
-    res.extend(tag.to_bytes(mode))
+    res.extend(tag.to_bytes(mode, canonical))
     return bytes(res)
 
 def parse_snbt(buffer):
@@ -105,11 +166,11 @@ def parse_snbt(buffer):
             buffer.throw_error(token, "{ [ root_name")
         return tag, root_name
 
-def render_snbt(tag, root_name, target, format, size):
+def render_snbt(tag, root_name, target, format, size, canonical=False):
     if not isinstance(size, int): raise TypeError("缩进期望类型为 %s，但传入了 %s" % (int, size.__class__))
     if not 1 <= size <= 16: raise ValueError("超出范围(1 ~ 16)的数字 %s" % size)
-    if not format:
-        target.write(f'{ce.str_to_snbt_key(root_name)}:{tag._to_snbt()}')
+    if not format or canonical:
+        target.write(f'{ce.str_to_snbt_key(root_name)}:{tag._to_snbt(canonical)}')
     else:
         target.write(f'{ce.str_to_snbt_key(root_name)}: ')
         tag._to_snbt_format(target, 1, size)
@@ -123,99 +184,149 @@ class RootNBT:
 
     # === nbt ===
     @classmethod
+    @instrument.traced("from_nbt")
     def from_nbt(cls,
         data     : Union[str, bytes, IOBase],
         zip_mode : Literal['none', 'gzip', 'zlib'] = None,
-        byteorder: Literal['little', 'big'] = 'little'):
+        byteorder: Literal['little', 'big'] = 'little',
+        lazy     : bool = False,
+        cache    : 'NbtCache' = None):
+        if cache is not None and isinstance(data, str):
+            return cls(*cache.load(data, zip_mode, byteorder == 'big', False, lazy))
+        if lazy:
+            return cls(*load_mapped(data, zip_mode, byteorder == 'big', False))
         if isinstance(data, str):
-            path_is_file(data)
-            data = open(data, 'rb')
+            data = read_file(data)
         if isinstance(data, bytes):
             data = BytesIO(data)
         is_byte_io(data) and is_read_io(data) and is_seek_io(data)
-        data = decompress_buffer(data, zip_mode)
-        return cls(*parse_nbt(data, byteorder == 'big'))
+        return cls(*decode_buffer(data, zip_mode, byteorder == 'big', False))
     
+    @instrument.traced("to_nbt")
     def to_nbt(self,
         target   : Union[str, IOBase] = None,
         zip_mode : Literal['none', 'gzip', 'zlib'] = 'none',
-        byteorder: Literal['little', 'big'] = 'little') -> bytes:
-        res = True if target is None else False
-        if target is None:
-            target = BytesIO()
-        if isinstance(target, str):
-            target = open(target, 'wb')
-        is_byte_io(target) and is_writ_io(target) and is_seek_io(target)
-        data = render_nbt(self.__tag, self.__root_name, byteorder == 'big')
-        data = compress_file(data, zip_mode)
-        if not res:
-            target.write(data)
+        byteorder: Literal['little', 'big'] = 'little',
+        canonical: bool = False) -> bytes:
+        data = encode_tree(self.__tag, self.__root_name, zip_mode, byteorder == 'big', False, canonical)
+        if target is not None:
+            write_file(target, data)
         return data
 
     # === snbt ===
     @classmethod
+    @instrument.traced("from_snbt")
     def from_snbt(cls, data: Union[str, IOBase]):
         if isinstance(data, str):
             if os.path.exists(data) and not os.path.isfile(data): raise NbtFileError("路径('%s')非文件" % data)
-            if os.path.exists(data) and os.path.isfile(data): data = open(data, 'r')
+            if os.path.exists(data) and os.path.isfile(data): data = StringIO(read_file(data, 'r'))
             elif not os.path.exists(data): data = StringIO(data)
         is_text_io(data) and is_read_io(data) and is_seek_io(data)
-        return cls(*parse_snbt(data))
-
-    def to_snbt(self, target: Union[str, IOBase] = None, format=False, size=4) -> str:
-        res = True if target is None else False
-        if target is None:
-            target = StringIO()
-        if isinstance(target, str):
-            target = open(target, 'w')
+        res = parse_snbt(data)
+        if call := instrument.current():
+            call.mark("decode")
+            call.count("chars_in", data.tell())
+            call.tree(res[0])
+        return cls(*res)
+
+    @instrument.traced("to_snbt")
+    def to_snbt(self, target: Union[str, IOBase] = None, format=False, size=4, canonical=False) -> str:
+        if call := instrument.current(): call.tree(self.__tag)
+        if target is None or isinstance(target, str):
+            data = render_snbt(self.__tag, self.__root_name, StringIO(), format, size, canonical).getvalue()
+            if call:
+                call.mark("encode")
+                call.count("chars_out", len(data))
+            if target is None:
+                return data
+            with open(target, 'w') as f:
+                f.write(data)
+            if call: call.mark("write")
+            return
         is_text_io(target) and is_writ_io(target) and is_seek_io(target)
-        data = render_snbt(self.__tag, self.__root_name, target, format, size)
-        if res:
-            return data.read()
+        render_snbt(self.__tag, self.__root_name, target, format, size, canonical)
+        if call: call.mark("encode")
 
     # === dat ===
     @classmethod
+    @instrument.traced("from_dat")
     def from_dat(cls,
         data     : Union[str, bytes, IOBase],
         zip_mode : Literal['none', 'gzip', 'zlib'] = 'none',
-        byteorder: Literal['little', 'big'] = 'little'):
+        byteorder: Literal['little', 'big'] = 'little',
+        lazy     : bool = False,
+        cache    : 'NbtCache' = None):
+        if cache is not None and isinstance(data, str):
+            return cls(*cache.load(data, zip_mode, byteorder == 'big', True, lazy))
+        if lazy:
+            return cls(*load_mapped(data, zip_mode, byteorder == 'big', True))
         if isinstance(data, str):
-            path_is_file(data)
-            data = open(data, 'rb')
+            data = read_file(data)
         if isinstance(data, bytes):
             data = BytesIO(data)
         is_byte_io(data) and is_read_io(data) and is_seek_io(data)
-        data = decompress_buffer(data, zip_mode)
-        byte = buffer_read(data, 4, "工具版本号")
-        try:
-            tool_version = ce.unpack_data(byte, TAG.INT, byteorder == 'big')
-        except Exception as e:
-            throw_nbt_error(e, data, 4)
-        byte = buffer_read(data, 4, "除头文件后的长度")
-        try:
-            length = ce.unpack_data(byte, TAG.INT, byteorder == 'big')
-        except Exception as e:
-            throw_nbt_error(e, data, 4)
-        return cls(*parse_nbt(data, byteorder == 'big'))
+        return cls(*decode_buffer(data, zip_mode, byteorder == 'big', True))
 
+    @instrument.traced("to_dat")
     def to_dat(self,
         target   : Union[str, IOBase] = None,
         zip_mode : Literal['none', 'gzip', 'zlib'] = 'none',
-        byteorder: Literal['little', 'big'] = 'little') -> bytes:
-        res = bool(target)
-        if target is None:
-            target = BytesIO()
+        byteorder: Literal['little', 'big'] = 'little',
+        canonical: bool = False) -> bytes:
+        data = encode_tree(self.__tag, self.__root_name, zip_mode, byteorder == 'big', True, canonical)
+        if target is not None:
+            write_file(target, data)
+        return data
+
+    # === python / json ===
+    @classmethod
+    @instrument.traced("from_python")
+    def from_python(cls, data: dict, typed=False, sep="@"):
+        if not (isinstance(data, dict) and len(data) == 1):
+            raise TypeError("期望类型为只有一个根键的 %s，但传入了 %s" % (dict, repr(data)[:64]))
+        root_name, value = next(iter(data.items()))
+        type = None
+        if typed: root_name, type = pyobj.split_key(root_name, sep)
+        res = cls(pyobj.from_python(value, typed, sep, type), root_name)
+        if call := instrument.current():
+            call.mark("build")
+            call.tree(res.__tag)
+        return res
+
+    @instrument.traced("to_python")
+    def to_python(self, typed=False, buffers=False, sep="@") -> dict:
+        if call := instrument.current(): call.tree(self.__tag)
+        res = pyobj.to_python(self, typed, buffers, sep)
+        if call: call.mark("encode")
+        return res
+
+    @classmethod
+    @instrument.traced("from_json")
+    def from_json(cls, data: Union[str, bytes, IOBase], typed=False, sep="@"):
+        call = instrument.current()
+        if isinstance(data, IOBase):
+            data = data.read()
+            if call: call.mark("read")
+        if call: call.count("bytes_in", len(data))
+        data = pyobj.parse_json(data)
+        if call: call.mark("parse")
+        return cls.from_python(data, typed, sep)
+
+    @instrument.traced("to_json")
+    def to_json(self, target: Union[str, IOBase] = None, typed=False, indent=None, sep="@") -> bytes:
+        call = instrument.current()
+        if call: call.tree(self.__tag)
+        data = pyobj.dumps(self, typed, indent, sep)
+        if call:
+            call.mark("encode")
+            call.count("bytes_out", len(data))
         if isinstance(target, str):
-            target = open(target, 'wb')
-        is_byte_io(target) and is_writ_io(target) and is_seek_io(target)
-        data = render_nbt(self.__tag, self.__root_name, byteorder == 'big')
-        data = b'\x0A\x00\x00\00' + ce.pack_data(len(data), TAG.INT, byteorder == 'big') + data
-        data = compress_file(data, zip_mode)
-        if res:
-            return data
-        else:
+            with open(target, 'wb') as f: f.write(data)
+        elif target is not None:
+            is_byte_io(target) and is_writ_io(target)
             target.write(data)
-            return data
+        if call and target is not None: call.mark("write")
+        return data
 
     def get_tag(self) -> tags.TAG_Base:
         return self.__tag
@@ -223,6 +334,15 @@ class RootNBT:
     def get_root_name(self) -> str:
         return self.__root_name
 
+    def freeze(self):
+        return self.__tag.freeze()
+
+    def __reduce__(self):
+        return RootNBT, (self.__tag, self.__root_name)
+
+    def digest(self) -> bytes:
+        return blake2b(ce.pack_data(self.__root_name, TAG.STRING) + self.__tag.digest(), digest_size=16).digest()
+
     def set_tag(self, tag: tags.TAG_Base):
         if not isinstance(tag, (tags.TAG_Compound, tags.TAG_List)):
             raise TypeError("非期望的类型 %s 应该为 %s" % (tag, (tags.TAG_Compound, tags.TAG_List)))
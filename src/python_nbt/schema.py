@@ -0,0 +1,434 @@
+"""
+    schema.py - 按已知结构生成专用的编码/解码函数
+
+    Item = schema.Compound("Item", {"Slot": schema.BYTE, "id": schema.STRING, "Count": schema.BYTE, "tag": schema.ANY})
+    Player = schema.Compound("Player", {"Pos": schema.List(schema.DOUBLE), "Inventory": schema.List(Item)})
+    player = Player.from_nbt("player.dat", "gzip", "big")
+    player.Inventory[0].id
+
+    结构内的键直接解码为 python 值(int/float/str/array/list/dict)或记录对象，
+    未声明的键、类型与声明不符的键按通用方式解码为 TAG_* 并保存在记录的 extra 中，重新编码时原样写回。
+"""
+
+
+import keyword, re, struct, threading
+from abc import ABC, abstractmethod
+from array import array
+from io import BytesIO
+from typing import Literal, Union
+
+from . import TAG, TAGLIST, instrument, codec as ce
+from .error import *
+from .tags import TAG_Compound, ARRAY_TYPECODE
+
+MISMATCH = object()
+compile_lock = threading.RLock()
+STRUCTS = {t: (ce.number_struct_formats[t][1], ce.number_struct_formats[t][0]) for t in ce.number_struct_formats}
+LENGTHS = (struct.Struct('<H'), struct.Struct('>H'))
+COUNTS = (struct.Struct('<i'), struct.Struct('>i'))
+ARRAY_CODES = {TAG.BYTE_ARRAY: 'b', TAG.INT_ARRAY: 'i', TAG.LONG_ARRAY: 'q'}
+
+
+def decode_any(data, pos, t, mode):
+    buffer = BytesIO(data)
+    buffer.seek(pos)
+    tag = TAGLIST[TAG(t)]._from_bytesIO(buffer, mode)
+    return tag, buffer.tell()
+
+
+class Spec(ABC):
+    tag = None
+
+    @abstractmethod
+    def decoder(self, ctx, var, lines, level): pass
+
+    @abstractmethod
+    def encoder(self, ctx, var, lines, level): pass
+
+
+class Number(Spec):
+    def __init__(self, tag):
+        self.tag = tag
+
+    def decoder(self, ctx, var, lines, level):
+        s = ctx.const(STRUCTS[self.tag][ctx.mode])
+        lines.append((level, "%s = %s.unpack_from(data, pos)[0]; pos += %d" % (var, s, ce.number_bytes_len[self.tag])))
+
+    def encoder(self, ctx, var, lines, level):
+        lines.append((level, "out += %s.pack(%s)" % (ctx.const(STRUCTS[self.tag][ctx.mode]), var)))
+
+    def __repr__(self):
+        return self.tag.name
+
+
+class String(Spec):
+    tag = TAG.STRING
+
+    def decoder(self, ctx, var, lines, level):
+        s = ctx.const(LENGTHS[ctx.mode])
+        lines.append((level, "n = %s.unpack_from(data, pos)[0]; pos += 2" % s))
+        lines.append((level, "%s = data[pos:pos + n].decode('utf-8', 'ignore'); pos += n" % var))
+
+    def encoder(self, ctx, var, lines, level):
+        lines.append((level, "b = %s.encode('utf-8'); out += %s.pack(len(b)); out += b" % (var, ctx.const(LENGTHS[ctx.mode]))))
+
+    def __repr__(self):
+        return self.tag.name
+
+
+class Array(Spec):
+    def __init__(self, tag):
+        self.tag = tag
+
+    def decoder(self, ctx, var, lines, level):
+        code = ARRAY_CODES[self.tag]
+        size = array(code).itemsize
+        lines.append((level, "n = %s.unpack_from(data, pos)[0] * %d; pos += 4" % (ctx.const(COUNTS[ctx.mode]), size)))
+        lines.append((level, "%s = array(%r); %s.frombytes(data[pos:pos + n]); pos += n" % (var, code, var)))
+        if size > 1 and ctx.mode != ce.NATIVE_BIG: lines.append((level, "%s.byteswap()" % var))
+
+    def encoder(self, ctx, var, lines, level):
+        code = ARRAY_CODES[self.tag]
+        lines.append((level, "if not isinstance(%s, array) or %s.typecode != %r: %s = array(%r, %s)" % (var, var, code, var, code, var)))
+        lines.append((level, "out += %s.pack(len(%s)); out += array_to_bytes(%s, %s)" % (ctx.const(COUNTS[ctx.mode]), var, var, ctx.mode)))
+
+    def __repr__(self):
+        return self.tag.name
+
+
+class Any(Spec):
+
+    def decoder(self, ctx, var, lines, level):
+        lines.append((level, "%s, pos = decode_any(data, pos, t, %s)" % (var, ctx.mode)))
+
+    def encoder(self, ctx, var, lines, level):
+        lines.append((level, "out += %s.to_bytes(%s)" % (var, ctx.mode)))
+
+    def __repr__(self):
+        return "ANY"
+
+
+class List(Spec):
+    tag = TAG.LIST
+
+    def __init__(self, item: Spec):
+        if not isinstance(item, Spec): raise TypeError("期望类型为 %s，但传入了 %s" % (Spec, repr(item)))
+        self.item = item
+
+    def decoder(self, ctx, var, lines, level):
+        item, counts = self.item, ctx.const(COUNTS[ctx.mode])
+        src = [(0, "def NAME(data, pos):"),
+               (1, "start = pos; t = data[pos]; count = %s.unpack_from(data, pos + 1)[0]; pos += 5" % counts)]
+        if item.tag is not None:
+            src.append((1, "if t != %d and count > 0: return MISMATCH, start" % item.tag.value))
+        if item.tag in ARRAY_TYPECODE:
+            code = ARRAY_TYPECODE[item.tag]
+            size = array(code).itemsize
+            src.append((1, "res = array(%r); res.frombytes(data[pos:pos + count * %d])" % (code, size)))
+            if size > 1 and ctx.mode != ce.NATIVE_BIG: src.append((1, "res.byteswap()"))
+            src.append((1, "return res, pos + count * %d" % size))
+        else:
+            src.append((1, "res = [None] * count"))
+            src.append((1, "for i in range(count):"))
+            item_decoder(ctx, item, "v", src, 2)
+            src.append((2, "res[i] = v"))
+            src.append((1, "return res, pos"))
+        lines.append((level, "%s, pos = %s(data, pos)" % (var, ctx.function(src, "decode"))))
+
+    def encoder(self, ctx, var, lines, level):
+        item, counts = self.item, ctx.const(COUNTS[ctx.mode])
+        src = [(0, "def NAME(value, out):")]
+        if item.tag is None:
+            src.append((1, "out.append(value[0].type.value if value else 0); out += %s.pack(len(value))" % counts))
+        else:
+            src.append((1, "out.append(%d if value else 0); out += %s.pack(len(value))" % (item.tag.value, counts)))
+        if item.tag in ARRAY_TYPECODE:
+            code = ARRAY_TYPECODE[item.tag]
+            src.append((1, "if not isinstance(value, array) or value.typecode != %r: value = array(%r, value)" % (code, code)))
+            src.append((1, "out += array_to_bytes(value, %s)" % ctx.mode))
+        else:
+            src.append((1, "for v in value:"))
+            item.encoder(ctx, "v", src, 2)
+        lines.append((level, "%s(%s, out)" % (ctx.function(src, "encode"), var)))
+
+    def __repr__(self):
+        return "List(%r)" % self.item
+
+
+class Map(Spec):
+    tag = TAG.COMPOUND
+
+    def __init__(self, item: Spec):
+        if not isinstance(item, Spec): raise TypeError("期望类型为 %s，但传入了 %s" % (Spec, repr(item)))
+        self.item = item
+
+    def decoder(self, ctx, var, lines, level):
+        item, lengths = self.item, ctx.const(LENGTHS[ctx.mode])
+        src = [(0, "def NAME(data, pos):"),
+               (1, "start = pos; res = {}"),
+               (1, "while True:"),
+               (2, "t = data[pos]"),
+               (2, "if t == 0: return res, pos + 1"),
+               (2, "n = %s.unpack_from(data, pos + 1)[0]; pos += 3" % lengths),
+               (2, "key = data[pos:pos + n].decode('utf-8', 'ignore'); pos += n")]
+        if item.tag is not None:
+            src.append((2, "if t != %d: return MISMATCH, start" % item.tag.value))
+        item_decoder(ctx, item, "v", src, 2)
+        src.append((2, "res[key] = v"))
+        lines.append((level, "%s, pos = %s(data, pos)" % (var, ctx.function(src, "decode"))))
+
+    def encoder(self, ctx, var, lines, level):
+        item, lengths = self.item, ctx.const(LENGTHS[ctx.mode])
+        src = [(0, "def NAME(value, out):"),
+               (1, "for key, v in value.items():"),
+               (2, "out.append(%s)" % ("v.type.value" if item.tag is None else item.tag.value)),
+               (2, "b = key.encode('utf-8'); out += %s.pack(len(b)); out += b" % lengths)]
+        item.encoder(ctx, "v", src, 2)
+        src.append((1, "out.append(0)"))
+        lines.append((level, "%s(%s, out)" % (ctx.function(src, "encode"), var)))
+
+    def __repr__(self):
+        return "Map(%r)" % self.item
+
+
+class Record:
+    __slots__ = ()
+    _fields = ()
+    _keys = ()
+    schema = None
+
+    def as_dict(self):
+        res = {k: getattr(self, a) for k, a in zip(self._keys, self._fields) if getattr(self, a) is not None}
+        if self.extra: res.update(self.extra)
+        return res
+
+    def to_tag(self) -> TAG_Compound:
+        return self.schema.to_tag(self)
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__: return NotImplemented
+        return all(getattr(self, a) == getattr(other, a) for a in self._fields) and (self.extra or None) == (other.extra or None)
+
+    __hash__ = None
+
+    def __repr__(self):
+        res = ", ".join("%s=%r" % (a, getattr(self, a)) for a in self._fields if getattr(self, a) is not None)
+        if self.extra: res += (", " if res else "") + "extra=%r" % self.extra
+        return "%s(%s)" % (self.__class__.__name__, res)
+
+
+class Compound(Spec):
+    tag = TAG.COMPOUND
+
+    def __init__(self, name: str, fields: dict):
+        if not isinstance(name, str): raise TypeError("期望类型为 %s，但传入了 %s" % (str, repr(name)))
+        self.name = name
+        self.fields = []
+        used = {"extra"}
+        for key, spec in fields.items():
+            if not isinstance(key, str): raise TypeError("键的期望类型为 %s，但传入了 %s" % (str, repr(key)))
+            if not isinstance(spec, Spec): raise TypeError("键 '%s' 的期望类型为 %s，但传入了 %s" % (key, Spec, repr(spec)))
+            attr = re.sub(r"\W", "_", key)
+            if not attr or attr[0].isdigit() or keyword.iskeyword(attr): attr = "_" + attr
+            while attr in used or attr in Record.__dict__: attr += "_"
+            used.add(attr)
+            self.fields.append((key, attr, spec))
+        self.record = self.make_record()
+        self._codecs = {}
+
+    def make_record(self):
+        attrs = [a for _, a, _ in self.fields]
+        args = "".join("%s=None, " % a for a in attrs)
+        body = "".join("    self.%s = %s\n" % (a, a) for a in attrs)
+        namespace = {}
+        exec("def __init__(self, %sextra=None):\n%s    self.extra = extra\n" % (args, body), namespace)
+        name = self.name if self.name.isidentifier() else "Record"
+        return type(name, (Record,), {"__slots__": tuple(attrs) + ("extra",), "__init__": namespace["__init__"],
+                                      "_fields": tuple(attrs), "_keys": tuple(k for k, _, _ in self.fields), "schema": self,
+                                      "__module__": __name__})
+
+    def new(self, **values):
+        return self.record(**values)
+
+    def codec(self, mode):
+        res = self._codecs.get(mode)
+        if res is not None: return res
+        with compile_lock:
+            if mode in self._codecs:
+                if self._codecs[mode] is None: raise ValueError("不支持递归的结构 %s" % self.name)
+                return self._codecs[mode]
+            self._codecs[mode] = None
+            try:
+                ctx = Context(mode)
+                res = (ctx.namespace[self.compile_decoder(ctx)], ctx.namespace[self.compile_encoder(ctx)])
+            except BaseException:
+                del self._codecs[mode]
+                raise
+            self._codecs[mode] = res
+            return res
+
+    def decoder(self, ctx, var, lines, level):
+        lines.append((level, "%s, pos = %s(data, pos)" % (var, ctx.const(self.codec(ctx.mode)[0], "decode_" + self.record.__name__))))
+
+    def encoder(self, ctx, var, lines, level):
+        lines.append((level, "%s(%s, out)" % (ctx.const(self.codec(ctx.mode)[1], "encode_" + self.record.__name__), var)))
+
+    def compile_decoder(self, ctx):
+        lengths = ctx.const(LENGTHS[ctx.mode])
+        record = ctx.const(self.record, self.record.__name__)
+        names = ["v%d" % i for i in range(len(self.fields))]
+        src = [(0, "def NAME(data, pos):"),
+               (1, "%s = None" % " = ".join(names + ["extra"])),
+               (1, "while True:"),
+               (2, "t = data[pos]"),
+               (2, "if t == 0: return %s(%sextra), pos + 1" % (record, "".join(n + ", " for n in names))),
+               (2, "n = %s.unpack_from(data, pos + 1)[0]; pos += 3" % lengths),
+               (2, "key = data[pos:pos + n]; pos += n")]
+        for i, (key, attr, spec) in enumerate(self.fields):
+            cond = "key == %r" % key.encode("utf-8")
+            if spec.tag is not None: cond += " and t == %d" % spec.tag.value
+            src.append((2, "%s %s:" % ("if" if i == 0 else "elif", cond)))
+            if not isinstance(spec, (List, Map)):
+                spec.decoder(ctx, names[i], src, 3)
+            else:
+                src.append((3, "start = pos"))
+                spec.decoder(ctx, "v", src, 3)
+                src.append((3, "if v is MISMATCH:"))
+                src.append((4, "if extra is None: extra = {}"))
+                src.append((4, "extra[key.decode('utf-8', 'ignore')], pos = decode_any(data, start, t, %s)" % ctx.mode))
+                src.append((3, "else: %s = v" % names[i]))
+        src.append((2, "else:" if self.fields else "if True:"))
+        src.append((3, "if extra is None: extra = {}"))
+        src.append((3, "extra[key.decode('utf-8', 'ignore')], pos = decode_any(data, pos, t, %s)" % ctx.mode))
+        return ctx.function(src, "decode_" + self.record.__name__)
+
+    def compile_encoder(self, ctx):
+        lengths = ctx.const(LENGTHS[ctx.mode])
+        src = [(0, "def NAME(value, out):")]
+        for key, attr, spec in self.fields:
+            name = key.encode("utf-8")
+            src.append((1, "v = value.%s" % attr))
+            src.append((1, "if v is not None:"))
+            if spec.tag is None:
+                src.append((2, "out.append(v.type.value); out += %s" % ctx.const(LENGTHS[ctx.mode].pack(len(name)) + name)))
+            else:
+                src.append((2, "out += %s" % ctx.const(bytes((spec.tag.value,)) + LENGTHS[ctx.mode].pack(len(name)) + name)))
+            spec.encoder(ctx, "v", src, 2)
+        src.append((1, "if value.extra:"))
+        src.append((2, "for key, v in value.extra.items():"))
+        src.append((3, "out.append(v.type.value); b = key.encode('utf-8'); out += %s.pack(len(b)); out += b" % lengths))
+        src.append((3, "out += v.to_bytes(%s)" % ctx.mode))
+        src.append((1, "out.append(0)"))
+        return ctx.function(src, "encode_" + self.record.__name__)
+
+    # === 字节 ===
+    def decode(self, data: bytes, byteorder: Literal['little', 'big'] = 'little', pos=0):
+        decode = self.codec(byteorder == 'big')[0]
+        try:
+            return decode(bytes(data), pos)
+        except (IndexError, ValueError, struct.error) as e:
+            raise NbtParseError("ELO Error，数据不完整(%s): %s" % (self.name, e))
+
+    def encode(self, value: Record, byteorder: Literal['little', 'big'] = 'little') -> bytes:
+        out = bytearray()
+        try:
+            self.codec(byteorder == 'big')[1](value, out)
+        except struct.error as e:
+            raise ValueError("数字范围不正确(%s): %s" % (self.name, e))
+        return bytes(out)
+
+    # === nbt ===
+    @instrument.traced("schema.from_nbt")
+    def from_nbt(self,
+        data     : Union[str, bytes, 'IOBase'],
+        zip_mode : Literal['none', 'gzip', 'zlib'] = None,
+        byteorder: Literal['little', 'big'] = 'little') -> Record:
+        from .root import read_file, decompress_buffer
+        if isinstance(data, str):
+            data = read_file(data)
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            data = data.read()
+        data = decompress_buffer(BytesIO(data), zip_mode).getvalue()
+        call = instrument.current()
+        if call: call.mark("decompress")
+        if not data or data[0] != TAG.COMPOUND.value:
+            raise NbtDataError("数据的根标签必须是TAG_Compound，但实际是 %s" % (TAG(data[0]) if data and data[0] in TAG._value2member_map_ else data[:1]))
+        try:
+            pos = 3 + LENGTHS[byteorder == 'big'].unpack_from(data, 1)[0]
+        except struct.error:
+            raise NbtParseError("ELO Error，期望2字节，实际为%s字节（根标签键名长度）" % (len(data) - 1))
+        res = self.decode(data, byteorder, pos)[0]
+        if call:
+            call.mark("decode")
+            call.count("bytes_decoded", len(data))
+        return res
+
+    @instrument.traced("schema.to_nbt")
+    def to_nbt(self,
+        value    : Record,
+        target   : Union[str, 'IOBase'] = None,
+        zip_mode : Literal['none', 'gzip', 'zlib'] = 'none',
+        byteorder: Literal['little', 'big'] = 'little',
+        root_name: str = '') -> bytes:
+        from .root import compress_file, write_file
+        name = root_name.encode('utf-8')
+        data = b'\x0a' + LENGTHS[byteorder == 'big'].pack(len(name)) + name + self.encode(value, byteorder)
+        call = instrument.current()
+        if call:
+            call.mark("encode")
+            call.count("bytes_encoded", len(data))
+        data = compress_file(data, zip_mode)
+        if call: call.mark("compress")
+        if target is not None:
+            write_file(target, data)
+        return data
+
+    # === 标签 ===
+    def from_tag(self, tag: TAG_Compound) -> Record:
+        if not isinstance(tag, TAG_Compound): raise TypeError("期望类型为 %s，但传入了 %s" % (TAG_Compound, repr(tag)))
+        return self.decode(tag.to_bytes(ce.NATIVE_BIG), 'big' if ce.NATIVE_BIG else 'little')[0]
+
+    def to_tag(self, value: Record) -> TAG_Compound:
+        return TAG_Compound._from_bytes(self.encode(value, 'big' if ce.NATIVE_BIG else 'little'), ce.NATIVE_BIG)
+
+    def __repr__(self):
+        return "Compound(%r, {%s})" % (self.name, ", ".join("%r: %r" % (k, s) for k, _, s in self.fields))
+
+
+class Context:
+    def __init__(self, mode):
+        self.mode = mode
+        self.namespace = {"array": array, "array_to_bytes": ce.array_to_bytes, "decode_any": decode_any, "MISMATCH": MISMATCH}
+        self.consts = {}
+
+    def const(self, value, hint="c"):
+        name = self.consts.get(id(value))
+        if name is None:
+            name = self.consts[id(value)] = "%s_%d" % (hint, len(self.namespace))
+            self.namespace[name] = value
+        return name
+
+    def function(self, lines, hint):
+        name = "%s_%d" % (hint, len(self.namespace))
+        lines[0] = (0, lines[0][1].replace("NAME", name, 1))
+        exec("\n".join("    " * level + line for level, line in lines), self.namespace)
+        return name
+
+
+def item_decoder(ctx, item, var, lines, level):
+    item.decoder(ctx, var, lines, level)
+    if isinstance(item, (List, Map)):
+        lines.append((level, "if %s is MISMATCH: return MISMATCH, start" % var))
+
+
+BYTE       = Number(TAG.BYTE)
+SHORT      = Number(TAG.SHORT)
+INT        = Number(TAG.INT)
+LONG       = Number(TAG.LONG)
+FLOAT      = Number(TAG.FLOAT)
+DOUBLE     = Number(TAG.DOUBLE)
+STRING     = String()
+BYTE_ARRAY = Array(TAG.BYTE_ARRAY)
+INT_ARRAY  = Array(TAG.INT_ARRAY)
+LONG_ARRAY = Array(TAG.LONG_ARRAY)
+ANY        = Any()
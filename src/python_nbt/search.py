@@ -0,0 +1,335 @@
+"""
+    search.py - 多文件内容搜索
+
+    hits = search.search("playerdata", {"id": "minecraft:elytra"}).hits
+    每个文件先解压，再在字节层面查找条件对应的片段(字符串在 nbt 中以 长度 + 内容 存储，键名前还有类型字节)，
+    全部片段都出现的文件才用流式扫描逐个标签核对，不构建标签树；多个文件分给多个进程处理。
+"""
+
+
+import os, pickle
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from struct import Struct, error as StructError
+from typing import Callable, Iterable, Literal, Union
+
+from . import TAG, instrument, path as nbt_path, codec as ce
+from .abc import TAG_Base
+from .error import *
+from .mapped import LENGTHS, COUNTS, NUMBER_SIZE, ARRAY_SIZE
+from .patch import key_path
+from .root import read_file, decompress_buffer
+
+SUFFIXES = (".dat", ".nbt", ".dat_old")
+NUMBER_STRUCTS = {t.value: s for t, s in ce.number_struct_formats.items()}
+ARRAY_ITEMS = {TAG.BYTE_ARRAY.value: TAG.BYTE.value, TAG.INT_ARRAY.value: TAG.INT.value, TAG.LONG_ARRAY.value: TAG.LONG.value}
+ARRAY_CODES = {TAG.BYTE_ARRAY.value: "b", TAG.INT_ARRAY.value: "i", TAG.LONG_ARRAY.value: "q"}
+LIST_CODES = {TAG.BYTE.value: "b", TAG.SHORT.value: "h", TAG.INT.value: "i", TAG.LONG.value: "q", TAG.FLOAT.value: "f", TAG.DOUBLE.value: "d"}
+NUMBERS = tuple(NUMBER_SIZE)
+SEQUENCES = tuple(ARRAY_SIZE) + (TAG.LIST.value,)
+FLOAT = Struct('=f')
+
+Hit = namedtuple("Hit", ["file", "path", "value"])
+SearchResult = namedtuple("SearchResult", ["hits", "errors", "files", "candidates"])
+
+
+class Predicate:
+    """
+    key 为单个键名时匹配任意深度下该键名的标签；为路径(如 Inventory[].id)时从根标签开始逐级匹配，[] 匹配任意下标，* 匹配任意键名。
+    value 为 None 时只要求标签存在；为 str/int/float/列表 时比较值(数字不区分宽度)；为标签时同时比较类型；为函数时以解码出的值调用。
+    """
+    def __init__(self, key: str, value=None):
+        path = nbt_path.compile(key)
+        if path.root_pattern is not None or any(s.pattern is not None for s in path.steps):
+            raise NbtPathError("搜索路径 %s 不支持过滤条件" % key)
+        if any(s.kind == "index" and s.index < 0 for s in path.steps):
+            raise NbtPathError("搜索路径 %s 不支持负数下标" % key)
+        self.key = key
+        self.value = value
+        if len(path.steps) == 1 and path.steps[0].kind == "key":
+            self.name, self.steps = path.steps[0].name, None
+        else:
+            self.name, self.steps = None, path.steps
+        self.type, self.expect = expectation(value)
+        self.single = FLOAT.unpack(FLOAT.pack(self.expect))[0] if self.type is None and isinstance(self.expect, float) else self.expect
+
+    def needles(self, mode: bool) -> list:
+        res = []
+        names = [s.name for s in self.steps if s.kind == "key"] if self.steps else [self.name]
+        if names:
+            name = ce.pack_data(names[-1], TAG.STRING)
+            name = LENGTHS[mode].pack(len(name)) + name
+            last = self.steps[-1] if self.steps else None
+            if self.type is not None and (last is None or last.kind == "key"): name = bytes((self.type,)) + name
+            res.append(name)
+        if self.type == TAG.STRING.value:
+            value = ce.pack_data(self.expect, TAG.STRING)
+            res.append(LENGTHS[mode].pack(len(value)) + value)
+        elif self.type in NUMBER_STRUCTS:
+            res.append(NUMBER_STRUCTS[self.type][not mode].pack(self.expect))
+        elif self.type in ARRAY_CODES and self.expect:
+            res.append(COUNTS[mode].pack(len(self.expect)) + pack_array(self.expect, ARRAY_CODES[self.type], mode))
+        return res
+
+    def wants(self, name, segs) -> bool:
+        if self.steps is None: return name == self.name
+        return len(segs) == len(self.steps) and match_steps(self.steps, segs)
+
+    def wants_items(self, segs) -> bool:
+        if self.steps is None or len(segs) + 1 != len(self.steps) or self.steps[-1].kind not in ("index", "all"): return False
+        return match_steps(self.steps, segs)
+
+    def test(self, t, value) -> bool:
+        expect = self.expect
+        if expect is None: return True
+        if callable(expect): return value is not None and bool(expect(value))
+        if self.type is not None:
+            if t != self.type: return False
+        elif isinstance(expect, list):
+            if t not in SEQUENCES: return False
+        elif t not in NUMBERS:
+            return False
+        elif t == TAG.FLOAT.value:
+            return value == self.single
+        return value == expect
+
+    def __reduce__(self):
+        return Predicate, (self.key, self.value)
+
+    def __repr__(self):
+        return "<Predicate %s=%r>" % (self.key, self.value)
+
+
+def match_steps(steps, segs) -> bool:
+    for step, seg in zip(steps, segs):
+        kind = step.kind
+        if kind == "key":
+            if seg != step.name: return False
+        elif kind == "any":
+            if not isinstance(seg, str): return False
+        elif not isinstance(seg, int) or (kind == "index" and seg != step.index):
+            return False
+    return True
+
+def expectation(value):
+    if value is None or callable(value) and not isinstance(value, TAG_Base): return None, value
+    if isinstance(value, TAG_Base):
+        t = value.type
+        if t in (TAG.COMPOUND, TAG.END) or (t == TAG.LIST and value.get_type().value not in LIST_CODES and len(value)):
+            raise TypeError("搜索条件的值不能是 %s" % value)
+        if t == TAG.LIST: return t.value, value.get_value().tolist() if len(value) else []
+        if t.value in ARRAY_CODES: return t.value, value.get_value().tolist()
+        if t == TAG.FLOAT: return t.value, FLOAT.unpack(FLOAT.pack(value.get_value()))[0]
+        return t.value, value.get_value()
+    if isinstance(value, bool): return None, int(value)
+    if isinstance(value, str): return TAG.STRING.value, value
+    if isinstance(value, (int, float)): return None, value
+    if isinstance(value, (list, tuple, array)): return None, list(value)
+    raise TypeError("搜索条件的值期望类型为 %s，但传入了 %s" % ((str, int, float, list, TAG_Base, Callable), repr(value)))
+
+def pack_array(values, code, mode):
+    res = array(code, values)
+    if mode != ce.NATIVE_BIG: res.byteswap()
+    return res.tobytes()
+
+def read_array(buf, pos, n, code, mode):
+    res = array(code)
+    res.frombytes(buf[pos:pos + n * res.itemsize])
+    if mode != ce.NATIVE_BIG: res.byteswap()
+    return res.tolist()
+
+def format_path(segs) -> str:
+    res = ""
+    for seg in segs:
+        res = "%s[%d]" % (res, seg) if isinstance(seg, int) else key_path(res, seg)
+    return res
+
+def compile_predicates(predicates) -> tuple:
+    if isinstance(predicates, Predicate): return (predicates,)
+    if isinstance(predicates, str): return (Predicate(predicates),)
+    if isinstance(predicates, dict): predicates = predicates.items()
+    res = []
+    for p in predicates:
+        if isinstance(p, Predicate): res.append(p)
+        elif isinstance(p, str): res.append(Predicate(p))
+        else: res.append(Predicate(*p))
+    if not res: raise ValueError("至少需要一个搜索条件")
+    return tuple(res)
+
+def picklable(predicates) -> bool:
+    try:
+        pickle.dumps(predicates)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return False
+    return True
+
+
+# === 字节预筛选 ===
+def prefilter(buf, predicates, mode) -> list:
+    return [p for p in predicates if all(buf.find(n) != -1 for n in p.needles(mode))]
+
+
+# === 流式核对 ===
+def verify(buf, pos, mode, predicates) -> list:
+    length, count = LENGTHS[mode].unpack_from, COUNTS[mode].unpack_from
+    structs = {t: s[not mode] for t, s in NUMBER_STRUCTS.items()}
+    res, stack = [], []
+    t, name, segs = buf[pos], None, ()
+    pos += 3 + length(buf, pos + 1)[0]
+    while True:
+        matched = [p for p in predicates if p.wants(name, segs)]
+        value = None
+        if t in NUMBER_SIZE:
+            if matched: value = structs[t].unpack_from(buf, pos)[0]
+            pos += NUMBER_SIZE[t]
+        elif t == 8:
+            n = length(buf, pos)[0]
+            if matched: value = ce.unpack_data(bytes(buf[pos + 2:pos + 2 + n]), TAG.STRING)
+            pos += 2 + n
+        elif t in ARRAY_SIZE:
+            n = count(buf, pos)[0]
+            items = [p for p in predicates if p.wants_items(segs)]
+            if matched or items: value = read_array(buf, pos + 4, n, ARRAY_CODES[t], mode)
+            if items: res.extend(verify_items(items, segs, ARRAY_ITEMS[t], value))
+            pos += 4 + n * ARRAY_SIZE[t]
+        elif t == 9:
+            item, n = buf[pos], count(buf, pos + 1)[0]
+            pos += 5
+            if item in NUMBER_SIZE:
+                items = [p for p in predicates if p.wants_items(segs)]
+                if matched or items: value = read_array(buf, pos, n, LIST_CODES[item], mode)
+                if items: res.extend(verify_items(items, segs, item, value))
+                pos += n * NUMBER_SIZE[item]
+            elif n > 0:
+                stack.append([segs, item, n, 0])
+            elif matched:
+                value = []
+        elif t == 10:
+            stack.append([segs, None])
+        else:
+            raise NbtParseError("未知的标签类型 %s，位于 %s字节" % (t, pos))
+        for p in matched:
+            if p.test(t, value):
+                res.append((format_path(segs), value))
+                break
+        while stack:
+            top = stack[-1]
+            if top[1] is None:
+                t = buf[pos]
+                if t == 0:
+                    pos += 1
+                    stack.pop()
+                    continue
+                n = length(buf, pos + 1)[0]
+                name = ce.unpack_data(bytes(buf[pos + 3:pos + 3 + n]), TAG.STRING)
+                segs = top[0] + (name,)
+                pos += 3 + n
+                break
+            if top[3] == top[2]:
+                stack.pop()
+                continue
+            name, segs, t = None, top[0] + (top[3],), top[1]
+            top[3] += 1
+            break
+        else:
+            if pos > len(buf): raise NbtParseError("ELO Error，期望%s字节，实际为%s字节" % (pos, len(buf)))
+            return res
+
+
+def verify_items(predicates, segs, t, values):
+    res = []
+    for i, value in enumerate(values):
+        if any(p.wants(None, segs + (i,)) and p.test(t, value) for p in predicates): res.append((format_path(segs + (i,)), value))
+    return res
+
+
+@instrument.traced("search.file")
+def search_file(
+    path      : str,
+    predicates,
+    zip_mode  : Literal['none', 'gzip', 'zlib'] = None,
+    byteorder : Literal['little', 'big'] = 'little',
+    header    : bool = False,
+    data      : bytes = None) -> list:
+    return scan_file(path, compile_predicates(predicates), zip_mode, byteorder == 'big', header, data)[0]
+
+def scan_file(path, predicates, zip_mode, mode, header, data=None):
+    call = instrument.current()
+    if data is None: data = read_file(path)
+    buf = decompress_buffer(BytesIO(data), zip_mode).getvalue()
+    if call: call.mark("decompress")
+    predicates = prefilter(buf, predicates, mode)
+    if call: call.mark("prefilter")
+    if not predicates: return [], False
+    pos = 8 if header else 0
+    try:
+        if buf[pos] not in (TAG.COMPOUND.value, TAG.LIST.value):
+            raise NbtDataError("数据的根标签必须是TAG_Compound或TAG_List，但实际是 %s" % (TAG(buf[pos]) if buf[pos] in TAG._value2member_map_ else buf[pos]))
+        res = verify(buf, pos, mode, predicates)
+    except (IndexError, ValueError, StructError) as e:
+        if isinstance(e, NbtDataError): raise
+        raise NbtParseError("ELO Error，数据不完整: %s" % e)
+    if call:
+        call.mark("verify")
+        call.count("hits", len(res))
+    return [Hit(path, p, v) for p, v in res], True
+
+def search_job(job):
+    path, predicates, zip_mode, mode, header = job
+    try:
+        hits, candidate = scan_file(path, predicates, zip_mode, mode, header)
+    except Exception as e:
+        return path, [], False, "%s: %s" % (e.__class__.__name__, e)
+    return path, hits, candidate, None
+
+def collect_files(source) -> list:
+    if isinstance(source, (str, os.PathLike)):
+        source = os.fspath(source)
+        if not os.path.isdir(source): return [source]
+        res = []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            res.extend(os.path.join(root, name) for name in sorted(files) if os.path.splitext(name)[1].lower() in SUFFIXES)
+        return res
+    return [os.fspath(p) for p in source]
+
+
+@instrument.traced("search")
+def search(
+    source    : Union[str, Iterable[str]],
+    predicates,
+    zip_mode  : Literal['none', 'gzip', 'zlib'] = None,
+    byteorder : Literal['little', 'big'] = 'little',
+    header    : bool = False,
+    workers   : int = None) -> SearchResult:
+    """
+    source 为目录(递归查找 .dat/.nbt/.dat_old 文件)、单个文件或文件路径的列表。
+    predicates 为 {键或路径: 值} 字典、(键, 值) 列表或 Predicate，任一条件命中即记为一个结果。
+    返回 SearchResult(hits, errors, files, candidates)：errors 为 [(文件, 错误信息)]，candidates 为通过预筛选的文件数。
+    条件中含有不能 pickle 的值(如 lambda)时无法交给子进程，此时忽略 workers，在当前进程中搜索。
+    """
+    predicates = compile_predicates(predicates)
+    files = collect_files(source)
+    jobs = [(path, predicates, zip_mode, byteorder == 'big', header) for path in files]
+    if workers == 1 or len(jobs) <= 1 or not picklable(predicates):
+        results = map(search_job, jobs)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(workers)
+        results = executor.map(search_job, jobs, chunksize=max(1, min(64, len(jobs) // ((workers or os.cpu_count() or 1) * 8))))
+    hits, errors, candidates = [], [], 0
+    try:
+        for path, res, candidate, error in results:
+            hits.extend(res)
+            candidates += candidate
+            if error is not None: errors.append((path, error))
+    finally:
+        if executor is not None: executor.shutdown(cancel_futures=True)
+    call = instrument.current()
+    if call:
+        call.count("files", len(files))
+        call.count("candidates", candidates)
+        call.count("hits", len(hits))
+    return SearchResult(hits, errors, len(files), candidates)
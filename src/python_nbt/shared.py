@@ -0,0 +1,92 @@
+"""
+    shared.py - 通过共享内存在进程间传递标签树
+
+    tree = shared.share(root)       # 编码为未压缩的 nbt(本机字节序)写入共享内存
+    pool.map(work, [tree] * 8)      # 传给子进程的只有共享内存的名称与长度
+    def work(tree):
+        root = tree.load()          # 直接在共享内存上延迟解码，不复制整块数据
+    tree.unlink()                   # 所有进程用完之后释放
+"""
+
+
+from multiprocessing import resource_tracker, shared_memory
+from typing import Literal, Union
+
+from . import mapped, codec as ce
+from .error import *
+from .root import RootNBT, render_nbt
+from .tags import TAG_Compound, TAG_List
+
+
+def open_memory(name):
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        # 3.13 之前没有 track 参数，附加时会登记到资源跟踪器，进程退出时会把别人的共享内存删掉
+        mem = shared_memory.SharedMemory(name)
+        resource_tracker.unregister(mem._name, "shared_memory")
+        return mem
+
+
+class SharedTree:
+    def __init__(self, name: str, size: int, mode: bool = ce.NATIVE_BIG):
+        self.name = name
+        self.size = size
+        self.mode = mode
+        self._memory = None
+
+    def _open(self):
+        if self._memory is None: self._memory = open_memory(self.name)
+        return self._memory
+
+    def load(self) -> RootNBT:
+        return RootNBT(*mapped.load(self._open().buf[:self.size], 'none', self.mode))
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._open().buf[:self.size])
+
+    def close(self):
+        if self._memory is None: return
+        try:
+            self._memory.close()
+        except BufferError:
+            raise NbtDataError("共享内存(%s)仍被延迟解码的标签引用，请先调用 mapped.materialize 或释放这些标签" % self.name)
+        self._memory = None
+
+    def unlink(self):
+        memory = self._open()
+        # 3.13 之前同一跟踪器中的登记可能已被 open_memory 取消，补登记后再删除，跟踪器才不会报错
+        if getattr(memory, "_track", True): resource_tracker.register(memory._name, "shared_memory")
+        memory.unlink()
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __reduce__(self):
+        return SharedTree, (self.name, self.size, self.mode)
+
+    def __repr__(self):
+        return "<SharedTree name=%s size=%d byteorder=%s>" % (self.name, self.size, "big" if self.mode else "little")
+
+
+def share(
+    data     : Union[RootNBT, TAG_Compound, TAG_List],
+    root_name: str = "",
+    byteorder: Literal['little', 'big'] = None) -> SharedTree:
+    if isinstance(data, RootNBT):
+        tag, root_name = data.get_tag(), data.get_root_name()
+    elif isinstance(data, (TAG_Compound, TAG_List)):
+        tag = data
+    else:
+        raise TypeError("期望类型为 %s，但传入了 %s" % ((RootNBT, TAG_Compound, TAG_List), repr(data)))
+    mode = ce.NATIVE_BIG if byteorder is None else byteorder == 'big'
+    payload = render_nbt(tag, root_name, mode)
+    memory = shared_memory.SharedMemory(create=True, size=len(payload))
+    memory.buf[:len(payload)] = payload
+    res = SharedTree(memory.name, len(payload), mode)
+    res._memory = memory
+    return res
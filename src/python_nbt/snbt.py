@@ -13,9 +13,9 @@ from .error import *
 
 TOKEN_SPECIFICATION = [
     ('Int',     r'-?[0-9]+[BbSsLl]?(?![0-9a-zA-Z+\-\._])'),
-    ('Float',   r'-?(?:\.?[0-9]+|[0-9]+\.(?:[0-9]+)?)[FfdD]?'),
-    ('SString', r'"(?:\\"|[^"])*"'),
-    ('DString', r"'(?:\\'|[^'])*'"),
+    ('Float',   r'-?(?:[0-9]+\.[0-9]*|\.?[0-9]+)(?:[eE][+\-]?[0-9]+)?[FfdD]?(?![0-9a-zA-Z+\-\._])'),
+    ('SString', r'"(?:\\.|[^"\\])*"'),
+    ('DString', r"'(?:\\.|[^'\\])*'"),
     ('Symbol',  r':|,|;|\{|\}|\[|\]'),
     ('Key',     r'[0-9a-zA-Z+\-\._]+'),
     ('WS',      r'[ \t\n]+'),
@@ -30,6 +30,12 @@ class SnbtIO:
         self.tokens = Tokenizer(code)
         self.code = code
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None: self.close()
+
     def parse_key(self, token):
         type = token[0]
         if type in {"Int","Float","Key"}:
@@ -56,38 +62,18 @@ class SnbtIO:
             return TAGLIST[TAG.COMPOUND]._from_snbtIO(self)
         elif token[1] == "[":
             return TAGLIST[TAG.LIST]._from_snbtIO(self)
+        elif token[0] == "Key":
+            if token[1] == "true": return TAGLIST[TAG.BYTE](1)
+            if token[1] == "false": return TAGLIST[TAG.BYTE](0)
+            return TAGLIST[TAG.STRING](token[1])
+        else:
+            self.throw_error(token, "值")
 
-    @lru_cache(maxsize=None)
     def parse_number(self, Type, Value):
-        if Value[-1] == "b" or Value[-1] == "B":
-            return TAGLIST[TAG.BYTE](int(Value[0:-1]))
-        elif Value[-1] == "s" or Value[-1] == "S":
-            return TAGLIST[TAG.SHORT](int(Value[0:-1]))
-        elif Value[-1] == "l" or Value[-1] == "L":
-            return TAGLIST[TAG.LONG](int(Value[0:-1]))
-        elif Value[-1] == "f" or Value[-1] == "F":
-            return TAGLIST[TAG.FLOAT](float(Value[0:-1]))
-        elif Value[-1] == "d" or Value[-1] == "D":
-            return TAGLIST[TAG.DOUBLE](float(Value[0:-1]))
-        elif Type == "Int":
-            return TAGLIST[TAG.INT](int(Value))
-        elif Type == "Float":
-            return TAGLIST[TAG.DOUBLE](float(Value))
-        else:
-            return None
+        return parse_number(Type, Value)
 
-    @lru_cache(maxsize=None)
     def parse_py_number(self, Type, Value):
-        if Value[-1] in "bBsSlL":
-            return int(Value[0:-1])
-        elif Value[-1] == "fFdD":
-            return float(Value[0:-1])
-        elif Type == "Int":
-            return int(Value)
-        elif Type == "Float":
-            return float(Value)
-        else:
-            return None
+        return parse_py_number(Type, Value)
 
     def close(self):
         try:
@@ -123,9 +109,41 @@ class SnbtIO:
 
     def throw_error(self, token, value=""):
         raise SnbtParseError("非期望的字符 '%s' 位于%s行 第%s个字符到第%s个字符 应为 %s" % (token[1], *get_line(self.code, token[2]), value))
-        
 
 
+
+@lru_cache(maxsize=65536)
+def parse_number(Type, Value):
+    if Value[-1] == "b" or Value[-1] == "B":
+        return TAGLIST[TAG.BYTE](int(Value[0:-1]))
+    elif Value[-1] == "s" or Value[-1] == "S":
+        return TAGLIST[TAG.SHORT](int(Value[0:-1]))
+    elif Value[-1] == "l" or Value[-1] == "L":
+        return TAGLIST[TAG.LONG](int(Value[0:-1]))
+    elif Value[-1] == "f" or Value[-1] == "F":
+        return TAGLIST[TAG.FLOAT](float(Value[0:-1]))
+    elif Value[-1] == "d" or Value[-1] == "D":
+        return TAGLIST[TAG.DOUBLE](float(Value[0:-1]))
+    elif Type == "Int":
+        return TAGLIST[TAG.INT](int(Value))
+    elif Type == "Float":
+        return TAGLIST[TAG.DOUBLE](float(Value))
+    else:
+        return None
+
+@lru_cache(maxsize=65536)
+def parse_py_number(Type, Value):
+    if Value[-1] in "bBsSlL":
+        return int(Value[0:-1])
+    elif Value[-1] in "fFdD":
+        return float(Value[0:-1])
+    elif Type == "Int":
+        return int(Value)
+    elif Type == "Float":
+        return float(Value)
+    else:
+        return None
+
 def Tokenizer(code):
     for mo in TokenRe.finditer(code):
         type = mo.lastgroup
@@ -0,0 +1,143 @@
+"""
+    stats.py - 标签树的内存占用统计
+"""
+
+
+from sys import getsizeof
+
+from . import TAG, codec as ce
+from .path import PLAIN_KEY
+
+NUMBER_SIZE = ce.number_bytes_len
+ARRAY_TAGS = (TAG.BYTE_ARRAY, TAG.INT_ARRAY, TAG.LONG_ARRAY)
+
+
+def path_key(name):
+    return name if PLAIN_KEY.fullmatch(name) else ce.str_to_string(name)
+
+
+class Usage:
+    __slots__ = ("count", "memory", "encoded")
+
+    def __init__(self):
+        self.count = self.memory = self.encoded = 0
+
+    @property
+    def ratio(self):
+        return self.memory / self.encoded if self.encoded else 0.0
+
+    def __repr__(self):
+        return "<Usage count=%s memory=%s encoded=%s>" % (self.count, self.memory, self.encoded)
+
+
+class Footprint:
+    def __init__(self, memory, encoded, by_type, by_path):
+        self.memory = memory
+        self.encoded = encoded
+        self.by_type = by_type
+        self.by_path = by_path
+
+    @property
+    def ratio(self):
+        return self.memory / self.encoded if self.encoded else 0.0
+
+    def top(self, limit=20, key="memory"):
+        return sorted(self.by_path.items(), key=lambda i: getattr(i[1], key), reverse=True)[:limit]
+
+    def format(self, limit=20):
+        lines = ["memory %s  encoded %s  ratio %.2fx" % (format_size(self.memory), format_size(self.encoded), self.ratio), "",
+                 "%-12s %10s %12s %12s %8s" % ("type", "count", "memory", "encoded", "ratio")]
+        for type, u in sorted(self.by_type.items(), key=lambda i: i[1].memory, reverse=True):
+            lines.append("%-12s %10d %12s %12s %7.2fx" % (type.name, u.count, format_size(u.memory), format_size(u.encoded), u.ratio))
+        lines += ["", "%-40s %10s %12s %12s %8s" % ("path", "count", "memory", "encoded", "ratio")]
+        for path, u in self.top(limit):
+            lines.append("%-40s %10d %12s %12s %7.2fx" % (path or "<root>", u.count, format_size(u.memory), format_size(u.encoded), u.ratio))
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.format()
+
+    def __repr__(self):
+        return "<Footprint memory=%s encoded=%s ratio=%.2f>" % (self.memory, self.encoded, self.ratio)
+
+
+def format_size(size):
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024: return "%.1f %s" % (size, unit) if unit != "B" else "%d B" % size
+        size /= 1024
+    return "%.1f GiB" % size
+
+
+def footprint(tree, depth=None) -> Footprint:
+    root_name = None
+    if hasattr(tree, "get_tag"):
+        root_name, tree = tree.get_root_name(), tree.get_tag()
+    seen = set()
+    parents, paths, memory, encoded, types = [], [], [], [], []
+    stack = [(tree, -1, "", 0)]
+    pop, push = stack.pop, stack.append
+    while stack:
+        tag, parent, path, level = pop()
+        index = len(parents)
+        parents.append(parent)
+        paths.append(path if depth is None or level <= depth else None)
+        types.append(tag.type)
+        own = 0
+        if id(tag) not in seen:
+            seen.add(id(tag))
+            own = getsizeof(tag)
+        t = tag.type
+        if t in NUMBER_SIZE:
+            size = NUMBER_SIZE[t]
+        elif t == TAG.STRING:
+            size = len(tag.to_bytes())
+        elif t in ARRAY_TAGS:
+            value = tag._peek()
+            size = 4 + len(value) * value.itemsize
+        elif t == TAG.LIST:
+            value = tag._peek()
+            size = 5
+            if tag.value_is_array():
+                size += len(value) * value.itemsize
+            else:
+                child = path + "[]"
+                for v in value: push((v, index, child, level + 1))
+        else:
+            size = 1
+            prefix = path + "." if path else ""
+            for k, v in tag._peek().items():
+                if id(k) not in seen:
+                    seen.add(id(k))
+                    own += getsizeof(k)
+                size += 3 + len(ce.pack_data(k, TAG.STRING))
+                push((v, index, prefix + path_key(k), level + 1))
+        memory.append(own)
+        encoded.append(size)
+
+    by_type = {}
+    for t, m, e in zip(types, memory, encoded):
+        u = by_type.get(t)
+        if u is None: u = by_type[t] = Usage()
+        u.count += 1
+        u.memory += m
+        u.encoded += e
+
+    total_memory, total_encoded = memory[:], encoded[:]
+    for i in range(len(parents) - 1, 0, -1):
+        p = parents[i]
+        total_memory[p] += total_memory[i]
+        total_encoded[p] += total_encoded[i]
+
+    by_path = {}
+    for path, m, e in zip(paths, total_memory, total_encoded):
+        if path is None: continue
+        u = by_path.get(path)
+        if u is None: u = by_path[path] = Usage()
+        u.count += 1
+        u.memory += m
+        u.encoded += e
+
+    root_memory, root_encoded = total_memory[0], total_encoded[0]
+    if root_name is not None:
+        root_encoded += 3 + len(ce.pack_data(root_name, TAG.STRING))
+    return Footprint(root_memory, root_encoded, by_type, by_path)
@@ -0,0 +1,252 @@
+"""
+    structure.py - 结构模板(结构方块保存的 .nbt 文件)的列式视图
+
+    blocks 列表按列存放为 x/y/z/state 四个 array('i')，方块实体的 nbt 单独存放在以方块下标为键的字典中，
+    读写借助 schema 生成的专用解码/编码函数，不经过逐个 TAG_Compound 的遍历。
+"""
+
+
+from array import array
+from typing import Literal, Union, Callable
+
+from . import TAG, schema
+from .error import *
+from .root import RootNBT
+from .tags import TAG_Compound, TAG_String, TAG_List
+
+CELL = 4   # within() 使用的网格单元边长为 2**CELL 格(与区块分段相同的 16x16x16)
+Block = schema.Compound("StructureBlock", {"pos": schema.List(schema.INT), "state": schema.INT, "nbt": schema.ANY})
+Structure = schema.Compound("Structure", {
+    "size"       : schema.List(schema.INT),
+    "palette"    : schema.List(schema.ANY),
+    "blocks"     : schema.List(Block),
+    "entities"   : schema.List(schema.ANY),
+    "DataVersion": schema.INT,
+})
+
+
+def block_state(name: str, properties: dict = None) -> TAG_Compound:
+    res = TAG_Compound({"Name": TAG_String(name)})
+    if properties:
+        res["Properties"] = TAG_Compound({k: TAG_String(str(v).lower() if isinstance(v, bool) else str(v)) for k, v in properties.items()})
+    return res
+
+def state_key(tag):
+    if tag.type == TAG.COMPOUND: return tuple(sorted((k, state_key(v)) for k, v in tag._peek().items()))
+    return (tag.type.value, tag.to_bytes())
+
+
+class StructureTemplate:
+    def __init__(self, size=(0, 0, 0), data_version: int = None):
+        self.size = tuple(size)
+        self.data_version = data_version
+        self.palette = []
+        self.x, self.y, self.z, self.state = array('i'), array('i'), array('i'), array('i')
+        self.nbt = {}
+        self.block_extra = {}
+        self.entities = []
+        self.extra = {}
+        self.root_name = ""
+        self._index = None
+        self._grid = None
+        self._keys = None
+
+    # === 读写 ===
+    @classmethod
+    def from_record(cls, record, root_name=""):
+        res = cls(record.size or (0, 0, 0), record.DataVersion)
+        res.palette = list(record.palette or ())
+        res.entities = list(record.entities or ())
+        res.extra = dict(record.extra or ())
+        res.root_name = root_name
+        blocks = record.blocks or ()
+        pos = [b.pos for b in blocks]
+        if any(p is None or len(p) != 3 for p in pos): raise NbtDataError("结构中方块的 pos 必须是3个TAG_Int")
+        res.x = array('i', [p[0] for p in pos])
+        res.y = array('i', [p[1] for p in pos])
+        res.z = array('i', [p[2] for p in pos])
+        try:
+            res.state = array('i', [b.state for b in blocks])
+        except TypeError:
+            raise NbtDataError("结构中存在缺少 state 的方块")
+        if res.palette and res.state and not 0 <= min(res.state) <= max(res.state) < len(res.palette):
+            raise NbtDataError("方块的 state 超出了调色板范围(共 %s 项)" % len(res.palette))
+        res.nbt = {i: b.nbt for i, b in enumerate(blocks) if b.nbt is not None}
+        res.block_extra = {i: b.extra for i, b in enumerate(blocks) if b.extra}
+        return res
+
+    def to_record(self):
+        new, nbt, block_extra = Block.record, self.nbt, self.block_extra
+        blocks = [new(array('i', (x, y, z)), s, nbt.get(i), block_extra.get(i))
+                  for i, (x, y, z, s) in enumerate(zip(self.x, self.y, self.z, self.state))]
+        palette = self.palette if self.palette or "palettes" not in self.extra else None
+        return Structure.new(size=array('i', self.size), palette=palette, blocks=blocks, entities=self.entities,
+                             DataVersion=self.data_version, extra=self.extra or None)
+
+    @classmethod
+    def from_nbt(cls,
+        data     : Union[str, bytes, 'IOBase'],
+        zip_mode : Literal['none', 'gzip', 'zlib'] = None,
+        byteorder: Literal['little', 'big'] = 'big'):
+        return cls.from_record(Structure.from_nbt(data, zip_mode, byteorder))
+
+    def to_nbt(self,
+        target   : Union[str, 'IOBase'] = None,
+        zip_mode : Literal['none', 'gzip', 'zlib'] = 'gzip',
+        byteorder: Literal['little', 'big'] = 'big') -> bytes:
+        return Structure.to_nbt(self.to_record(), target, zip_mode, byteorder, self.root_name)
+
+    @classmethod
+    def from_root(cls, root: RootNBT):
+        if not isinstance(root, RootNBT): raise TypeError("期望类型为 %s，但传入了 %s" % (RootNBT, repr(root)))
+        return cls.from_record(Structure.from_tag(root.get_tag()), root.get_root_name())
+
+    def to_root(self) -> RootNBT:
+        return RootNBT(Structure.to_tag(self.to_record()), self.root_name)
+
+    # === 查询 ===
+    def __len__(self):
+        return len(self.state)
+
+    def index(self) -> dict:
+        if self._index is None:
+            self._index = dict(zip(zip(self.x, self.y, self.z), range(len(self.state))))
+        return self._index
+
+    def find(self, x: int, y: int, z: int) -> int:
+        return self.index().get((x, y, z))
+
+    def get(self, x: int, y: int, z: int) -> TAG_Compound:
+        i = self.find(x, y, z)
+        return None if i is None else self.palette[self.state[i]]
+
+    def get_nbt(self, x: int, y: int, z: int) -> TAG_Compound:
+        i = self.find(x, y, z)
+        return None if i is None else self.nbt.get(i)
+
+    def grid(self) -> dict:
+        if self._grid is None:
+            self._grid = grid = {}
+            for i, (x, y, z) in enumerate(zip(self.x, self.y, self.z)):
+                key = (x >> CELL, y >> CELL, z >> CELL)
+                cell = grid.get(key)
+                if cell is None: grid[key] = [i]
+                else: cell.append(i)
+        return self._grid
+
+    def _grid_add(self, i, x, y, z):
+        if self._grid is not None: self._grid.setdefault((x >> CELL, y >> CELL, z >> CELL), []).append(i)
+
+    def within(self, start, end) -> list:
+        (x0, y0, z0), (x1, y1, z1) = start, end
+        if x0 >= x1 or y0 >= y1 or z0 >= z1: return []
+        grid, xs, ys, zs = self.grid(), self.x, self.y, self.z
+        cx, cy, cz = range(x0 >> CELL, ((x1 - 1) >> CELL) + 1), range(y0 >> CELL, ((y1 - 1) >> CELL) + 1), range(z0 >> CELL, ((z1 - 1) >> CELL) + 1)
+        if len(cx) * len(cy) * len(cz) > len(grid):
+            cells = [v for (a, b, c), v in grid.items() if a in cx and b in cy and c in cz]
+        else:
+            cells = [grid[k] for k in ((a, b, c) for a in cx for b in cy for c in cz) if k in grid]
+        return sorted(i for cell in cells for i in cell if x0 <= xs[i] < x1 and y0 <= ys[i] < y1 and z0 <= zs[i] < z1)
+
+    def blocks(self):
+        palette, nbt = self.palette, self.nbt
+        for i, (x, y, z, s) in enumerate(zip(self.x, self.y, self.z, self.state)):
+            yield x, y, z, palette[s], nbt.get(i)
+
+    def bounds(self):
+        if not self.state: return None
+        return (min(self.x), min(self.y), min(self.z)), (max(self.x), max(self.y), max(self.z))
+
+    # === 修改 ===
+    def state_index(self, state: Union[TAG_Compound, str]) -> int:
+        if isinstance(state, str): state = block_state(state)
+        if not isinstance(state, TAG_Compound): raise TypeError("期望类型为 %s，但传入了 %s" % (TAG_Compound, repr(state)))
+        if self._keys is None:
+            self._keys = {}
+            for i, entry in enumerate(self.palette): self._keys.setdefault(state_key(entry), i)
+        key = state_key(state)
+        i = self._keys.get(key)
+        if i is None:
+            i = self._keys[key] = len(self.palette)
+            self.palette.append(state)
+        return i
+
+    def set(self, x: int, y: int, z: int, state: Union[int, TAG_Compound, str], nbt: TAG_Compound = None) -> int:
+        if not isinstance(state, int): state = self.state_index(state)
+        elif not 0 <= state < len(self.palette): raise IndexError("state %s 超出了调色板范围(共 %s 项)" % (state, len(self.palette)))
+        index = self.index()
+        i = index.get((x, y, z))
+        if i is None:
+            i = index[(x, y, z)] = len(self.state)
+            self.x.append(x); self.y.append(y); self.z.append(z); self.state.append(state)
+            self._grid_add(i, x, y, z)
+        else:
+            self.state[i] = state
+        if nbt is None: self.nbt.pop(i, None)
+        else: self.nbt[i] = nbt
+        return i
+
+    def remap(self, mapping: Union[dict, Callable]) -> list:
+        palette, keys, table = [], {}, []
+        for entry in self.palette:
+            if callable(mapping):
+                new = mapping(entry)
+            else:
+                name = entry.get("Name")
+                new = mapping.get(name.get_value()) if name is not None else None
+            if new is None:
+                new = entry
+            elif isinstance(new, str):
+                name, new = new, entry.copy()
+                new["Name"] = TAG_String(name)
+            key = state_key(new)
+            if key not in keys:
+                keys[key] = len(palette)
+                palette.append(new)
+            table.append(keys[key])
+        if table != list(range(len(table))):
+            self.state = array('i', [table[s] for s in self.state])
+        self.palette, self._keys = palette, keys
+        return table
+
+    def compact(self) -> list:
+        used = sorted(set(self.state))
+        table = [-1] * len(self.palette)
+        for i, s in enumerate(used): table[s] = i
+        if len(used) != len(self.palette):
+            self.palette = [self.palette[s] for s in used]
+            self.state = array('i', [table[s] for s in self.state])
+            self._keys = None
+        return table
+
+    def paste(self, other: 'StructureTemplate', offset=(0, 0, 0), entities=True):
+        dx, dy, dz = offset
+        table = [self.state_index(entry) for entry in other.palette]
+        index, nbt = self.index(), other.nbt
+        x, y, z, state = self.x, self.y, self.z, self.state
+        for i, (a, b, c, s) in enumerate(zip(other.x, other.y, other.z, other.state)):
+            key = (a + dx, b + dy, c + dz)
+            j = index.get(key)
+            if j is None:
+                j = index[key] = len(state)
+                x.append(key[0]); y.append(key[1]); z.append(key[2]); state.append(table[s])
+                self._grid_add(j, *key)
+            else:
+                state[j] = table[s]
+                self.nbt.pop(j, None)
+                self.block_extra.pop(j, None)
+            if i in nbt: self.nbt[j] = nbt[i].copy()
+            if i in other.block_extra: self.block_extra[j] = {k: v.copy() for k, v in other.block_extra[i].items()}
+        if entities:
+            for entity in other.entities:
+                entity = entity.copy()
+                for key in ("pos", "blockPos"):
+                    pos = entity.get(key)
+                    if isinstance(pos, TAG_List) and pos.value_is_array() and len(pos) == 3:
+                        entity[key] = TAG_List(array(pos._peek().typecode, [v + d for v, d in zip(pos, offset)]))
+                self.entities.append(entity)
+        self.size = tuple(max(s, o + d) for s, o, d in zip(self.size, other.size, offset))
+
+    def __repr__(self):
+        return "<StructureTemplate size=%s blocks=%d palette=%d block_entities=%d entities=%d>" % (
+            self.size, len(self.state), len(self.palette), len(self.nbt), len(self.entities))
@@ -5,21 +5,62 @@
 
 from io import BytesIO, StringIO, IOBase
 from array import array
-from math import ceil
+from math import ceil, nan
 from collections import deque
+from sys import getsizeof, byteorder as native_byteorder
+from os import environ
+from hashlib import blake2b
+from threading import RLock
 
 from . import TAGLIST, TAG, codec as ce
 from .snbt import SnbtIO, get_line
 from .error import *
 from .abc import *
 
+# OWNED: 容器只属于本标签；EXPOSED: 容器已通过 get_value/set_value 交给调用者；SHARED: 容器与其他拷贝共用，修改前先复制；
+# PARTIAL: 本层容器私有，但除 __lent 中记录的子容器外，子标签仍可能与其他拷贝共用
+OWNED, EXPOSED, SHARED, PARTIAL = 0, 1, 2, 3
+_lock = RLock()   # 保护 copy 与读取子标签时的状态切换
+DEBUG = environ.get("PYTHON_NBT_DEBUG", "") not in ("", "0")   # 为 True 时 from_trusted/from_buffer 也检查传入的数据
+CONTAINERS = (TAG.COMPOUND, TAG.LIST, TAG.BYTE_ARRAY, TAG.INT_ARRAY, TAG.LONG_ARRAY)
+TYPE_BYTES = {t: bytes((t.value,)) for t in TAG}
+
+
+def make_digest(type, value, item_type=None) -> bytes:
+    h = blake2b(TYPE_BYTES[type], digest_size=16)
+    if type == TAG.COMPOUND:
+        for name, v in sorted(((ce.pack_data(k, TAG.STRING), v) for k, v in value.items()), key=lambda i: i[0]):
+            h.update(ce.length_to_bytes(len(name), True))
+            h.update(name)
+            feed_digest(h, v)
+        return h.digest()
+    if type == TAG.LIST: h.update(TYPE_BYTES[item_type if value else TAG.END])
+    h.update(ce.pack_data(len(value), TAG.INT, True))
+    if isinstance(value, array):
+        if value.typecode in "fd" and value != value: value = array(value.typecode, [nan if v != v else v for v in value])
+        h.update(ce.array_to_bytes(value, True))
+    else:
+        for v in value: feed_digest(h, v)
+    return h.digest()
+
+def feed_digest(h, tag):
+    h.update(TYPE_BYTES[tag.type])
+    h.update(tag.digest() if tag.type in CONTAINERS else tag.to_bytes(True, True))
+
+def equal(a, b):
+    return a is b or (a.type == b.type and a == b)
+
+def unpickle(type, data, mode):
+    return TAGLIST[TAG(type)]._from_bytes(data, mode)
+
+
 class TAG_Number(TAG_Base_Number):
+    __slots__ = ('__value',)
     type = None
     unit = None
     
     def __init__(self, value=0):
         self.__value = value
-        self.__snbt_cache = f"{value}{self.unit}"
 
     @classmethod
     def _from_bytes(cls, buffer, mode=False):
@@ -54,26 +95,34 @@ class TAG_Number(TAG_Base_Number):
     def set_value(self, value):
         raise AttributeError("不能调用的方法")
     
-    def _to_snbt(self):
-        return self.__snbt_cache
+    def _to_snbt(self, canonical=False):
+        return f"{self.__value}{self.unit}"
     
     def _to_snbt_format(self, buffer, indent, size):
-        buffer.write(self.__snbt_cache)
+        buffer.write(f"{self.__value}{self.unit}")
     
-    def to_bytes(self, mode=False):
+    def to_bytes(self, mode=False, canonical=False):
+        if canonical and self.__value != self.__value: return ce.pack_data(nan, self.type, mode)
         return ce.pack_data(self.__value, self.type, mode)
 
+    def __reduce__(self):
+        return self.__class__, (self.__value,)
+
     def get_info(self, a=0):
         return f'{self.__class__.__name__}({self.get_value()})'
 
     def copy(self):
         return self
 
+    def __sizeof__(self):
+        return object.__sizeof__(self) + getsizeof(self.__value)
+
     def __repr__(self):
         return f"<{self.type} value={self.__value} bytes={self.to_bytes()} at 0x{id(self)}>"
 
 
 class TAG_Array(TAG_Base_Array):
+    __slots__ = ('__value', '__state', '__digest')
     _type = None
     type = None
     unit = None
@@ -81,9 +130,25 @@ class TAG_Array(TAG_Base_Array):
     
     def __init__(self, value=None):
         self.__value = array(self.unit[2])
+        self.__state = OWNED
+        self.__digest = None
         if value is None: return
         self.set_value(value)
 
+    @classmethod
+    def from_buffer(cls, buffer, byteorder: str = native_byteorder):
+        if byteorder not in ('little', 'big'): raise ValueError("字节序期望为 'little' 或 'big'，但传入了 %s" % repr(byteorder))
+        if isinstance(buffer, array) and buffer.typecode == cls.unit[2]:
+            value, state = buffer, EXPOSED
+        else:
+            if DEBUG and isinstance(buffer, array): raise TypeError("期望类型码为 '%s' 的 %s，但传入了 '%s'" % (cls.unit[2], array, buffer.typecode))
+            value, state = array(cls.unit[2]), OWNED
+            value.frombytes(buffer)
+        if (byteorder == 'big') != ce.NATIVE_BIG: value.byteswap()
+        res = cls.__new__(cls)
+        res.__value, res.__state, res.__digest = value, state, None
+        return res
+
     @classmethod
     def _from_bytes(cls, buffer, mode=False):
         return cls._from_bytesIO(BytesIO(buffer), mode)
@@ -103,7 +168,7 @@ class TAG_Array(TAG_Base_Array):
             array.__value.frombytes(byte)
         except Exception as e:
             throw_nbt_error(e, buffer, size)
-        if mode: array.__value.byteswap()
+        if bool(mode) != ce.NATIVE_BIG: array.__value.byteswap()
         return array
 
     @classmethod
@@ -136,7 +201,7 @@ class TAG_Array(TAG_Base_Array):
             else:
                 buffer.throw_error(token, "] ,")
 
-    def _to_snbt(self):
+    def _to_snbt(self, canonical=False):
         return f"[{self.unit[0]};" + ','.join([f"{str(i)}{self.unit[1]}" for i in self.__value]) + "]"
 
     def _to_snbt_format(self, buffer, indent, size):
@@ -152,30 +217,50 @@ class TAG_Array(TAG_Base_Array):
                 if i < count: buffer.write(",\n")
             buffer.write("\n" + tab * (indent - 1) + "]")
 
-    def to_bytes(self, mode=False):
-        if mode: self.__value.byteswap()
-        res = ce.pack_data(len(self.__value), TAG.INT, mode) + self.__value.tobytes()
-        if mode: self.__value.byteswap()
-        return res
+    def to_bytes(self, mode=False, canonical=False):
+        return ce.pack_data(len(self.__value), TAG.INT, mode) + ce.array_to_bytes(self.__value, mode)
     
     def get_value(self):
+        if self.__state != EXPOSED:
+            with _lock:
+                if self.__state == SHARED: self.__value = self.__value[:]
+                self.__state = EXPOSED
+                self.__digest = None
+        return self.__value
+
+    def _peek(self):
+        return self.__value
+
+    def _mutable(self):
+        if self.__state == SHARED:
+            with _lock:
+                if self.__state == SHARED: self.__value, self.__state = self.__value[:], OWNED
+        self.__digest = None
         return self.__value
     
     def set_value(self, value):
+        self.__digest = None
         if isinstance(value, list):
             try:
-                self.__value = array(self.unit[2]).fromlist(value)
+                self.__value = array(self.unit[2], value)
+                self.__state = OWNED
             except Exception as e:
                 raise ValueError("尝试从(%s)自动转换数值失败 %s" % (value, e.args[0]))
         elif isinstance(value, (TAG_List, TAG_ByteArray, TAG_IntArray, TAG_LongArray)):
-            self.set_value(value.get_value())
+            value, state = value._share()
+            if isinstance(value, array) and value.typecode == self.unit[2]:
+                self.__value, self.__state = value, state
+            else:
+                self.set_value(value if isinstance(value, array) else list(value))
         elif isinstance(value, TAG_Compound):
-            self.set_value(list(value.get_value().values()))
+            self.set_value(list(value._peek().values()))
         elif isinstance(value, array) and value.typecode == self.unit[2]:
             self.__value = value
+            self.__state = EXPOSED
         elif isinstance(value, array):
             try:
-                self.__value = array(self.unit[2]).fromlist(value.tolist())
+                self.__value = array(self.unit[2], value)
+                self.__state = OWNED
             except Exception as e:
                 raise ValueError("尝试从(%s)自动转换数值失败 %s" % (value, e.args[0]))
         else:
@@ -203,48 +288,89 @@ class TAG_Array(TAG_Base_Array):
             for i in range(len(self) - 5, len(self)): res.append(f'\n    {self[i]}')
             return f'{self.__class__.__name__}(' + ''.join(res) + '\n)'
 
+    def __sizeof__(self):
+        return object.__sizeof__(self) + getsizeof(self.__value)
+
     def __repr__(self):
         return f"<{self.type} count={len(self.__value)} at 0x{id(self)}>"
 
+    def _share(self):
+        with _lock:
+            if self.__state == EXPOSED: return self.__value[:], OWNED
+            self.__state = SHARED
+            return self.__value, SHARED
+
     def copy(self):
-        return self.__class__(self)
+        res = self.__class__()
+        res.__value, res.__state = self._share()
+        if res.__state == SHARED: res.__digest = self.__digest
+        return res
+
+    def digest(self) -> bytes:
+        res = self.__digest
+        if res is None:
+            res = make_digest(self.type, self.__value)
+            if self.__state != EXPOSED: self.__digest = res
+        return res
+
+    def __eq__(self, other):
+        if self is other: return True
+        if not isinstance(other, TAG_Array): return NotImplemented
+        return self.type == other.type and self.__value == other.__value
+
+    def __ne__(self, other):
+        res = self.__eq__(other)
+        return res if res is NotImplemented else not res
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return unpickle, (self.type.value, self.to_bytes(ce.NATIVE_BIG), ce.NATIVE_BIG)
 
 
 class TAG_End(TAG_Base_End):
+    __slots__ = ()
     type = TAG.END
 
 
 class TAG_Byte(TAG_Number, metaclass=TAG_Number_Meta):
+    __slots__ = ()
     type = TAG.BYTE
     unit = "b"
 
 
 class TAG_Short(TAG_Number, metaclass=TAG_Number_Meta):
+    __slots__ = ()
     type = TAG.SHORT
     unit = "s"
 
 
 class TAG_Int(TAG_Number, metaclass=TAG_Number_Meta):
+    __slots__ = ()
     type = TAG.INT
     unit = ""
 
 
 class TAG_Long(TAG_Number, metaclass=TAG_Number_Meta):
+    __slots__ = ()
     type = TAG.LONG
     unit = "l"
 
 
 class TAG_Float(TAG_Number, metaclass=TAG_Number_Meta):
+    __slots__ = ()
     type = TAG.FLOAT
     unit = "f"
 
 
 class TAG_Double(TAG_Number, metaclass=TAG_Number_Meta):
+    __slots__ = ()
     type = TAG.DOUBLE
     unit = "d"
 
 
 class TAG_String(TAG_Base_String, metaclass=TAG_String_Meta):
+    __slots__ = ('__value', '__cache')
     type = TAG.STRING
     
     def __init__(self, value=""):
@@ -287,19 +413,18 @@ class TAG_String(TAG_Base_String, metaclass=TAG_String_Meta):
         if not value.type == cls.type: buffer.throw_error(token, "字符串")
         return value
 
-    def _to_snbt(self):
-        try:
-            return self.__snbt_cache
-        except:
-            self.__snbt_cache = ce.str_to_string(self.get_value())
-            return self.__snbt_cache
+    def _to_snbt(self, canonical=False):
+        return ce.str_to_string(self.get_value())
 
     def _to_snbt_format(self, buffer, indent, size):
         buffer.write(self._to_snbt())
 
-    def to_bytes(self, mode=False):
+    def to_bytes(self, mode=False, canonical=False):
         return ce.length_to_bytes(len(self.__value), mode) + self.__value
 
+    def __reduce__(self):
+        return self.__class__, (self.get_value(),)
+
     def get_value(self):
         if self.__cache is None:
             self.__cache = ce.unpack_data(self.__value, self.type)
@@ -314,6 +439,10 @@ class TAG_String(TAG_Base_String, metaclass=TAG_String_Meta):
     def copy(self):
         return self
 
+    def __sizeof__(self):
+        res = object.__sizeof__(self) + getsizeof(self.__value)
+        return res if self.__cache is None else res + getsizeof(self.__cache)
+
     def __repr__(self):
         s = self.get_value()
         b = self.to_bytes()
@@ -323,17 +452,45 @@ class TAG_String(TAG_Base_String, metaclass=TAG_String_Meta):
 
 
 class TAG_List(TAG_Base_List):
+    __slots__ = ('__value', '__type', '__is_number_list', '__state', '__digest', '__lent')
     type = TAG.LIST
     
     def __init__(self, value=None, type=TAG.END):
+        self._watchers = None
         self.set_type(type)
         if self.__is_number_list:
             self.__value = array(ARRAY_TYPECODE[self.__type])
         else:
             self.__value = []
+        self.__state = OWNED
+        self.__lent = None
         if value is None: return
         self.set_value(value)
 
+    @classmethod
+    def from_trusted(cls, items, type):
+        res = cls.__new__(cls)
+        res._watchers = None
+        res.__lent = None
+        res.set_type(type)
+        if res.__is_number_list:
+            if not isinstance(items, array):
+                if DEBUG:
+                    for v in items:
+                        if isinstance(v, TAG_Base) and v.type != res.__type: raise TypeError("TAG_List容器元素期望类型为 %s，但传入了 %s" % (res.__type, repr(v)))
+                res.__value, res.__state = array(ARRAY_TYPECODE[res.__type], items), OWNED
+            else:
+                if DEBUG and items.typecode != ARRAY_TYPECODE[res.__type]:
+                    raise TypeError("期望类型码为 '%s' 的 %s，但传入了 '%s'" % (ARRAY_TYPECODE[res.__type], array, items.typecode))
+                res.__value, res.__state = items, EXPOSED
+        else:
+            if DEBUG:
+                if not isinstance(items, list): raise TypeError("期望类型为 %s，但传入了 %s" % (list, repr(items)))
+                for v in items:
+                    if not isinstance(v, TAG_Base) or v.type != res.__type: raise TypeError("TAG_List容器元素期望类型为 %s，但传入了 %s" % (res.__type, repr(v)))
+            res.__value, res.__state = items, EXPOSED
+        return res
+
     @classmethod
     def _from_bytes(cls, buffer, mode=False):
         return cls._from_bytesIO(BytesIO(buffer), mode)
@@ -361,7 +518,7 @@ class TAG_List(TAG_Base_List):
                 res.frombytes(byte)
             except Exception as e:
                 throw_nbt_error(e, buffer, length)
-            if mode: res.byteswap()
+            if bool(mode) != ce.NATIVE_BIG: res.byteswap()
             List.__value = res
         else:
             res = [None] * count
@@ -390,10 +547,10 @@ class TAG_List(TAG_Base_List):
         elif token[1] == "L" and buffer._read_one()[1] == ";":
             return TAG_LongArray._from_snbtIO(buffer)
         value = buffer.parse_value(token)
-        res.append(value)
         Type = value.type
-        if token[0] == "Int" or token[0] == "Float":
+        if Type in ARRAY_TYPECODE:
             is_number = True
+        res.append(value.get_value() if is_number else value)
         while True:
             token = buffer._read_one()
             if token[1] == "]":
@@ -417,11 +574,11 @@ class TAG_List(TAG_Base_List):
             res.append(value)
                 
 
-    def _to_snbt(self):
+    def _to_snbt(self, canonical=False):
         if self.__is_number_list:
             return "[" + ','.join([i._to_snbt() for i in self]) + "]"
         else:
-            return "[" + ','.join([i._to_snbt() for i in self.__value]) + "]"
+            return "[" + ','.join([i._to_snbt(canonical) for i in self.__value]) + "]"
 
     def _to_snbt_format(self, buffer, indent, size):
         count, tab = len(self.__value), " " * size
@@ -471,22 +628,106 @@ class TAG_List(TAG_Base_List):
                 if i < count: buffer.write(",\n")
             buffer.write("\n" + tab * (indent - 1) + "]")
 
-    def to_bytes(self, mode=False):
+    def to_bytes(self, mode=False, canonical=False):
         byte = None
         if self.__is_number_list:
-            if mode: self.__value.byteswap()
-            byte = self.__value.tobytes()
-            if mode: self.__value.byteswap()
+            value = self.__value
+            if canonical and self.__type in (TAG.FLOAT, TAG.DOUBLE) and value != value:
+                value = array(value.typecode, [nan if v != v else v for v in value])
+            byte = ce.array_to_bytes(value, mode)
         else:
-            byte = b''.join([i.to_bytes(mode) for i in self.__value])
+            byte = b''.join([i.to_bytes(mode, canonical) for i in self.__value])
+        if canonical and not self.__value:
+            return ce.tag_type_to_bytes(TAG.END) + ce.pack_data(0, TAG.INT, mode)
         return ce.tag_type_to_bytes(self.__type)\
              + ce.pack_data(len(self.__value), TAG.INT, mode)\
              + byte
     
     def get_value(self):
+        if self.__state != EXPOSED:
+            with _lock:
+                if self.__state != EXPOSED:
+                    self.__privatize()
+                    self.__state, self.__lent, self.__digest = EXPOSED, None, None
+        return self.__value
+
+    def _peek(self):
+        return self.__value
+
+    def _child(self, index):
+        value = self.__value[index]
+        lent = self.__lent
+        if self.__state == EXPOSED or lent is True or value.type not in CONTAINERS or (lent and lent.get(id(value)) is value): return value
+        with _lock:
+            return self.__lend(index)
+
+    def _children(self):
+        if self.__state != EXPOSED and self.__lent is not True:
+            with _lock:
+                if self.__state != EXPOSED and self.__lent is not True:
+                    self.__privatize()
+                    self.__lent, self.__digest = True, None
+        return self.__value
+
+    def _mutable(self):
+        if self.__state == SHARED:
+            with _lock:
+                if self.__state == SHARED:
+                    if self.__is_number_list: self.__value, self.__state = self.__value[:], OWNED
+                    else: self.__value, self.__state = list(self.__value), PARTIAL
+        self.__digest = None
         return self.__value
+
+    def _note(self, values):
+        lent = self.__lent
+        if lent is True or self.__state == EXPOSED or self.__is_number_list: return
+        for v in values:
+            if v.type in CONTAINERS:
+                if lent is None: lent = self.__lent = {}
+                lent[id(v)] = v
+
+    def _take(self, index):
+        with _lock:
+            value = self.__value[index] if self.__is_number_list else self.__lend(index)
+            self._mutable().pop(index)
+        return value
+
+    def _reset(self):
+        with _lock:
+            if self.__state == EXPOSED:
+                del self.__value[:]
+            else:
+                self.__value = array(ARRAY_TYPECODE[self.__type]) if self.__is_number_list else []
+                self.__state = OWNED
+            self.__lent = self.__digest = None
+
+    def __lend(self, index):
+        # 在锁内调用：返回下标处的子标签，子容器会先变为本标签独占，并记录为已借出
+        value = self.__value[index]
+        state, lent = self.__state, self.__lent
+        if state == EXPOSED or lent is True or value.type not in CONTAINERS: return value
+        if lent is None: lent = self.__lent = {}
+        elif lent.get(id(value)) is value: return value
+        if state != OWNED:
+            if state == SHARED: self.__value, self.__state = list(self.__value), PARTIAL
+            value = self.__value[index] = value.copy()
+        lent[id(value)] = value
+        self.__digest = None
+        return value
+
+    def __privatize(self):
+        # 在锁内调用：使本层容器及其中的子容器都只属于本标签
+        state, lent = self.__state, self.__lent
+        if state == SHARED: self.__value = self.__value[:] if self.__is_number_list else list(self.__value)
+        if state in (SHARED, PARTIAL) and not self.__is_number_list:
+            value = self.__value
+            for i, v in enumerate(value):
+                if v.type in CONTAINERS and not (lent and lent.get(id(v)) is v): value[i] = v.copy()
+        self.__state = OWNED
     
     def set_value(self, value):
+        self.__digest = None
+        self.__lent = None
         if isinstance(value, list):
             type = None if len(value) else TAG.END
             for v in value:
@@ -494,25 +735,33 @@ class TAG_List(TAG_Base_List):
                 if not isinstance(v, TAG_Base) or not type == v.type: raise TypeError("TAG_List容器元素期望类型为 %s，但传入了 %s" % (type, v.type))
             self.set_type(type)
             self.test_type()
-            self.__value = value.copy()
+            if self.__is_number_list:
+                self.__value = array(ARRAY_TYPECODE[self.__type], [v.get_value() for v in value])
+                self.__state = OWNED
+            else:
+                self.__value = value.copy()
+                self.__state = EXPOSED
         elif isinstance(value, array) and value.typecode in ARRAY_TYPECODE.values():
             self.__value = value
+            self.__state = EXPOSED
             self.set_type({v:k for k, v in ARRAY_TYPECODE.items()}[value.typecode])
             self.test_type()
         elif isinstance(value, TAG_List):
             self.set_type(value.get_type())
             self.test_type()
-            self.__value = value.get_value().copy()
+            self.__value, self.__state = value._share()
         elif isinstance(value, (TAG_ByteArray, TAG_IntArray, TAG_LongArray)):
             self.set_type(value._type)
-            self.__value = value.get_value()
+            self.__value, self.__state = value._share()
         else:
             raise TypeError("期望类型为 %s，但传入了 %s" % ((list, TAG_List, TAG_ByteArray, TAG_IntArray, TAG_LongArray), value))
+        if self._watchers: self._notify(None, None)
     
     def get_type(self):
         return self.__type
     
     def set_type(self, type):
+        self.__digest = None
         if isinstance(type, int):
             self.__type = TAG(type)
             self.test_type()
@@ -532,6 +781,7 @@ class TAG_List(TAG_Base_List):
         if isinstance(value, tuple(TAGLIST.values())):
             if len(self.__value) == 0:
                 self.set_type(value.type)
+                self.__digest = None
                 self.__value = array(ARRAY_TYPECODE[self.__type]) if self.__is_number_list else []
             if value.type == self.__type:
                 return value.get_value() if self.__is_number_list else value
@@ -556,23 +806,79 @@ class TAG_List(TAG_Base_List):
     def value_is_array(self):
         return self.__is_number_list
 
+    def __clone(self):
+        return self.__value[:] if self.__is_number_list else [v.copy() for v in self.__value]
+
+    def _share(self):
+        with _lock:
+            lent = self.__lent
+            if self.__state == EXPOSED or lent is True: return self.__clone(), OWNED
+            if lent:
+                self.__state = PARTIAL
+                return [v.copy() if lent.get(id(v)) is v else v for v in self.__value], PARTIAL
+            self.__state = SHARED
+            return self.__value, SHARED
+
     def copy(self):
-        if self.__is_number_list: return self.__class__(self.__value)
         res = self.__class__()
-        res.__value = [v.copy() for v in self.__value]
+        res.__type, res.__is_number_list = self.__type, self.__is_number_list
+        res.__value, res.__state = self._share()
+        if res.__state == SHARED: res.__digest = self.__digest
+        return res
+
+    def digest(self) -> bytes:
+        res = self.__digest
+        if res is None:
+            res = make_digest(TAG.LIST, self.__value, self.__type)
+            if self.__state != EXPOSED and not self.__lent: self.__digest = res
         return res
 
+    def __eq__(self, other):
+        if self is other: return True
+        if not isinstance(other, TAG_List): return NotImplemented
+        a, b = self.__value, other.__value
+        if len(a) != len(b): return False
+        if not a: return True
+        if self.__type != other.__type: return False
+        if self.__digest is not None and other.__digest is not None: return self.__digest == other.__digest
+        if self.__is_number_list: return a == b
+        return all(map(equal, a, b))
+
+    def __ne__(self, other):
+        res = self.__eq__(other)
+        return res if res is NotImplemented else not res
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return unpickle, (self.type.value, self.to_bytes(ce.NATIVE_BIG), ce.NATIVE_BIG)
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + getsizeof(self.__value)
+
     def __repr__(self):
         return f"<{self.type} type={self.__type} count={len(self.__value)} at 0x{id(self)}>"
 
 
 class TAG_Compound(TAG_Base_Compound):
+    __slots__ = ('__value', '__state', '__digest', '__lent')
     type = TAG.COMPOUND
     
     def __init__(self, value=None):
         self.__value = {}
+        self.__state = OWNED
+        self.__digest = None
+        self.__lent = None
         if value is None: return
         self.set_value(value)
+
+    @classmethod
+    def from_trusted(cls, items: dict):
+        if DEBUG and not (isinstance(items, dict) and all(isinstance(k, str) and isinstance(v, TAG_Base) for k, v in items.items())):
+            raise TypeError("dict内含非期望类型：%s" % repr(items))
+        res = cls.__new__(cls)
+        res.__value, res.__state, res.__digest, res.__lent = items, EXPOSED, None, None
+        return res
     
     @classmethod
     def _from_bytes(cls, buffer, mode=False):
@@ -625,8 +931,10 @@ class TAG_Compound(TAG_Base_Compound):
             res[key] = buffer.parse_value(buffer._read_one())
                 
 
-    def _to_snbt(self):
-        return '{' + ','.join([f'{ce.str_to_snbt_key(k)}:{v._to_snbt()}' for k, v in self.__value.items()]) + '}'
+    def _to_snbt(self, canonical=False):
+        items = self.__value.items()
+        if canonical: items = sorted(items, key=lambda i: ce.pack_data(i[0], TAG.STRING))
+        return '{' + ','.join([f'{ce.str_to_snbt_key(k)}:{v._to_snbt(canonical)}' for k, v in items]) + '}'
     
     def _to_snbt_format(self, buffer, indent, size):
         count, tab, items = len(self.__value), " " * size, self.__value.items()
@@ -642,27 +950,115 @@ class TAG_Compound(TAG_Base_Compound):
                 if i < count: buffer.write(",\n")
             buffer.write("\n" + tab * (indent - 1) + "}")
     
-    def to_bytes(self, mode=False):
+    def to_bytes(self, mode=False, canonical=False):
         res = bytearray()
-        for k, v in self.__value.items():
-            name = ce.pack_data(k, TAG.STRING)
+        if canonical:
+            items = sorted(((ce.pack_data(k, TAG.STRING), v) for k, v in self.__value.items()), key=lambda i: i[0])
+        else:
+            items = ((ce.pack_data(k, TAG.STRING), v) for k, v in self.__value.items())
+        for name, v in items:
             res.extend(ce.tag_type_to_bytes(v.type))
             res.extend(ce.length_to_bytes(len(name), mode))
             res.extend(name)
-            res.extend(v.to_bytes(mode))
+            res.extend(v.to_bytes(mode, canonical))
         res.extend(ce.tag_type_to_bytes(TAG.END))
         return bytes(res)
     
     def get_value(self):
+        if self.__state != EXPOSED:
+            with _lock:
+                if self.__state != EXPOSED:
+                    self.__privatize()
+                    self.__state, self.__lent, self.__digest = EXPOSED, None, None
         return self.__value
+
+    def _peek(self):
+        return self.__value
+
+    def _child(self, key):
+        value = self.__value[key]
+        lent = self.__lent
+        if self.__state == EXPOSED or lent is True or value.type not in CONTAINERS or (lent and lent.get(key) is value): return value
+        with _lock:
+            return self.__lend(key)
+
+    def _children(self):
+        if self.__state != EXPOSED and self.__lent is not True:
+            with _lock:
+                if self.__state != EXPOSED and self.__lent is not True:
+                    self.__privatize()
+                    self.__lent, self.__digest = True, None
+        return self.__value
+
+    def _mutable(self):
+        if self.__state == SHARED:
+            with _lock:
+                if self.__state == SHARED: self.__value, self.__state = dict(self.__value), PARTIAL
+        self.__digest = None
+        return self.__value
+
+    def _put(self, key, value):
+        self._mutable()[key] = value
+        lent = self.__lent
+        if lent is True or self.__state == EXPOSED: return
+        if value.type in CONTAINERS:
+            if lent is None: lent = self.__lent = {}
+            lent[key] = value
+        elif lent:
+            lent.pop(key, None)
+
+    def _take(self, key, *default):
+        with _lock:
+            if key not in self.__value:
+                if default: return default[0]
+                raise KeyError(key)
+            value = self.__lend(key)
+            self._mutable().pop(key)
+            if self.__lent and self.__lent is not True: self.__lent.pop(key, None)
+        return value
+
+    def _reset(self):
+        with _lock:
+            if self.__state == EXPOSED:
+                self.__value.clear()
+            else:
+                self.__value, self.__state = {}, OWNED
+            self.__lent = self.__digest = None
+
+    def __lend(self, key):
+        # 在锁内调用：返回键对应的子标签，子容器会先变为本标签独占，并记录为已借出
+        value = self.__value[key]
+        state, lent = self.__state, self.__lent
+        if state == EXPOSED or lent is True or value.type not in CONTAINERS: return value
+        if lent is None: lent = self.__lent = {}
+        elif lent.get(key) is value: return value
+        if state != OWNED:
+            if state == SHARED: self.__value, self.__state = dict(self.__value), PARTIAL
+            value = self.__value[key] = value.copy()
+        lent[key] = value
+        self.__digest = None
+        return value
+
+    def __privatize(self):
+        # 在锁内调用：使本层容器及其中的子容器都只属于本标签
+        state, lent = self.__state, self.__lent
+        if state == SHARED: self.__value = dict(self.__value)
+        if state in (SHARED, PARTIAL):
+            value = self.__value
+            for k, v in value.items():
+                if v.type in CONTAINERS and not (lent and lent.get(k) is v): value[k] = v.copy()
+        self.__state = OWNED
     
     def set_value(self, value):
+        self.__digest = None
+        self.__lent = None
         if isinstance(value, TAG_Compound):
-            self.__value = value.get_value()
+            self.__value, self.__state = value._share()
         elif isinstance(value, dict):
             if not all(isinstance(k, str) and isinstance(v, TAG_Base) for k, v in value.items()):
                 raise TypeError("dict内含非期望类型：%s" % repr(value))
             self.__value = value
+            self.__state = EXPOSED
         elif isinstance(value, list):
             pass
         elif isinstance(value, TAG_List):
@@ -689,16 +1085,58 @@ class TAG_Compound(TAG_Base_Compound):
             res.insert(5, f'\n    ...more {len(self) - 10}')
             return f'{self.__class__.__name__}(' + ''.join(res) + '\n)'
 
+    def _share(self):
+        with _lock:
+            lent = self.__lent
+            if self.__state == EXPOSED or lent is True: return {k: v.copy() for k, v in self.__value.items()}, OWNED
+            if lent:
+                self.__state = PARTIAL
+                return {k: v.copy() if lent.get(k) is v else v for k, v in self.__value.items()}, PARTIAL
+            self.__state = SHARED
+            return self.__value, SHARED
+
     def copy(self):
         res = self.__class__()
-        res.__value = {k: v.copy() for k, v in self.__value.items()}
+        res.__value, res.__state = self._share()
+        if res.__state == SHARED: res.__digest = self.__digest
         return res
 
+    def digest(self) -> bytes:
+        res = self.__digest
+        if res is None:
+            res = make_digest(TAG.COMPOUND, self.__value)
+            if self.__state != EXPOSED and not self.__lent: self.__digest = res
+        return res
+
+    def __eq__(self, other):
+        if self is other: return True
+        if not isinstance(other, TAG_Compound): return NotImplemented
+        a, b = self.__value, other.__value
+        if len(a) != len(b): return False
+        if self.__digest is not None and other.__digest is not None: return self.__digest == other.__digest
+        for k, v in a.items():
+            w = b.get(k)
+            if w is None or not equal(v, w): return False
+        return True
+
+    def __ne__(self, other):
+        res = self.__eq__(other)
+        return res if res is NotImplemented else not res
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return unpickle, (self.type.value, self.to_bytes(ce.NATIVE_BIG), ce.NATIVE_BIG)
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + getsizeof(self.__value)
+
     def __repr__(self):
         return f"<{self.type} count={len(self.__value)} at 0x{id(self)}>"
 
 
 class TAG_ByteArray(TAG_Array):
+    __slots__ = ()
     _type = TAG.BYTE
     type = TAG.BYTE_ARRAY
     unit = ("B", "b", "b")
@@ -706,6 +1144,7 @@ class TAG_ByteArray(TAG_Array):
 
 
 class TAG_IntArray(TAG_Array):
+    __slots__ = ()
     _type = TAG.INT
     type = TAG.INT_ARRAY
     unit = ("I", "", "i")
@@ -713,6 +1152,7 @@ class TAG_IntArray(TAG_Array):
 
 
 class TAG_LongArray(TAG_Array):
+    __slots__ = ()
     _type = TAG.LONG
     type = TAG.LONG_ARRAY
     unit = ("L", "l", "q")
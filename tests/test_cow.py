@@ -0,0 +1,264 @@
+"""
+    test_cow.py - 容器标签写时复制(copy-on-write)的别名测试
+
+    python -m pytest tests/test_cow.py  或  python -m unittest discover tests
+"""
+
+
+import os, sys, threading, unittest
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from python_nbt import TAG_Compound, TAG_List, TAG_Int, TAG_IntArray, TAG_String
+
+SNBT = '{x:{y:1,z:{w:2},l:[{a:1},{a:2}],n:[1,2,3],arr:[I;1,2,3]},s:"t"}'
+
+
+def parsed():
+    return TAG_Compound.from_snbt(SNBT)
+
+def built():
+    return TAG_Compound({
+        "x": TAG_Compound({
+            "y": TAG_Int(1), "z": TAG_Compound({"w": TAG_Int(2)}),
+            "l": TAG_List([TAG_Compound({"a": TAG_Int(1)}), TAG_Compound({"a": TAG_Int(2)})]),
+            "n": TAG_List([TAG_Int(1), TAG_Int(2), TAG_Int(3)]), "arr": TAG_IntArray(array("i", [1, 2, 3])),
+        }),
+        "s": TAG_String("t"),
+    })
+
+def walk(tag, path):
+    for k in path: tag = tag[k]
+    return tag
+
+
+COMPOUND = [
+    ("setitem", lambda t: t.__setitem__("y", TAG_Int(5))),
+    ("setitem_new", lambda t: t.__setitem__("new", TAG_Compound())),
+    ("delitem", lambda t: t.__delitem__("y")),
+    ("clear", lambda t: t.clear()),
+    ("pop", lambda t: t.pop("z")),
+    ("popitem", lambda t: t.popitem()),
+    ("setdefault", lambda t: t.setdefault("q", TAG_Int(1))),
+    ("set_value", lambda t: t.set_value({"k": TAG_Int(1)})),
+    ("nested", lambda t: t["z"].__setitem__("w", TAG_Int(9))),
+    ("nested_get", lambda t: t.get("z").__setitem__("w", TAG_Int(9))),
+    ("nested_values", lambda t: t.values()[1].__setitem__("w", TAG_Int(9))),
+    ("nested_items", lambda t: t.items()[1][1].__setitem__("w", TAG_Int(9))),
+    ("nested_setdefault", lambda t: t.setdefault("z", TAG_Compound()).__setitem__("w", TAG_Int(9))),
+    ("nested_get_value", lambda t: t.get_value()["z"].__setitem__("w", TAG_Int(9))),
+]
+LIST = [
+    ("setitem", lambda t: t.__setitem__(0, TAG_Compound({"a": TAG_Int(9)}))),
+    ("delitem", lambda t: t.__delitem__(0)),
+    ("insert", lambda t: t.insert(0, TAG_Compound())),
+    ("append", lambda t: t.append(TAG_Compound())),
+    ("clear", lambda t: t.clear()),
+    ("pop", lambda t: t.pop()),
+    ("remove", lambda t: t.remove(TAG_Compound({"a": TAG_Int(1)}))),
+    ("extend", lambda t: t.extend(TAG_List([TAG_Compound()]))),
+    ("reversed", lambda t: t.reversed()),
+    ("set_value", lambda t: t.set_value([TAG_Compound()])),
+    ("nested", lambda t: t[0].__setitem__("a", TAG_Int(9))),
+    ("nested_negative", lambda t: t[-1].__setitem__("a", TAG_Int(9))),
+    ("nested_iter", lambda t: next(iter(t)).__setitem__("a", TAG_Int(9))),
+    ("nested_slice", lambda t: t[0:1][0].__setitem__("a", TAG_Int(9))),
+    ("nested_get_value", lambda t: t.get_value()[0].__setitem__("a", TAG_Int(9))),
+]
+NUMBER_LIST = [
+    ("setitem", lambda t: t.__setitem__(0, TAG_Int(9))),
+    ("delitem", lambda t: t.__delitem__(0)),
+    ("insert", lambda t: t.insert(0, TAG_Int(9))),
+    ("append", lambda t: t.append(TAG_Int(9))),
+    ("clear", lambda t: t.clear()),
+    ("pop", lambda t: t.pop()),
+    ("remove", lambda t: t.remove(TAG_Int(2))),
+    ("extend", lambda t: t.extend(TAG_List([TAG_Int(9)]))),
+    ("reversed", lambda t: t.reversed()),
+    ("set_value", lambda t: t.set_value([TAG_Int(9)])),
+    ("get_value", lambda t: t.get_value().append(9)),
+]
+ARRAY = [
+    ("setitem", lambda t: t.__setitem__(0, 9)),
+    ("delitem", lambda t: t.__delitem__(0)),
+    ("insert", lambda t: t.insert(0, 9)),
+    ("append", lambda t: t.append(9)),
+    ("clear", lambda t: t.clear()),
+    ("pop", lambda t: t.pop(0)),
+    ("remove", lambda t: t.remove(2)),
+    ("extend", lambda t: t.extend([9])),
+    ("reversed", lambda t: t.reversed()),
+    ("set_value", lambda t: t.set_value([9])),
+    ("get_value", lambda t: t.get_value().append(9)),
+]
+CASES = [(["x"], COMPOUND), (["x", "l"], LIST), (["x", "n"], NUMBER_LIST), (["x", "arr"], ARRAY)]
+
+
+class TestMutators(unittest.TestCase):
+    def check(self, make, path, name, mutate, copy_twice=False):
+        for direction in ("copy", "source"):
+            with self.subTest(make=make.__name__, path=path, mutator=name, direction=direction, copy_twice=copy_twice):
+                src = make()
+                dst = src.copy().copy() if copy_twice else src.copy()
+                before = src.to_snbt()
+                target, other = (dst, src) if direction == "copy" else (src, dst)
+                mutate(walk(target, path))
+                self.assertEqual(other.to_snbt(), before)
+                self.assertNotEqual(target.to_snbt(), before)
+                self.assertEqual(other.digest(), TAG_Compound.from_snbt(before).digest())
+                self.assertEqual(target.digest(), TAG_Compound.from_snbt(target.to_snbt()).digest())
+
+    def test_every_mutator(self):
+        for make in (parsed, built):
+            for path, mutators in CASES:
+                for name, mutate in mutators:
+                    self.check(make, path, name, mutate)
+                    self.check(make, path, name, mutate, True)
+
+    def test_root_mutators(self):
+        for make in (parsed, built):
+            for name, mutate in COMPOUND[:8]:
+                with self.subTest(make=make.__name__, mutator=name):
+                    src = make()
+                    src["y"], src["z"] = TAG_Int(1), TAG_Compound({"w": TAG_Int(2)})
+                    dst = src.copy()
+                    before = src.to_snbt()
+                    mutate(dst)
+                    self.assertEqual(src.to_snbt(), before)
+
+    def test_popped_child_is_private(self):
+        a = parsed()
+        b = a.copy()
+        x = b.pop("x")
+        x["y"] = TAG_Int(5)
+        x["l"][0]["a"] = TAG_Int(5)
+        self.assertEqual(a.to_snbt(), SNBT)
+        item = a["x"]["l"].pop(0)
+        c = a.copy()
+        item["a"] = TAG_Int(7)
+        self.assertEqual(c["x"]["l"].to_snbt(), "[{a:2}]")
+
+
+class TestHeldReferences(unittest.TestCase):
+    def test_child_read_before_copy(self):
+        for make in (parsed, built):
+            a = make()
+            x, l, arr = a["x"], a["x"]["l"], a["x"]["arr"]
+            b = a.copy()
+            x["y"] = TAG_Int(5)
+            l[0]["a"] = TAG_Int(5)
+            arr[0] = 5
+            self.assertEqual(b.to_snbt(), SNBT)
+            self.assertEqual(a["x"]["y"], TAG_Int(5))
+            self.assertIs(a["x"], x)
+            b["x"]["z"]["w"] = TAG_Int(6)
+            self.assertEqual(x["z"]["w"], TAG_Int(2))
+
+    def test_child_read_from_copy_before_second_copy(self):
+        a = parsed()
+        b = a.copy()
+        z = b["x"]["z"]
+        c = b.copy()
+        z["w"] = TAG_Int(5)
+        self.assertEqual(a.to_snbt(), SNBT)
+        self.assertEqual(c.to_snbt(), SNBT)
+        self.assertEqual(b["x"]["z"]["w"], TAG_Int(5))
+
+    def test_bulk_reads_before_copy(self):
+        a = parsed()
+        values, items, children = a["x"].values(), a["x"].items(), list(a["x"]["l"])
+        b = a.copy()
+        values[1]["w"] = TAG_Int(5)
+        children[0]["a"] = TAG_Int(5)
+        self.assertIs(items[1][1], values[1])
+        self.assertEqual(b.to_snbt(), SNBT)
+
+    def test_inserted_child_before_copy(self):
+        a = parsed()
+        new, item = TAG_Compound({"v": TAG_Int(1)}), TAG_Compound({"a": TAG_Int(3)})
+        a["x"]["new"] = new
+        a["x"]["l"].append(item)
+        b = a.copy()
+        new["v"] = TAG_Int(2)
+        item["a"] = TAG_Int(4)
+        self.assertEqual(b["x"]["new"]["v"], TAG_Int(1))
+        self.assertEqual(b["x"]["l"][-1]["a"], TAG_Int(3))
+
+    def test_exposed_value_before_copy(self):
+        a = parsed()
+        raw, x = a.get_value(), a["x"]
+        b = a.copy()
+        raw["s"] = TAG_String("u")
+        x["y"] = TAG_Int(5)
+        self.assertEqual(b.to_snbt(), SNBT)
+        numbers = a["x"]["n"].get_value()
+        c = a.copy()
+        numbers.append(4)
+        self.assertEqual(len(c["x"]["n"]), 3)
+
+    def test_parent_digest_follows_held_child(self):
+        a = parsed()
+        x = a["x"]
+        digest = a.digest()
+        x["y"] = TAG_Int(5)
+        self.assertNotEqual(a.digest(), digest)
+        self.assertEqual(a.digest(), TAG_Compound.from_snbt(a.to_snbt()).digest())
+
+
+class TestSharing(unittest.TestCase):
+    def test_reads_do_not_copy(self):
+        a = parsed()
+        b = a.copy()
+        len(b), "x" in b, list(b), b.keys(), b["s"]
+        self.assertIs(b._peek(), a._peek())
+        c = b.copy()
+        self.assertIs(c._peek(), a._peek())
+
+    def test_copy_after_read_shares_untouched_children(self):
+        a = TAG_Compound({"k%d" % i: TAG_Compound({"a": TAG_Int(i)}) for i in range(100)})
+        a = a.copy()
+        b = a.copy()
+        x = b["k1"]
+        c = b.copy()
+        self.assertIs(c._peek()["k2"], b._peek()["k2"])
+        self.assertIsNot(c._peek()["k1"], x)
+        x["a"] = TAG_Int(-1)
+        self.assertEqual(c["k1"]["a"], TAG_Int(1))
+
+
+class TestThreads(unittest.TestCase):
+    def test_concurrent_reads_return_one_child(self):
+        for _ in range(20):
+            a = TAG_Compound({"k%d" % i: TAG_Compound({"a": TAG_Int(i)}) for i in range(2000)}).copy()
+            b = a.copy()
+            barrier, res = threading.Barrier(8), [None] * 8
+            def read(i):
+                barrier.wait()
+                res[i] = b["k1"]
+                res[i]["t%d" % i] = TAG_Int(i)
+            threads = [threading.Thread(target=read, args=(i,)) for i in range(8)]
+            for t in threads: t.start()
+            for t in threads: t.join()
+            self.assertTrue(all(r is res[0] for r in res))
+            self.assertEqual(len(b["k1"]), 9)
+            self.assertEqual(len(a["k1"]), 1)
+
+    def test_concurrent_copies_and_reads(self):
+        a = parsed()
+        barrier, errors = threading.Barrier(8), []
+        def work(i):
+            barrier.wait()
+            for _ in range(200):
+                c = a.copy()
+                c["x"]["z"]["w"] = TAG_Int(i)
+                if a["x"]["z"]["w"] != TAG_Int(2) or c["x"]["z"]["w"] != TAG_Int(i): errors.append(i)
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(a.to_snbt(), SNBT)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+    test_path.py - nbt路径在可变标签与不可变快照上的查询测试
+
+    python -m pytest tests/test_path.py  或  python -m unittest discover tests
+"""
+
+
+import os, sys, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from python_nbt import TAG_Compound, TAG_Int, path as nbt_path
+from python_nbt.frozen import Frozen
+
+SNBT = '{L:[1,2,3],C:[{id:"a",n:1},{id:"b",n:2}],A:[I;4,5],D:{x:{y:1}},P:[{a:[I;1,2]},{a:[I;3]}]}'
+PATHS = [
+    "L[]", "L[1]", "A[]", "D.*", "D.x.y",
+    'C[{id:"a"}].id', 'C[{id:"b"}].n', "C[].id",
+    "P[{a:[I;2]}]", '{C:[{id:"a"}]}.L[0]', '{D:{x:{}}}.D.x.y', '{D:{x:{y:2}}}.L[]',
+]
+
+
+def plain(node):
+    if isinstance(node, int): return node
+    return node.thaw().to_snbt() if isinstance(node, Frozen) else node.to_snbt()
+
+
+class TestFrozenPaths(unittest.TestCase):
+    def test_frozen_matches_tag(self):
+        tag = TAG_Compound.from_snbt(SNBT)
+        snap = tag.freeze()
+        for expr in PATHS:
+            with self.subTest(path=expr):
+                expected = [plain(v) for v in nbt_path.get_all(tag, expr)]
+                self.assertEqual([plain(v) for v in nbt_path.get_all(snap, expr)], expected)
+
+    def test_find(self):
+        snap = TAG_Compound.from_snbt(SNBT).freeze()
+        self.assertEqual(plain(snap.find("L[]")), "1")
+        self.assertEqual(plain(snap.find('C[{id:"a"}].id')), '"a"')
+        self.assertEqual(plain(snap.find('{C:[{id:"b"}]}.D.x.y')), "1")
+        self.assertIsNone(snap.find('{C:[{id:"c"}]}.L', None))
+
+
+class TestSet(unittest.TestCase):
+    def test_each_slot_gets_own_tag(self):
+        for expr, read in (("C[]", "C[]"), ('C[{n:1}]', "C[0]"), ("D.*", "D.*"), ("C[].v", "C[].v"), ("D.*.v", "D.*.v")):
+            with self.subTest(path=expr):
+                tag = TAG_Compound.from_snbt(SNBT)
+                value = TAG_Compound.from_snbt("{q:1}")
+                count = nbt_path.set(tag, expr, value, True)
+                slots = nbt_path.get_all(tag, read)
+                self.assertEqual(len(slots), count)
+                self.assertEqual(len({id(v) for v in slots}), count)
+                value["q"] = TAG_Int(2)
+                self.assertEqual(sum(v["q"] == TAG_Int(2) for v in slots), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
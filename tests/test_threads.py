@@ -0,0 +1,91 @@
+"""
+    test_threads.py - 多线程并发解码/编码与单线程结果一致性测试
+
+    python -m pytest tests/test_threads.py  或  python -m unittest discover tests
+"""
+
+
+import os, struct, sys, threading, unittest
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import python_nbt as nbt
+
+THREADS = 8
+ROUNDS = 64
+
+
+def make_tree(seed):
+    sections = [nbt.TAG_Compound({
+        "Y": nbt.TAG_Byte(y),
+        "BlockStates": nbt.TAG_LongArray(array("q", [(seed * 31 + y * 4096 + i) * 2654435761 % (1 << 62) for i in range(64)])),
+        "Heights": nbt.TAG_List(array("i", range(seed, seed + 16))),
+    }) for y in range(4)]
+    entities = [nbt.TAG_Compound({
+        "id": nbt.TAG_String("minecraft:entity_%d" % (i % 5)),
+        "Pos": nbt.TAG_List(array("d", [i * 0.5, 64.0, seed + i * 0.25])),
+        "UUID": nbt.TAG_IntArray(array("i", [seed, i, -i, i * 7])),
+    }) for i in range(20)]
+    return nbt.RootNBT(nbt.TAG_Compound({
+        "DataVersion": nbt.TAG_Int(3700 + seed),
+        "sections": nbt.TAG_List(sections),
+        "Entities": nbt.TAG_List(entities),
+    }), "chunk_%d" % seed)
+
+def parallel(work):
+    barrier = threading.Barrier(THREADS)
+    def run(i):
+        if i < THREADS: barrier.wait()
+        return work(i)
+    with ThreadPoolExecutor(THREADS) as pool:
+        return list(pool.map(run, range(ROUNDS)))
+
+
+class TestThreadedCodec(unittest.TestCase):
+    def test_decode(self):
+        roots = [make_tree(seed) for seed in range(4)]
+        blobs = {order: [r.to_nbt(None, 'none', order) for r in roots] for order in ("big", "little")}
+        snbts = [r.get_tag().to_snbt() for r in roots]
+        def decode(i):
+            order = ("big", "little")[i % 2]
+            data = blobs[order][i % len(roots)]
+            root = nbt.RootNBT.from_nbt(data, 'none', order)
+            return root.to_nbt(None, 'none', order) == data and root.get_tag().to_snbt() == snbts[i % len(roots)]
+        self.assertTrue(all(parallel(decode)))
+
+    def test_encode_shared_tree(self):
+        # 多个线程以不同字节序同时编码同一棵树，数组不能被原地字节交换
+        shared = make_tree(0)
+        expected = {order: shared.to_nbt(None, 'none', order) for order in ("big", "little")}
+        snbt = shared.get_tag().to_snbt()
+        def encode(i):
+            order = ("big", "little")[i % 2]
+            return shared.to_nbt(None, 'none', order) == expected[order]
+        self.assertTrue(all(parallel(encode)))
+        self.assertEqual(shared.get_tag().to_snbt(), snbt)
+
+    def test_interning(self):
+        # 直接写出从未创建过的值，让各线程同时在缓存未命中时创建标签，得到的必须是同一个实例
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+        for n in range(4):
+            data = bytearray()
+            for i in range(5000):
+                key, value = b"k%d" % i, ("threads_%d_%d_%d" % (os.getpid(), n, i)).encode()
+                data += struct.pack(">bH", 8, len(key)) + key + struct.pack(">H", len(value)) + value
+            data = bytes(data + b"\x00")
+            barrier = threading.Barrier(THREADS)
+            def decode(i):
+                barrier.wait()
+                return nbt.TAG_Compound._from_bytes(data, True)
+            with ThreadPoolExecutor(THREADS) as pool:
+                res = [r._peek() for r in pool.map(decode, range(THREADS))]
+            for k in res[0]:
+                self.assertTrue(all(r[k] is res[0][k] for r in res), k)
+
+
+if __name__ == "__main__":
+    unittest.main()